@@ -0,0 +1,251 @@
+#   Batched Newton-Raphson for many variants of one small network at once
+#
+#   All cases share the admittance matrix and the bus typing of the network and differ in
+#   their load / generator injections and voltage setpoints. Each Newton step builds the dense
+#   Jacobian of every unfinished case as one (cases, 2m, 2m) array and solves them with a
+#   single batched np.linalg.solve, so thousands of cases of a 9 or 39 bus system take a few
+#   vectorized iterations instead of thousands of Python level solver calls. Every case has
+#   one angle and one magnitude unknown per pv/pq bus, the magnitude row of a voltage controlled
+#   bus pins it to its setpoint, so generators can switch to pq at their reactive limits case
+#   by case without changing the shape of the system. Networks above BATCH_MAX_BUSES are
+#   solved case by case with the sparse Newton-Raphson instead.
+
+# Imports
+import numpy as np
+from run_profile import timed
+from sparse_nr import newtonRaphsonQLimits
+from native_solver import NativeNet, branchModel, admittance, busModel, genReactivePower
+
+# Largest network solved with dense Jacobians, and the memory one chunk of cases may use
+BATCH_MAX_BUSES = 300
+BATCH_MEMORY = 256e6
+
+# (element table, column) a batch can vary, the values of the project are used for the rest
+BATCH_COLUMNS = [('load', 'p_mw'), ('load', 'q_mvar'), ('gen', 'p_mw'), ('gen', 'vm_pu'),
+                 ('ext_grid', 'vm_pu')]
+
+# Values of every case for every batch column, (cases, rows) arrays. columns maps
+# (element, column) to arrays of the cases, missing ones repeat the project values.
+def caseValues(net: NativeNet, columns: dict, nCases: int) -> dict:
+    values = {}
+    for element, column in BATCH_COLUMNS:
+        base = net[element][column].to_numpy(dtype = float)
+        given = columns.get((element, column))
+        values[(element, column)] = np.broadcast_to(base, (nCases, len(base))).copy() \
+            if given is None else np.asarray(given, dtype = float).reshape(nCases, len(base))
+    return values
+
+# One hot (rows, nBus) matrix of the bus every element of a table is at
+def incidence(buses: np.ndarray, nBus: int) -> np.ndarray:
+    matrix = np.zeros((len(buses), nBus))
+    matrix[np.arange(len(buses)), buses] = 1.0
+    return matrix
+
+# Injections, reactive limits and start voltages of every case, (cases, nBus) arrays.
+# injection is MW + j MVAr fed into every bus on top of the elements, (cases, nBus) or None.
+def batchModel(net: NativeNet, model: dict, values: dict, V0: np.ndarray,
+               injection: np.ndarray = None) -> dict:
+    nBus, baseMVA = len(net.bus), net.sn_mva
+    genInc, loadInc = incidence(model['genBus'], nBus), incidence(model['loadBus'], nBus)
+    scaling = net.load.scaling.to_numpy(dtype = float)
+    loadP = values[('load', 'p_mw')] * scaling
+    loadQ = values[('load', 'q_mvar')] * scaling
+    Sbus = (values[('gen', 'p_mw')] @ genInc - loadP @ loadInc - 1j * (loadQ @ loadInc)) / baseMVA
+    if injection is not None:
+        Sbus = Sbus + injection / baseMVA
+    qMax = Sbus.imag + net.gen.max_q_mvar.to_numpy(dtype = float) @ genInc / baseMVA
+    qMin = Sbus.imag + net.gen.min_q_mvar.to_numpy(dtype = float) @ genInc / baseMVA
+
+    # Setpoints of generators and slacks on top of the start voltages of busModel
+    V = np.broadcast_to(V0, Sbus.shape).copy()
+    genBus, slackBus = model['genBus'], model['slackBus']
+    V[:, genBus] = values[('gen', 'vm_pu')] * V[:, genBus] / np.abs(V[:, genBus])
+    angle = np.deg2rad(net.ext_grid.va_degree.to_numpy(dtype = float))
+    V[:, slackBus] = values[('ext_grid', 'vm_pu')] * np.exp(1j * angle)
+    return {'Sbus': Sbus, 'qMin': qMin, 'qMax': qMax, 'V0': V, 'loadP': loadP, 'loadQ': loadQ,
+            'genP': values[('gen', 'p_mw')], 'genInc': genInc, 'loadInc': loadInc}
+
+# Newton-Raphson on a batch of cases sharing Ybus, Sbus / V0 / qMin / qMax are (cases, nBus).
+# Returns (V, converged, iterations) with one row / entry per case.
+def newtonRaphsonBatch(Ybus, Sbus: np.ndarray, V0: np.ndarray, pv: np.ndarray, pq: np.ndarray,
+                       qMin: np.ndarray, qMax: np.ndarray, tol: float = 1e-8, maxIter: int = 10) -> tuple:
+    nCases = Sbus.shape[0]
+    V, Sbus = V0.astype(complex), Sbus.copy()
+    converged = np.zeros(nCases, dtype = bool)
+    iterations = np.zeros(nCases, dtype = int)
+    unknown = np.sort(np.r_[pv, pq])
+    m = len(unknown)
+    if m == 0:
+        return V, np.ones(nCases, dtype = bool), iterations
+    Y = Ybus.toarray()
+    YuConj = np.conj(Y[np.ix_(unknown, unknown)])
+    isPv = np.broadcast_to(np.isin(unknown, pv), (nCases, m)).copy()
+    vSet = np.abs(V[:, unknown])
+    rows = np.arange(m)
+
+    # Steps of the current round of every case, a round restarts when generators switch to pq
+    steps = np.zeros(nCases, dtype = int)
+    active = np.ones(nCases, dtype = bool)
+    while active.any():
+        cases = np.flatnonzero(active)
+        Vc = V[cases]
+        Ibus = Vc @ Y.T
+        S = Vc * np.conj(Ibus)
+        mis = S[:, unknown] - Sbus[cases][:, unknown]
+        Vm = np.abs(Vc[:, unknown])
+        F = np.concatenate([mis.real, np.where(isPv[cases], Vm - vSet[cases], mis.imag)], axis = 1)
+        done = np.max(np.abs(F), axis = 1) < tol
+
+        # Converged cases with generators beyond their reactive limits go on as pq buses
+        if done.any():
+            finished = cases[done]
+            Q = S[done][:, unknown].imag
+            pvDone = isPv[finished]
+            high = pvDone & (Q > qMax[finished][:, unknown])
+            low = pvDone & (Q < qMin[finished][:, unknown])
+            switched = (high | low).any(axis = 1)
+            limits = np.where(high, qMax[finished][:, unknown], qMin[finished][:, unknown])
+            for case, caseHigh, caseLow, caseLimits in zip(finished[switched], high[switched],
+                                                           low[switched], limits[switched]):
+                at = caseHigh | caseLow
+                Sbus[case, unknown[at]] = Sbus[case, unknown[at]].real + 1j * caseLimits[at]
+                isPv[case, at] = False
+                steps[case] = 0
+            settled = finished[~switched]
+            converged[settled] = True
+            active[settled] = False
+            cases, F = cases[~done], F[~done]
+
+        out = steps[cases] >= maxIter
+        active[cases[out]] = False
+        cases, F = cases[~out], F[~out]
+        if not len(cases):
+            continue
+
+        # Jacobian blocks on the unknown buses: dS/dVa and dS/dVm of every case
+        chunk = max(1, int(BATCH_MEMORY // (64 * m * m)))
+        for start in range(0, len(cases), chunk):
+            part = cases[start:start + chunk]
+            Vp = V[part]
+            Vu = Vp[:, unknown]
+            Iu = (Vp @ Y.T)[:, unknown]
+            Vnorm = Vu / np.abs(Vu)
+            VY = Vu[:, :, None] * YuConj
+            dSdVa = VY * (-1j * np.conj(Vu))[:, None, :]
+            dSdVa[:, rows, rows] += 1j * Vu * np.conj(Iu)
+            dSdVm = VY * np.conj(Vnorm)[:, None, :]
+            dSdVm[:, rows, rows] += np.conj(Iu) * Vnorm
+            J = np.empty((len(part), 2 * m, 2 * m))
+            J[:, :m, :m], J[:, :m, m:] = dSdVa.real, dSdVm.real
+            J[:, m:, :m], J[:, m:, m:] = dSdVa.imag, dSdVm.imag
+            pvCase, pvRow = np.nonzero(isPv[part])
+            J[pvCase, m + pvRow, :] = 0.0
+            J[pvCase, m + pvRow, m + pvRow] = 1.0
+            dx = solveBatch(J, -F[start:start + chunk])
+            failed = ~np.all(np.isfinite(dx), axis = 1)
+            active[part[failed]] = False
+            iterations[part[failed]] = steps[part[failed]] + 1
+            ok = part[~failed]
+            Va = np.angle(V[ok][:, unknown]) + dx[~failed, :m]
+            Vm = np.abs(V[ok][:, unknown]) + dx[~failed, m:]
+            V[np.ix_(ok, unknown)] = Vm * np.exp(1j * Va)
+        steps[cases] += 1
+        iterations[cases] = steps[cases]
+    return V, converged, iterations
+
+# Batched solve of J dx = F, singular systems of single cases come back as NaN
+def solveBatch(J: np.ndarray, F: np.ndarray) -> np.ndarray:
+    try:
+        return np.linalg.solve(J, F[:, :, None])[:, :, 0]
+    except np.linalg.LinAlgError:
+        dx = np.full(F.shape, np.nan)
+        for case in range(len(F)):
+            try:
+                dx[case] = np.linalg.solve(J[case], F[case])
+            except np.linalg.LinAlgError:
+                pass
+        return dx
+
+# Solves every case of a batch of the net and returns {'converged', 'iterations', 'V', and
+# result tables}. columns holds (cases, rows) values for entries of BATCH_COLUMNS, Vstart are
+# start voltages in net.bus order shared by every case or one row per case (rows that are
+# not finite start flat), injection is passed on to batchModel.
+def solveNativeBatch(net: NativeNet, columns: dict, nCases: int, maxIter,
+                     Vstart: np.ndarray = None, tol: float = 1e-8, injection: np.ndarray = None) -> dict:
+    with timed('ybus'):
+        branches = branchModel(net)
+        Ybus, Yf, Yt = admittance(branches, len(net.bus))
+    perCase = Vstart is not None and Vstart.ndim == 2
+    model = busModel(net, branches, None if perCase else Vstart)
+    V0 = model['V0']
+    if perCase:
+        V0 = np.where(np.isfinite(Vstart).all(axis = 1, keepdims = True), Vstart, V0)
+    batch = batchModel(net, model, caseValues(net, columns, nCases), V0, injection)
+    with timed('solve'):
+        if len(net.bus) <= BATCH_MAX_BUSES:
+            V, converged, iterations = newtonRaphsonBatch(
+                Ybus, batch['Sbus'], batch['V0'], model['pv'], model['pq'], batch['qMin'],
+                batch['qMax'], tol = tol, maxIter = maxIter)
+        else:
+            V = batch['V0'].copy()
+            converged = np.zeros(nCases, dtype = bool)
+            iterations = np.zeros(nCases, dtype = int)
+            for case in range(nCases):
+                V[case], converged[case], iterations[case], _, _, _ = newtonRaphsonQLimits(
+                    Ybus, batch['Sbus'][case], batch['V0'][case], model['ref'], model['pv'],
+                    model['pq'], batch['qMin'][case], batch['qMax'][case], tol = tol, maxIter = maxIter)
+    V[~converged] = np.nan
+    with timed('pf results'):
+        tables = batchResults(net, model, batch, branches, Ybus, Yf, Yt, V)
+    return {'converged': converged, 'iterations': iterations, 'V': V, **tables}
+
+# The res_* tables of writeNativeResults for every case, {table: {column: (cases, rows)}}
+def batchResults(net: NativeNet, model: dict, batch: dict, branches: dict, Ybus, Yf, Yt,
+                 V: np.ndarray) -> dict:
+    baseMVA = net.sn_mva
+    vn = net.bus.vn_kv.to_numpy(dtype = float)
+    V = np.where(model['energized'], V, np.nan)
+    Vc = np.nan_to_num(V)
+    vm, va = np.abs(V), np.rad2deg(np.angle(V))
+    Sinj = V * np.conj((Ybus @ Vc.T).T) * baseMVA
+    tables = {'res_bus': {'vm_pu': vm, 'va_degree': va, 'p_mw': -Sinj.real, 'q_mvar': -Sinj.imag}}
+
+    f, t = branches['from'], branches['to']
+    If, It = (Yf @ Vc.T).T, (Yt @ Vc.T).T
+    Sf, St = V[:, f] * np.conj(If) * baseMVA, V[:, t] * np.conj(It) * baseMVA
+    iFrom = np.abs(If) * baseMVA / (np.sqrt(3) * vn[f])
+    iTo = np.abs(It) * baseMVA / (np.sqrt(3) * vn[t])
+    dead = ~(model['energized'][f] & model['energized'][t])
+    iFrom[:, dead], iTo[:, dead] = np.nan, np.nan
+    nLine, nTrafo = branches['lines'], branches['lines'] + branches['trafos']
+    line, trafo = net.line, net.trafo
+    lineI = np.maximum(iFrom[:, :nLine], iTo[:, :nLine])
+    tables['res_line'] = {
+        'p_from_mw': Sf.real[:, :nLine], 'q_from_mvar': Sf.imag[:, :nLine],
+        'p_to_mw': St.real[:, :nLine], 'q_to_mvar': St.imag[:, :nLine],
+        'pl_mw': (Sf + St).real[:, :nLine], 'ql_mvar': (Sf + St).imag[:, :nLine], 'i_ka': lineI,
+        'loading_percent': lineI / (line.max_i_ka * line.df * line.parallel).to_numpy(dtype = float) * 100,
+    }
+    iHv, iLv = iFrom[:, nLine:nTrafo], iTo[:, nLine:nTrafo]
+    tables['res_trafo'] = {
+        'p_hv_mw': Sf.real[:, nLine:nTrafo], 'q_hv_mvar': Sf.imag[:, nLine:nTrafo],
+        'p_lv_mw': St.real[:, nLine:nTrafo], 'q_lv_mvar': St.imag[:, nLine:nTrafo],
+        'pl_mw': (Sf + St).real[:, nLine:nTrafo], 'ql_mvar': (Sf + St).imag[:, nLine:nTrafo],
+        'loading_percent': np.maximum(iHv * trafo.vn_hv_kv.to_numpy(dtype = float),
+                                      iLv * trafo.vn_lv_kv.to_numpy(dtype = float)) * np.sqrt(3)
+        / (trafo.sn_mva * trafo.parallel * trafo.df).to_numpy(dtype = float) * 100,
+    }
+
+    # Loads, generators and slacks split their buses like writeNativeResults
+    gen, slackBus = net.gen, model['slackBus']
+    busLoadP, busLoadQ = batch['loadP'] @ batch['loadInc'], batch['loadQ'] @ batch['loadInc']
+    genQ = genReactivePower(gen, model['genBus'], Sinj.imag + busLoadQ)
+    tables['res_load'] = {'p_mw': batch['loadP'], 'q_mvar': batch['loadQ']}
+    tables['res_gen'] = {'p_mw': batch['genP'], 'q_mvar': genQ, 'va_degree': va[:, model['genBus']],
+                         'vm_pu': vm[:, model['genBus']]}
+    share = np.bincount(slackBus, minlength = len(vn))[slackBus]
+    tables['res_ext_grid'] = {
+        'p_mw': (Sinj.real + busLoadP - batch['genP'] @ batch['genInc'])[:, slackBus] / share,
+        'q_mvar': (Sinj.imag + busLoadQ - genQ @ batch['genInc'])[:, slackBus] / share,
+    }
+    return tables
@@ -0,0 +1,195 @@
+#   Benchmarks for the simulator, run with: python benchmarks.py [projectPath | nBuses]
+#   Startup benchmark of the GUI imports, run with: python benchmarks.py --startup
+#   Radial sweep against the native Newton-Raphson, run with: python benchmarks.py --sweep [nBuses]
+
+# Imports
+import os
+import sys
+import csv
+import tempfile
+import subprocess
+from time import perf_counter
+import numpy as np
+import pandapower as pp
+from simulator import buildNetwork, buildNetworkRowwise, projectCsvs
+from native_solver import buildTables, solveNative
+from radial_solver import solveRadial
+
+# Writes a synthetic project: a 110 kV slack bus feeding 20 kV feeders through transformers,
+# radial ones leave out the generators at the feeder ends and the ties between them
+def makeSyntheticProject(path: str, nBuses: int, feeders: int = 10, radial: bool = False) -> str:
+    os.makedirs(path, exist_ok = True)
+    feederLen = max(1, (nBuses - 1 - feeders) // feeders)
+    buses, lines, trafos, gens, loads = [], [], [], [], []
+    buses.append({'id': 1, 'vMag': 110.0, 'name': 'Bus 1'})
+    busId = 1
+    for f in range(feeders):
+        busId += 1
+        head = busId
+        buses.append({'id': head, 'vMag': 20.0, 'name': f'Bus {head}'})
+        trafos.append({'id': f + 1, 'name': f'T{f + 1}', 'hvBus': 1, 'lvBus': head,
+                       'sn_mva': 40.0, 'vk_percent': 12.0, 'vkr_percent': 0.4,
+                       'tap_step_percent': 1.5})
+        prev = head
+        for _ in range(feederLen):
+            busId += 1
+            buses.append({'id': busId, 'vMag': 20.0, 'name': f'Bus {busId}'})
+            line = {'name': f'L{prev}to{busId}', 'bus1id': prev, 'bus2id': busId, 'len': 0.3}
+            if busId % 3:
+                line.update({'R': 0.16, 'X': 0.11, 'c_nf_per_km': 260.0, 'max_i_ka': 0.4})
+            else:
+                line.update({'R': 'None', 'X': 'None', 'c_nf_per_km': 'None', 'max_i_ka': 'None'})
+            lines.append(line)
+            loads.append({'id': len(loads) + 1, 'bus': busId, 'pMW': 0.05, 'qMW': 0.01})
+            prev = busId
+        if radial:
+            continue
+        gens.append({'id': f + 1, 'bus': prev, 'name': f'Gen {f + 1}', 'pMW': 0.2, 'vmPU': 1.0,
+                     'minQMvar': -1.0, 'maxQMvar': 1.0, 'minPMW': 0.0, 'maxPMW': 1.0})
+
+    # Tie the feeder ends together so the network is meshed
+    feederEnds = [gen['bus'] for gen in gens]
+    for a, b in zip(feederEnds, feederEnds[1:]):
+        lines.append({'name': f'L{a}to{b}', 'bus1id': a, 'bus2id': b, 'len': 1.0, 'R': 0.16,
+                      'X': 0.11, 'c_nf_per_km': 260.0, 'max_i_ka': 0.4})
+
+    gui = {'pos': '[0, 0]', 'orient': 0, 'hand': '[0, 0]'}
+    writeCsv(f'{path}/Buses.csv',
+             ['id', 'bType', 'vMag', 'zone', 'maxVm', 'minVm', 'vAng', 'P', 'Q', 'name', 'pos',
+              'capacity', 'orient', 'points'],
+             [{**bus, 'bType': 'BusType.PQ', 'zone': 1, 'maxVm': 1.1, 'minVm': 0.9,
+               'vAng': 'NaN', 'P': 'NaN', 'Q': 'NaN', 'pos': '[0, 0]', 'capacity': 1,
+               'orient': 0, 'points': '[[0, 0]]'} for bus in buses])
+    writeCsv(f'{path}/Lines.csv',
+             ['name', 'bus1id', 'bus2id', 'R', 'X', 'len', 'c_nf_per_km', 'max_i_ka'], lines)
+    writeCsv(f'{path}/Trafos.csv',
+             ['id', 'name', 'hvBus', 'lvBus', 'pos', 'orient', 'hands', 'sn_mva', 'vk_percent',
+              'vkr_percent', 'tap_step_percent'],
+             [{**trafo, 'pos': '[0, 0]', 'orient': 0, 'hands': '[]'} for trafo in trafos])
+    writeCsv(f'{path}/Gens.csv',
+             ['id', 'bus', 'name', 'pMW', 'vmPU', 'minQMvar', 'maxQMvar', 'minPMW', 'maxPMW',
+              'pos', 'orient', 'hand'], [{**gen, **gui} for gen in gens])
+    writeCsv(f'{path}/Loads.csv', ['id', 'bus', 'pMW', 'qMW', 'pos', 'orient', 'hand'],
+             [{**load, **gui} for load in loads])
+    writeCsv(f'{path}/Slacks.csv',
+             ['id', 'bus', 'vmPU', 'vaD', 'pos', 'orient', 'hand', 'minP', 'maxP', 'minQ', 'maxQ'],
+             [{'id': 1, 'bus': 1, 'vmPU': 1.0, 'vaD': 0.0, **gui, 'minP': 0, 'maxP': 1e6,
+               'minQ': -1e6, 'maxQ': 1e6}])
+    return path
+
+def writeCsv(path: str, fieldnames: list, rows: list) -> None:
+    with open(path, 'w', newline = '') as file:
+        writer = csv.DictWriter(file, fieldnames = fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+# Times the bulk and the row by row network build and checks they give the same net
+def benchBuild(projectPath: str, repeats: int = 3, freq: float = 50.0, sBase = 100.0) -> dict:
+    csvs = projectCsvs(projectPath)
+    timings = {}
+    nets = {}
+    for label, builder in (('rowwise', buildNetworkRowwise), ('bulk', buildNetwork)):
+        best = float('inf')
+        for _ in range(repeats):
+            startTime = perf_counter()
+            nets[label] = builder(*csvs, freq, sBase)
+            best = min(best, perf_counter() - startTime)
+        timings[label] = best
+    timings['identical'] = pp.nets_equal(nets['rowwise'], nets['bulk'], check_only_results = False)
+    timings['buses'] = len(nets['bulk'].bus)
+    return timings
+
+# Times the native Newton-Raphson and the backward/forward sweep on the same project, best
+# of repeats, and the largest difference of their bus voltages
+def benchSweep(projectPath: str, repeats: int = 3, maxIter = 100, freq: float = 50.0, sBase = 100.0) -> dict:
+    csvs = projectCsvs(projectPath)
+    results = {}
+    voltages = {}
+    for label in ('native', 'sweep'):
+        best = float('inf')
+        for _ in range(repeats):
+            net = buildTables(csvs, freq, sBase)
+            startTime = perf_counter()
+            if label == 'sweep':
+                converged, iterations, radial = solveRadial(net, maxIter)
+            else:
+                (converged, iterations), radial = solveNative(net, maxIter), None
+            best = min(best, perf_counter() - startTime)
+        results[label] = {'time': best, 'iterations': iterations, 'converged': converged}
+        if radial is not None:
+            results['radial'] = radial
+        voltages[label] = net.res_bus.vm_pu.to_numpy() * np.exp(1j * np.deg2rad(net.res_bus.va_degree.to_numpy()))
+    results['maxDiff'] = float(np.nanmax(np.abs(voltages['native'] - voltages['sweep'])))
+    results['buses'] = len(net.bus)
+    return results
+
+# The numerical stack, none of it should be imported before the main window shows
+STARTUP_HEAVY = ['numpy', 'pandas', 'scipy', 'numba', 'networkx', 'pandapower']
+
+# Imports a module in a fresh interpreter under python -X importtime, best of repeats.
+# Returns the total seconds, the slowest modules it imports directly as [(module, seconds)]
+# and the heavy modules that got imported.
+def benchStartup(module: str = 'gui', repeats: int = 3, top: int = 10) -> dict:
+    srcPath = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeats):
+        run = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             cwd = srcPath, capture_output = True, text = True)
+        if run.returncode:
+            raise RuntimeError(f'import {module} failed:\n{run.stderr[-2000:]}')
+        # Lines are 'import time: self [us] | cumulative | name', nested imports indented
+        imports = []
+        for line in run.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imports.append((name.rstrip(), int(cumulative) / 1e6))
+        end = next(i for i, (name, _) in enumerate(imports) if name.strip() == module)
+        total = imports[end][1]
+        if best is None or total < best['total']:
+            # The module's imports are listed before it, back to the previous top level one
+            depth = len(imports[end][0]) - len(imports[end][0].lstrip())
+            start = end
+            while start > 0 and len(imports[start - 1][0]) - len(imports[start - 1][0].lstrip()) > depth:
+                start -= 1
+            direct = [(name.strip(), seconds) for name, seconds in imports[start:end]
+                      if len(name) - len(name.lstrip()) == depth + 2]
+            loaded = {name.strip().split('.')[0] for name, _ in imports[start:end]}
+            best = {'total': total, 'slowest': sorted(direct, key = lambda item: -item[1])[:top],
+                    'heavy': [name for name in STARTUP_HEAVY if name in loaded]}
+    return best
+
+def main() -> None:
+    arg = sys.argv[1] if len(sys.argv) > 1 else '2000'
+    if arg == '--startup':
+        startup = benchStartup()
+        print(f'GUI import time: {startup["total"]:.4f} s')
+        for name, seconds in startup['slowest']:
+            print(f'  {name:<24}{seconds:>10.4f} s')
+        print(f'  heavy modules: {", ".join(startup["heavy"]) or "none"}')
+        sys.exit(1 if startup['heavy'] else 0)
+    if arg == '--sweep':
+        nBuses = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+        projectPath = makeSyntheticProject(tempfile.mkdtemp(prefix = 'loadflowx_'), nBuses, radial = True)
+        sweep = benchSweep(projectPath)
+        print(f'Radial load flow for {sweep["buses"]} buses ({projectPath})')
+        for label in ('native', 'sweep'):
+            print(f'  {label:<11}: {sweep[label]["time"]:.4f} s, {sweep[label]["iterations"]} iterations, '
+                  f'{"converged" if sweep[label]["converged"] else "not converged"}')
+        print(f'  speedup    : {sweep["native"]["time"] / sweep["sweep"]["time"]:.1f}x')
+        print(f'  radial     : {sweep["radial"]}')
+        print(f'  max diff   : {sweep["maxDiff"]:.2e} pu')
+        return
+    if arg.isdigit():
+        projectPath = makeSyntheticProject(tempfile.mkdtemp(prefix = 'loadflowx_'), int(arg))
+    else:
+        projectPath = arg
+    timings = benchBuild(projectPath)
+    print(f'Network build for {timings["buses"]} buses ({projectPath})')
+    print(f'  row by row : {timings["rowwise"]:.4f} s')
+    print(f'  bulk       : {timings["bulk"]:.4f} s')
+    print(f'  speedup    : {timings["rowwise"] / timings["bulk"]:.1f}x')
+    print(f'  identical  : {timings["identical"]}')
+
+if __name__ == '__main__':
+    main()
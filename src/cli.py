@@ -0,0 +1,227 @@
+#   Headless load flow runner for batches of projects, imports the solver stack only (no Qt)
+#
+#       python cli.py PROJECT [PROJECT ...] [--method nr|gs|fdbx|dc|native|sweep] [--max-iter 1000]
+#                     [--freq 50] [--sbase 100] [--no-warm-start] [--csv]
+#                     [--profile cprofile|tracemalloc] [--timings] [--verbose]
+#                     [--study-zones 1,2|none]
+#       python cli.py PROJECT [PROJECT ...] --cross-check
+#       python cli.py PROJECT [PROJECT ...] --scenarios FILE [--batched] [--method ...]
+#       python cli.py PROJECT [PROJECT ...] --contingency [--method ...]
+#       python cli.py PROJECT [PROJECT ...] --sensitivity
+#       python cli.py PROJECT [PROJECT ...] --probabilistic [FILE] [--max-samples 20000]
+#                     [--seed N] [--absolute-profiles]
+#
+#   Every project folder gets its results.npz like a run from the GUI, and the results_*.csv
+#   files with --csv. One line per project is printed, the exit code is 1 if any of them failed.
+#   --cross-check solves every project with pandapower and with the native solver instead and
+#   fails the projects where their results differ. --study-zones stores the study area of the
+#   projects, later runs replace the network outside those zones by its Ward equivalent.
+#   --scenarios solves every row of a scenario csv (relative paths are taken inside each
+#   project folder) instead of one load flow, --batched in one vectorized Newton-Raphson.
+#   --contingency runs the N-1 analysis of every line and transformer instead. --sensitivity
+#   writes the DC PTDF and LODF matrices as sensitivity_ptdf.csv and sensitivity_lodf.csv.
+#   --probabilistic samples the distributions of FILE (Distributions.csv by default) in a Monte
+#   Carlo load flow, --absolute-profiles reads empirical profiles as MW / MVAr.
+
+# Imports
+import os
+import sys
+import argparse
+import contextlib
+from time import perf_counter
+from simulator import runLoadFlow, projectCsvs, crossCheck
+from scenarios import runScenarios
+from contingency import runContingencies
+from sensitivity import runSensitivities
+from probabilistic import runProbabilistic, DISTRIBUTIONS_FILE
+from run_profile import PROFILE_MODES, formatTimings
+from project_files import writeStudyZones
+
+METHODS = ['nr', 'gs', 'fdbx', 'dc', 'native', 'sweep']
+
+# Zones of --study-zones, 'none' for none
+def studyZones(text: str) -> list:
+    return [] if text.lower() == 'none' else [int(zone) for zone in text.split(',')]
+
+def parseArgs(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog = 'cli.py', description = 'Run load flows without the GUI.')
+    parser.add_argument('projects', nargs = '+', help = 'project folders holding Buses.csv, Lines.csv, ...')
+    parser.add_argument('--method', choices = METHODS, default = 'nr',
+                        help = 'nr: Newton Raphson, gs: Gauss Seidel, fdbx: Fast Decoupled, dc: DC load flow, '
+                               'native: Newton Raphson without pandapower, sweep: backward/forward sweep '
+                               'for radial networks')
+    parser.add_argument('--max-iter', type = int, default = 1000, dest = 'maxIter')
+    parser.add_argument('--freq', type = float, default = 50.0, help = 'network frequency in Hz')
+    parser.add_argument('--sbase', type = float, default = 100.0, dest = 'sBase', help = 'S base in MVA')
+    parser.add_argument('--no-warm-start', action = 'store_false', dest = 'warmStart',
+                        help = 'always start the solver from a flat start')
+    parser.add_argument('--csv', action = 'store_true', dest = 'exportCsv',
+                        help = 'also write the result tables as csv files')
+    parser.add_argument('--profile', choices = PROFILE_MODES[1:], default = '',
+                        help = 'profile the runs, the report is printed and run_profile.prof written')
+    parser.add_argument('--timings', action = 'store_true', help = 'print the time of every phase of a run')
+    parser.add_argument('--cross-check', action = 'store_true', dest = 'crossCheck',
+                        help = 'compare the native solver with pandapower instead of running')
+    parser.add_argument('--study-zones', type = studyZones, dest = 'studyZones', default = None,
+                        help = "zones kept by a network reduction, comma separated, 'none' solves the full network")
+    parser.add_argument('--scenarios', metavar = 'FILE', default = None,
+                        help = 'solve every row of a scenario csv instead, relative to the project folder')
+    parser.add_argument('--batched', action = 'store_true',
+                        help = 'solve the scenarios together in one vectorized native Newton-Raphson')
+    parser.add_argument('--contingency', action = 'store_true',
+                        help = 'run the N-1 contingency analysis of every line and transformer instead')
+    parser.add_argument('--sensitivity', action = 'store_true',
+                        help = 'write the DC PTDF and LODF matrices of the network as csv files instead')
+    parser.add_argument('--probabilistic', metavar = 'FILE', nargs = '?', const = DISTRIBUTIONS_FILE,
+                        default = None, help = 'run a probabilistic load flow of the distribution csv instead, '
+                                               f'relative to the project folder ({DISTRIBUTIONS_FILE} by default)')
+    parser.add_argument('--max-samples', type = int, default = 20000, dest = 'maxSamples',
+                        help = 'most samples a probabilistic load flow draws')
+    parser.add_argument('--seed', type = int, default = None, help = 'random seed of a probabilistic load flow')
+    parser.add_argument('--absolute-profiles', action = 'store_true', dest = 'absoluteProfiles',
+                        help = 'empirical distributions draw MW / MVAr instead of multipliers')
+    parser.add_argument('--verbose', action = 'store_true', help = 'print the network tables of every run')
+    return parser.parse_args(argv)
+
+# Keeps what the solver stack prints out of the summary lines, unless --verbose
+@contextlib.contextmanager
+def solverOutput(verbose: bool):
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+# Project csvs missing from a project folder
+def missingCsvs(projectPath: str) -> list:
+    return [os.path.basename(path) for path in projectCsvs(projectPath) if not os.path.isfile(path)]
+
+# Returns (success, message) for one project folder
+def runProject(projectPath: str, args: argparse.Namespace) -> tuple[bool, str]:
+    csvPaths = projectCsvs(projectPath)
+    missing = missingCsvs(projectPath)
+    if missing:
+        return False, f'missing {", ".join(missing)}'
+    if args.studyZones is not None:
+        writeStudyZones(projectPath, args.studyZones)
+    startTime = perf_counter()
+    with solverOutput(args.verbose):
+        success, error, info = runLoadFlow(projectPath, *csvPaths, args.method, args.maxIter,
+                                           args.freq, args.sBase, args.warmStart,
+                                           exportCsv = args.exportCsv, profile = args.profile,
+                                           printTables = args.verbose)
+    executionTime = perf_counter() - startTime
+    details = ''
+    if args.timings and 'timings' in info:
+        details += '\n' + formatTimings(info['timings'], info['totalTime'])
+    if info.get('profileReport'):
+        details += '\n' + info['profileReport']
+    if not success:
+        return False, error + details
+    if args.method == 'dc':
+        return True, f'dc load flow in {executionTime:.3f} s' + details
+    start = 'warm start' if info['init'] == 'results' else 'flat start'
+    if args.method == 'sweep':
+        start += ', radial sweep' if info.get('radial') else ', not radial, Newton Raphson'
+    if info.get('reduction'):
+        start += f', {info["reduction"]["retained"]} of {info["reduction"]["retained"] + info["reduction"]["external"]} buses kept'
+    return True, f'{info["iterations"]} iterations ({start}) in {executionTime:.3f} s' + details
+
+# Returns (success, message) for the comparison of both solvers on one project folder
+def crossCheckProject(projectPath: str, args: argparse.Namespace) -> tuple[bool, str]:
+    try:
+        checks = crossCheck(projectPath, args.freq, args.sBase, args.maxIter)
+    except Exception as e:
+        return False, str(e)
+    worst = checks.loc[checks.max_diff.idxmax()]
+    message = f'largest difference {worst.max_diff:.2e} in {worst.table}.{worst.column}'
+    for _, check in checks[~checks.ok].iterrows():
+        message += f'\n  {check.table}.{check.column} differs by {check.max_diff:.2e}'
+    return bool(checks.ok.all()), message
+
+# Returns (success, message) for the scenarios of --scenarios on one project folder
+def scenariosProject(projectPath: str, args: argparse.Namespace) -> tuple[bool, str]:
+    missing = missingCsvs(projectPath)
+    if missing:
+        return False, f'missing {", ".join(missing)}'
+    with solverOutput(args.verbose):
+        success, error, info = runScenarios(projectPath, *projectCsvs(projectPath), args.method,
+                                            args.maxIter, args.freq, args.sBase,
+                                            os.path.join(projectPath, args.scenarios),
+                                            batched = args.batched)
+    if not success:
+        return False, error
+    message = f'{info["converged"]} of {info["scenarios"]} scenarios converged in {info["time"]:.3f} s'
+    if info['failed']:
+        message += f'\n  not converged: {", ".join(str(name) for name in info["failed"])}'
+    return True, message
+
+# Returns (success, message) for the N-1 contingency analysis of one project folder
+def contingencyProject(projectPath: str, args: argparse.Namespace) -> tuple[bool, str]:
+    missing = missingCsvs(projectPath)
+    if missing:
+        return False, f'missing {", ".join(missing)}'
+    with solverOutput(args.verbose):
+        success, error, info = runContingencies(projectPath, *projectCsvs(projectPath), args.method,
+                                                args.maxIter, args.freq, args.sBase)
+    if not success:
+        return False, error
+    return True, (f'{info["outages"]} outages ({info["islanding"]} islanding, {info["diverged"]} diverged), '
+                  f'{info["violating"]} with limit violations in {info["time"]:.3f} s')
+
+# Returns (success, message) for the DC sensitivities of one project folder
+def sensitivityProject(projectPath: str, args: argparse.Namespace) -> tuple[bool, str]:
+    missing = missingCsvs(projectPath)
+    if missing:
+        return False, f'missing {", ".join(missing)}'
+    with solverOutput(args.verbose):
+        success, error, info = runSensitivities(projectPath, *projectCsvs(projectPath), args.freq, args.sBase)
+    if not success:
+        return False, error
+    source = 'stored' if info['cached'] else 'computed'
+    return True, f'PTDF and LODF of {info["branches"]} branches and {info["buses"]} buses {source} in {info["time"]:.3f} s'
+
+# Returns (success, message) for the probabilistic load flow of one project folder
+def probabilisticProject(projectPath: str, args: argparse.Namespace) -> tuple[bool, str]:
+    missing = missingCsvs(projectPath)
+    if missing:
+        return False, f'missing {", ".join(missing)}'
+    with solverOutput(args.verbose):
+        success, error, info = runProbabilistic(projectPath, *projectCsvs(projectPath), args.maxIter,
+                                                args.freq, args.sBase,
+                                                os.path.join(projectPath, args.probabilistic),
+                                                'absolute' if args.absoluteProfiles else 'scale',
+                                                minSamples = min(500, args.maxSamples),
+                                                maxSamples = args.maxSamples, randomSeed = args.seed)
+    if not success:
+        return False, error
+    stop = 'percentiles settled' if info['stoppedEarly'] else 'sample limit reached'
+    return True, (f'{info["converged"]} of {info["samples"]} samples converged in {info["rounds"]} rounds '
+                  f'({stop}) in {info["time"]:.3f} s')
+
+# The runner of the study the arguments ask for, one load flow per project by default
+def projectRunner(args: argparse.Namespace):
+    if args.crossCheck:
+        return crossCheckProject
+    if args.scenarios:
+        return scenariosProject
+    if args.contingency:
+        return contingencyProject
+    if args.sensitivity:
+        return sensitivityProject
+    if args.probabilistic:
+        return probabilisticProject
+    return runProject
+
+def main(argv: list = None) -> int:
+    args = parseArgs(sys.argv[1:] if argv is None else argv)
+    failed = 0
+    check = projectRunner(args)
+    for projectPath in args.projects:
+        success, message = check(projectPath, args)
+        failed += not success
+        print(f'{projectPath}: {"ok" if success else "failed"}, {message}', flush = True)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,363 @@
+#   N-1 contingency analysis over every line and transformer of a project
+#
+#   Outages are solved by the sparse Newton-Raphson of sparse_nr.py on the per unit model of
+#   the base case, only the admittance matrix is rebuilt for each of them. An outage that
+#   does not converge there gets a full load flow with the chosen method before it counts as
+#   diverged. With method 'dc' the outage flows come from the line outage distribution
+#   factors of sensitivity.py instead, which are exact for the DC model, and only branch
+#   loadings are checked because DC voltages stay flat. The solver column tells which of them
+#   produced every row. Outages run in spawned worker processes.
+
+# Imports
+import os
+import multiprocessing as mp
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import networkx as nx
+import scipy.sparse as sp
+import pandapower as pp
+from pandapower.pd2ppc import _pd2ppc
+from pandapower.run import _init_runpp_options
+from pandapower.pypower.idx_bus import BASE_KV
+from pandapower.pypower.idx_brch import F_BUS, T_BUS
+from pandapower.pypower.idx_gen import GEN_BUS, GEN_STATUS, QG, QMAX, QMIN, VG
+from pandapower.pypower.bustypes import bustypes
+from pandapower.pypower.makeSbus import makeSbus
+from pandapower.pypower.makeYbus import makeYbus
+from sparse_nr import newtonRaphsonQLimits
+from network_cache import networkCache
+from simulator import loadNetwork, solveWithFallback
+from sensitivity import loadSensitivities, estimateOutageFlows
+
+# What every worker process keeps between outages
+workerState = {}
+
+def runContingencies(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str,
+                     genCsv: str, loadCsv: str, slacksCsv: str, method: str, maxIter,
+                     freq: float, sBase, workers: int = None) -> tuple[bool, str, dict]:
+
+    info = {'outages': 0, 'islanding': 0, 'diverged': 0, 'violating': 0, 'time': 0.0}
+    startTime = perf_counter()
+    try:
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        net = loadNetwork(projectPth, csvPaths, freq, sBase)
+
+        # Base case, every outage warm starts from it
+        init = 'flat'
+        seed = networkCache.loadWarmStart(projectPth, net)
+        if seed is not None:
+            net.res_bus, init = seed, 'results'
+        baseInfo = {}
+        try:
+            solveWithFallback(net, method, maxIter, init, baseInfo)
+        except pp.LoadflowNotConverged:
+            return False, 'Base case load flow did not converge', info
+        base = {'element': 'base', 'id': pd.NA, 'name': 'base case', 'status': 'converged',
+                'iterations': 0, 'solver': solverName(method, baseInfo), **checkLimits(net)}
+
+        # Outages that split off buses without a slack are not solved at all
+        outages = [('line', i) for i in net.line.index[net.line.in_service]] + \
+                  [('trafo', i) for i in net.trafo.index[net.trafo.in_service]]
+        islanding = islandingBranches(net)
+        toSolve = [outage for outage in outages if outage not in islanding]
+
+        results = []
+        if method == 'dc':
+            baseLimits, results = dcOutages(projectPth, net, toSolve)
+            base.update(baseLimits)
+        elif toSolve:
+            workers = workers or os.cpu_count() or 1
+            workers = max(1, min(workers, len(toSolve)))
+            chunk = max(1, len(toSolve) // (workers * 4))
+            model = buildOutageModel(net)
+            with ProcessPoolExecutor(max_workers = workers, mp_context = mp.get_context('spawn'),
+                                     initializer = initWorker,
+                                     initargs = (net, model, method, maxIter)) as executor:
+                results = list(executor.map(runOutage, toSolve, chunksize = chunk))
+        solved = dict(zip(toSolve, results))
+
+        rows = [base]
+        for element, index in outages:
+            row = {'element': element, 'id': index, 'name': net[element].name.at[index]}
+            if (element, index) in islanding:
+                row.update({'status': 'islanding', 'iterations': 0, 'solver': ''})
+            else:
+                row.update(solved[(element, index)])
+            rows.append(row)
+        info['outputs'] = writeResults(projectPth, rows)
+        info['outages'] = len(outages)
+        info['islanding'] = sum(row['status'] == 'islanding' for row in rows)
+        info['diverged'] = sum(row['status'] == 'diverged' for row in rows)
+        info['violating'] = sum(bool(row.get('violations')) for row in rows[1:])
+
+    except Exception as e:
+        return False, str(e), info
+
+    info['time'] = perf_counter() - startTime
+    return True, '', info
+
+# Name of the solver a load flow of method ran, as written in the solver column
+def solverName(method: str, info: dict) -> str:
+    if method == 'dc':
+        return 'dc'
+    if method == 'native' or (method == 'sweep' and not info.get('radial')):
+        return 'native'
+    if method == 'sweep':
+        return 'sweep'
+    return 'pandapower'
+
+# Limit checks of a DC solved net by its line outage distribution factors: (base case, one
+# row per outage). Both load the branches by the same MW ratings, the flat DC voltages are
+# not checked.
+def dcOutages(projectPth: str, net, outages: list) -> tuple[dict, list]:
+    sensitivities = loadSensitivities(projectPth, net)
+    flows = np.c_[sensitivities['flows'], estimateOutageFlows(sensitivities, outages).to_numpy()]
+    loadings = np.abs(flows) / sensitivities['ratings'][:, None] * 100
+    nLine = len(net.line)
+
+    def limits(loading: np.ndarray, outage: tuple = None) -> dict:
+        lineLoading = pd.Series(loading[:nLine], index = net.line.index)
+        trafoLoading = pd.Series(loading[nLine:], index = net.trafo.index)
+        if outage is not None:
+            element, index = outage
+            (lineLoading if element == 'line' else trafoLoading).at[index] = 0.0
+        return checkLimits(net, net.res_bus.vm_pu, lineLoading, trafoLoading, checkVoltages = False)
+
+    rows = []
+    for column, outage in enumerate(outages, start = 1):
+        if np.isnan(loadings[:, column]).all():
+            rows.append({'status': 'islanding', 'iterations': 0, 'solver': ''})
+        else:
+            rows.append({'status': 'converged', 'iterations': 0, 'solver': 'dc lodf',
+                         **limits(loadings[:, column], outage)})
+    return limits(loadings[:, 0]), rows
+
+# Branches whose outage leaves some in service bus without a path to a slack
+def islandingBranches(net) -> set:
+    graph = nx.MultiGraph()
+    graph.add_nodes_from(net.bus.index[net.bus.in_service])
+    for element, fromCol, toCol in (('line', 'from_bus', 'to_bus'), ('trafo', 'hv_bus', 'lv_bus')):
+        table = net[element][net[element].in_service]
+        for index, a, b in zip(table.index, table[fromCol], table[toCol]):
+            graph.add_edge(a, b, key = (element, index))
+    slackBuses = set(net.ext_grid.bus[net.ext_grid.in_service])
+
+    # Parallel branches can never split the network, so bridges of the simple graph suffice.
+    # Shrinking everything between bridges to one node gives a forest whose edges are the
+    # bridges, an outage islands if one side of its edge holds no slack.
+    simple = nx.Graph(graph)
+    bridges = [(a, b) for a, b in nx.bridges(simple) if graph.number_of_edges(a, b) == 1]
+    meshed = simple.copy()
+    meshed.remove_edges_from(bridges)
+    component = {}
+    for i, nodes in enumerate(nx.connected_components(meshed)):
+        component.update(dict.fromkeys(nodes, i))
+    tree = nx.Graph()
+    tree.add_nodes_from(set(component.values()))
+    for a, b in bridges:
+        tree.add_edge(component[a], component[b], key = next(iter(graph[a][b])))
+    slacks = {node: 0 for node in tree.nodes}
+    for bus in slackBuses:
+        if bus in component:
+            slacks[component[bus]] += 1
+
+    islanding = set()
+    for nodes in nx.connected_components(tree):
+        root = next(iter(nodes))
+        parents = nx.dfs_predecessors(tree, root)
+        below = dict(slacks)
+        for node in nx.dfs_postorder_nodes(tree, root):
+            if node in parents:
+                below[parents[node]] += below[node]
+        total = below[root]
+        for child, parent in parents.items():
+            if below[child] == 0 or below[child] == total:
+                islanding.add(tree[parent][child]['key'])
+
+    # Branches already on a dead island are islanding as well
+    for component in nx.connected_components(graph):
+        if not slackBuses & component:
+            for a, b, key in graph.subgraph(component).edges(keys = True):
+                islanding.add(key)
+    return islanding
+
+# Overloads and voltage violations, of the last pandapower solve unless values are given.
+# Without checkVoltages only the branch loadings are checked.
+def checkLimits(net, vm: pd.Series = None, lineLoading: pd.Series = None,
+                trafoLoading: pd.Series = None, checkVoltages: bool = True) -> dict:
+    vm = net.res_bus.vm_pu if vm is None else vm
+    loadings = {
+        'line': net.res_line.loading_percent if lineLoading is None else lineLoading,
+        'trafo': net.res_trafo.loading_percent if trafoLoading is None else trafoLoading,
+    }
+    violations = []
+    if checkVoltages:
+        high, low = vm > net.bus.max_vm_pu, vm < net.bus.min_vm_pu
+        limit = net.bus.max_vm_pu.where(high, net.bus.min_vm_pu)
+        violations += [('bus', index, 'vm_pu', value, bound) for index, value, bound in
+                       zip(net.bus.index[high | low], vm[high | low], limit[high | low])]
+    for element, loading in loadings.items():
+        limit = net[element].max_loading_percent if 'max_loading_percent' in net[element] \
+            else pd.Series(100.0, index = net[element].index)
+        limit = limit.fillna(100.0)
+        over = loading > limit
+        violations += [(element, index, 'loading_percent', value, bound) for index, value, bound in
+                       zip(net[element].index[over], loading[over], limit[over])]
+    return {
+        'minVm': float(vm.min()) if checkVoltages and len(vm) else np.nan,
+        'maxVm': float(vm.max()) if checkVoltages and len(vm) else np.nan,
+        'maxLineLoading': float(loadings['line'].max()) if len(loadings['line']) else np.nan,
+        'maxTrafoLoading': float(loadings['trafo'].max()) if len(loadings['trafo']) else np.nan,
+        'violations': violations,
+    }
+
+# Per unit model of the solved base case in pandapower's internal bus order, with what is
+# needed to turn branch currents back into loadings of the net's lines and transformers
+def buildOutageModel(net) -> dict:
+    # A base case of the native solvers never went through pandapower, which keeps the
+    # options its internal model is built with in the net
+    if not net.get('_options'):
+        _init_runpp_options(net, algorithm = 'nr', calculate_voltage_angles = 'auto', init = 'results',
+                            max_iteration = 'auto', tolerance_mva = 1e-8, trafo_model = 't',
+                            trafo_loading = 'current', enforce_q_lims = True,
+                            check_connectivity = True, voltage_depend_loads = True)
+    _, ppci = _pd2ppc(net)
+    baseMVA, bus, gen, branch = ppci['baseMVA'], ppci['bus'], ppci['gen'], ppci['branch']
+    ref, pv, pq = bustypes(bus, gen)
+    Sbus = makeSbus(baseMVA, bus, gen)
+
+    # Reactive limits of the net injection of every bus, summed over its generators
+    on = gen[:, GEN_STATUS] > 0
+    genBus = gen[on, GEN_BUS].astype(np.int64)
+    qMax = Sbus.imag + np.bincount(genBus, gen[on, QMAX] - gen[on, QG], len(bus)) / baseMVA
+    qMin = Sbus.imag + np.bincount(genBus, gen[on, QMIN] - gen[on, QG], len(bus)) / baseMVA
+
+    # Base case voltages, generator buses start again from their setpoints
+    busRows = net._pd2ppc_lookups['bus'][net.bus.index]
+    busIn = (busRows >= 0) & (busRows < len(bus))
+    V0 = np.ones(len(bus), dtype = complex)
+    vm = net.res_bus.vm_pu.to_numpy()
+    va = np.deg2rad(net.res_bus.va_degree.to_numpy())
+    V0[busRows[busIn]] = (vm * np.exp(1j * va))[busIn]
+    V0[genBus] = gen[on, VG] * V0[genBus] / np.abs(V0[genBus])
+
+    # Solving the base case again here leaves the generators that sit at a reactive limit as
+    # pq buses, so outages do not have to find those limits one more time each
+    Ybus, Yf, Yt = makeYbus(baseMVA, bus, branch)
+    V, converged, _, SbusLimited, pvLimited, pqLimited = newtonRaphsonQLimits(
+        Ybus, Sbus, V0, ref, pv, pq, qMin, qMax, maxIter = 30)
+    if converged:
+        V0, Sbus, pv, pq = V, SbusLimited, pvLimited, pqLimited
+
+    # Position of every line and transformer in the ppci branch table, -1 when left out
+    branchIs = ppci['internal']['branch_is']
+    ppciRow = np.cumsum(branchIs) - 1
+    rows = {}
+    for element in ('line', 'trafo'):
+        start, end = net._pd2ppc_lookups['branch'].get(element, (0, 0))
+        ppcRows = np.arange(start, end)
+        rows[element] = np.where(branchIs[ppcRows], ppciRow[ppcRows], -1)
+
+    line, trafo = net.line, net.trafo
+    return {
+        'baseMVA': baseMVA, 'bus': bus, 'branch': branch, 'Sbus': Sbus, 'V0': V0,
+        'Ybus': Ybus.tocsr(), 'Yf': Yf.tocsr(), 'Yt': Yt.tocsr(),
+        'ref': ref, 'pv': pv, 'pq': pq, 'qMin': qMin, 'qMax': qMax,
+        'busRows': busRows, 'busIn': busIn, 'lineRows': rows['line'], 'trafoRows': rows['trafo'],
+        'lineMaxKa': (line.max_i_ka * line.df * line.parallel).to_numpy(dtype = float),
+        'trafoVn': trafo[['vn_hv_kv', 'vn_lv_kv']].to_numpy(dtype = float),
+        'trafoScale': (np.sqrt(3) * 100 / (trafo.sn_mva * trafo.parallel * trafo.df)).to_numpy(dtype = float),
+    }
+
+# Solves one branch outage on the model, returns (vm, lineLoading, trafoLoading, iterations)
+# as arrays in net order or None if it does not converge
+def solveOutage(model: dict, element: str, position: int, maxIter) -> tuple:
+    branch, baseMVA = model['branch'], model['baseMVA']
+    Ybus, Yf, Yt = model['Ybus'], model['Yf'], model['Yt']
+
+    # Taking a branch out only removes its four entries from the base admittance matrix
+    row = model[f'{element}Rows'][position]
+    if row >= 0:
+        f, t = int(branch[row, F_BUS].real), int(branch[row, T_BUS].real)
+        removed = [Yf[row, f], Yf[row, t], Yt[row, f], Yt[row, t]]
+        Ybus = Ybus - sp.csr_matrix((removed, ([f, f, t, t], [f, t, f, t])), shape = Ybus.shape)
+    V, converged, iterations, *_ = newtonRaphsonQLimits(
+        Ybus, model['Sbus'], model['V0'], model['ref'], model['pv'], model['pq'],
+        model['qMin'], model['qMax'], maxIter = maxIter)
+    if not converged:
+        return None
+
+    vm = np.full(len(model['busRows']), np.nan)
+    vm[model['busIn']] = np.abs(V)[model['busRows'][model['busIn']]]
+    baseKv = model['bus'][:, BASE_KV]
+    iFrom = np.abs(Yf @ V) * baseMVA / (np.sqrt(3) * baseKv[branch[:, F_BUS].real.astype(np.int64)])
+    iTo = np.abs(Yt @ V) * baseMVA / (np.sqrt(3) * baseKv[branch[:, T_BUS].real.astype(np.int64)])
+
+    rows = model['lineRows']
+    lineLoading = np.full(len(rows), np.nan)
+    lineLoading[rows >= 0] = np.maximum(iFrom[rows[rows >= 0]], iTo[rows[rows >= 0]]) \
+        / model['lineMaxKa'][rows >= 0] * 100
+    rows = model['trafoRows']
+    trafoLoading = np.full(len(rows), np.nan)
+    trafoLoading[rows >= 0] = np.maximum(iFrom[rows[rows >= 0]] * model['trafoVn'][rows >= 0, 0],
+                                         iTo[rows[rows >= 0]] * model['trafoVn'][rows >= 0, 1]) \
+        * model['trafoScale'][rows >= 0]
+    if element == 'line':
+        lineLoading[position] = 0.0
+    else:
+        trafoLoading[position] = 0.0
+    return vm, lineLoading, trafoLoading, iterations
+
+# Runs once per worker, the network is shipped here and not with every outage
+def initWorker(net, model: dict, method: str, maxIter) -> None:
+    workerState['net'] = net
+    workerState['model'] = model
+    workerState['method'] = method
+    workerState['maxIter'] = maxIter
+    workerState['baseResBus'] = net.res_bus.copy()
+
+def runOutage(outage: tuple) -> dict:
+    element, index = outage
+    net = workerState['net']
+    solved = solveOutage(workerState['model'], element, net[element].index.get_loc(index),
+                         workerState['maxIter'])
+    if solved is not None:
+        vm, lineLoading, trafoLoading, iterations = solved
+        return {'status': 'converged', 'iterations': iterations, 'solver': 'sparse',
+                **checkLimits(net, pd.Series(vm, index = net.bus.index),
+                              pd.Series(lineLoading, index = net.line.index),
+                              pd.Series(trafoLoading, index = net.trafo.index))}
+
+    # Not converged on the model, a full load flow with the chosen algorithm decides
+    net[element].at[index, 'in_service'] = False
+    try:
+        net.res_bus = workerState['baseResBus'].copy()
+        stepInfo = {}
+        solveWithFallback(net, workerState['method'], workerState['maxIter'], 'results', stepInfo)
+        return {'status': 'converged', 'iterations': stepInfo['iterations'],
+                'solver': solverName(workerState['method'], stepInfo), **checkLimits(net)}
+    except (pp.LoadflowNotConverged, UserWarning):
+        return {'status': 'diverged', 'iterations': 0, 'solver': solverName(workerState['method'], {})}
+    finally:
+        net[element].at[index, 'in_service'] = True
+
+# One row per outage plus one row per violation found
+def writeResults(projectPth: str, rows: list) -> list:
+    summary = pd.DataFrame([{key: value for key, value in row.items() if key != 'violations'}
+                            for row in rows])
+    summary['id'] = summary['id'].astype('Int64')
+    summary['violations'] = [len(row.get('violations', [])) for row in rows]
+    violations = pd.DataFrame(
+        [{'outageElement': row['element'], 'outageId': row['id'], 'outageName': row['name'],
+          'element': element, 'id': index, 'quantity': quantity, 'value': value, 'limit': limit}
+         for row in rows for element, index, quantity, value, limit in row.get('violations', [])],
+        columns = ['outageElement', 'outageId', 'outageName', 'element', 'id', 'quantity',
+                   'value', 'limit'])
+    violations['outageId'] = violations['outageId'].astype('Int64')
+    summaryPath = os.path.join(projectPth, 'contingency_summary.csv')
+    violationsPath = os.path.join(projectPth, 'contingency_violations.csv')
+    summary.to_csv(summaryPath, index = False)
+    violations.to_csv(violationsPath, index = False)
+    return [summaryPath, violationsPath]
@@ -0,0 +1,251 @@
+#   Continuation power flow: PV (nose) curves with the load scaling as the parameter
+#
+#   Every load is scaled by (1 + lambda), optionally with the generators taking their share
+#   of the increase, and the slack picks up the rest. The curve is traced by pseudo arc
+#   length continuation in x = (angles of pv/pq buses, magnitudes of pq buses, lambda): a
+#   predictor along the tangent at the start and the secant through the last two points
+#   after it, and a corrector on F(x) = 0, t.(x - x_prev) = step, which passes the nose where
+#   plain load flows stop converging. The augmented Jacobian is factored once and its LU
+#   reused by the correctors of the following steps until they stop contracting, then it is
+#   refactored at the current point. The step grows or shrinks with the distance between
+#   predictor and corrector, so it is long on the flat part of the curve and short around
+#   the nose. Generators switch to pq at their reactive limits as the loading grows, a
+#   collapse caused by a switch is approached by halving the step.
+
+# Imports
+import os
+from time import perf_counter
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from sparse_nr import mismatch, jacobianPattern, jacobian, newtonRaphsonQLimits
+from native_solver import buildTables, branchModel, admittance, busModel, startVoltages
+from network_cache import networkCache
+
+CURVE_FILE = 'continuation_curve.csv'
+CRITICAL_FILE = 'continuation_critical.csv'
+
+def runContinuation(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str,
+                    genCsv: str, loadCsv: str, slacksCsv: str, maxIter, freq: float, sBase,
+                    scaleGens: bool = False, step: float = 0.1, minStep: float = 1e-4,
+                    maxStep: float = 1.0, errorTol: float = 1e-3, maxSteps: int = 500,
+                    stopFraction: float = 0.8, criticalCount: int = 5) -> tuple[bool, str, dict]:
+
+    info = {'steps': 0, 'lambdaMax': np.nan, 'marginMw': np.nan, 'noseReached': False,
+            'limitInduced': False, 'factorizations': 0, 'switchedGens': 0, 'time': 0.0}
+    startTime = perf_counter()
+    try:
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        net = buildTables(csvPaths, freq, sBase)
+        seed = networkCache.loadWarmStart(projectPth, net)
+        branches = branchModel(net)
+        Ybus, _, _ = admittance(branches, len(net.bus))
+        model = busModel(net, branches, None if seed is None else startVoltages(seed))
+
+        # Power drawn per unit of lambda
+        nBus = len(net.bus)
+        load = net.load
+        loadP = (load.p_mw * load.scaling).to_numpy(dtype = float)
+        Sdir = -(np.bincount(model['loadBus'], loadP, nBus)
+                 + 1j * np.bincount(model['loadBus'], (load.q_mvar * load.scaling).to_numpy(dtype = float), nBus))
+        if scaleGens:
+            Sdir = Sdir + np.bincount(model['genBus'], net.gen.p_mw.to_numpy(dtype = float), nBus)
+        Sdir = Sdir / net.sn_mva
+        if not np.any(Sdir):
+            raise ValueError('The project has no load to scale')
+
+        points, nose = traceCurve(Ybus, model, Sdir, maxIter, step, minStep, maxStep, errorTol,
+                                  maxSteps, stopFraction, info)
+        lambdaMax, noseV, tangent = nose
+        info['lambdaMax'] = lambdaMax
+        info['marginMw'] = lambdaMax * loadP.sum()
+        info['outputs'] = writeResults(projectPth, net, points, loadP.sum(),
+                                       model, noseV, tangent, criticalCount)
+        info['critical'] = pd.read_csv(info['outputs'][1]).id.tolist()
+
+    except Exception as e:
+        return False, str(e), info
+
+    info['time'] = perf_counter() - startTime
+    return True, '', info
+
+# x of a point in the layout of the current bus typing
+def pack(V: np.ndarray, lam: float, pvpq: np.ndarray, pq: np.ndarray) -> np.ndarray:
+    return np.r_[np.angle(V[pvpq]), np.abs(V[pq]), lam]
+
+def unpack(x: np.ndarray, V: np.ndarray, pvpq: np.ndarray, pq: np.ndarray) -> tuple:
+    Va, Vm = np.angle(V), np.abs(V)
+    Va[pvpq] = x[:len(pvpq)]
+    Vm[pq] = x[len(pvpq):-1]
+    return Vm * np.exp(1j * Va), x[-1]
+
+# LU of the Jacobian of the power mismatch extended by the lambda column and a last row
+def factorize(state: dict, V: np.ndarray, row: np.ndarray):
+    state['info']['factorizations'] += 1
+    J = jacobian(state['pattern'], V)
+    return splu(sp.bmat([[J, sp.csc_matrix(-state['dS'][:, None])],
+                         [sp.csc_matrix(row[None, :-1]), sp.csc_matrix(row[None, -1:])]], format = 'csc'))
+
+# Bus typing dependent parts of the state: pv/pq sets, Jacobian pattern and dF / dlambda
+def setTyping(state: dict, pv: np.ndarray, pq: np.ndarray) -> None:
+    state['pv'], state['pq'], state['pvpq'] = pv, pq, np.r_[pv, pq]
+    state['pattern'] = jacobianPattern(state['Ybus'], pv, pq)
+    Sdir = state['Sdir']
+    state['dS'] = np.r_[Sdir[state['pvpq']].real, Sdir[pq].imag]
+
+# Corrector from x towards F(x) = 0 and row.(x - anchor) = target, chord steps with lu and a
+# fresh factorization whenever they stop contracting. Returns (x, lu, converged).
+def correct(state: dict, x: np.ndarray, row: np.ndarray, anchor: np.ndarray, target: float, lu,
+            maxIter, tol: float = 1e-8) -> tuple:
+    pvpq, pq = state['pvpq'], state['pq']
+    V = state['V']
+    previous, fresh = np.inf, False
+    for _ in range(int(maxIter)):
+        V, lam = unpack(x, V, pvpq, pq)
+        G = np.r_[mismatch(state['Ybus'], V, state['Sbus'] + lam * state['Sdir'], pvpq, pq),
+                  row @ (x - anchor) - target]
+        size = np.linalg.norm(G, np.inf)
+        if size < tol:
+            return x, lu, True
+        if not np.isfinite(size):
+            return x, lu, False
+        if size > 0.5 * previous and not fresh:
+            lu, fresh = factorize(state, V, row), True
+        elif size > 0.5 * previous:
+            return x, lu, False
+        else:
+            fresh = False
+        previous = size
+        x = x + lu.solve(-G)
+    return x, lu, False
+
+# Generators beyond their reactive limits at the current point become pq buses held there,
+# returns whether any switched
+def switchGens(state: dict, V: np.ndarray, lam: float) -> bool:
+    pv = state['pv']
+    Q = (V * np.conj(state['Ybus'] @ V)).imag
+    grow = lam * state['Sdir'].imag
+    high = pv[Q[pv] > state['qMax'][pv] + grow[pv]]
+    low = pv[Q[pv] < state['qMin'][pv] + grow[pv]]
+    if not len(high) and not len(low):
+        return False
+    Sbus = state['Sbus']
+    Sbus[high] = Sbus[high].real + 1j * state['qMax'][high]
+    Sbus[low] = Sbus[low].real + 1j * state['qMin'][low]
+    state['info']['switchedGens'] += len(high) + len(low)
+    setTyping(state, np.setdiff1d(pv, np.r_[high, low]), np.sort(np.r_[state['pq'], high, low]))
+    return True
+
+# Unit tangent of the curve from a factorization whose last row is row, oriented along it
+def tangent(lu, size: int) -> np.ndarray:
+    e = np.zeros(size)
+    e[-1] = 1.0
+    t = lu.solve(e)
+    return t / np.linalg.norm(t)
+
+# Magnitude part of a tangent as one value per bus, 0 at slack and pv buses
+def busTangent(state: dict, t: np.ndarray, nBus: int) -> np.ndarray:
+    dVm = np.zeros(nBus)
+    dVm[state['pq']] = t[len(state['pvpq']):-1]
+    return dVm
+
+# Traces the curve from lambda = 0 past the nose, returns ([(lambda, V)], (lambda at the nose,
+# V there, bus tangent there))
+def traceCurve(Ybus, model: dict, Sdir: np.ndarray, maxIter, step: float, minStep: float,
+               maxStep: float, errorTol: float, maxSteps: int, stopFraction: float, info: dict) -> tuple:
+    V, converged, _, Sbus, pv, pq = newtonRaphsonQLimits(
+        Ybus, model['Sbus'], model['V0'], model['ref'], model['pv'], model['pq'], model['qMin'],
+        model['qMax'], maxIter = maxIter)
+    if not converged:
+        raise ValueError('Base case load flow did not converge')
+    nBus = len(V)
+    state = {'Ybus': Ybus, 'Sdir': Sdir, 'Sbus': Sbus.copy(), 'qMin': model['qMin'],
+             'qMax': model['qMax'], 'V': V, 'info': info}
+    setTyping(state, pv, pq)
+
+    # First tangent with lambda as the parameter
+    lam = 0.0
+    size = len(state['pvpq']) + len(pq) + 1
+    row = np.zeros(size)
+    row[-1] = 1.0
+    lu = factorize(state, V, row)
+    t = tangent(lu, size)
+    t = t if t[-1] > 0 else -t
+    points = [(lam, V.copy())]
+    nose = (lam, V.copy(), busTangent(state, t, nBus))
+    sigma = step
+    while info['steps'] < maxSteps:
+        xPrev = pack(V, lam, state['pvpq'], state['pq'])
+        xPred = xPrev + sigma * t
+        x, lu, converged = correct(state, xPred, t, xPrev, sigma, lu, maxIter)
+        if not converged:
+            sigma /= 2
+            if sigma < minStep:
+                break
+            lu = factorize(state, V, t)
+            continue
+        error = np.linalg.norm(x - xPred, np.inf)
+        Vc, lamC = unpack(x, V, state['pvpq'], state['pq'])
+
+        # The next predictor follows the secant through the last two points, the LU of the
+        # corrector may be from an earlier point and its tangent would be off by that much.
+        # Generators at their limits switch at fixed lambda; a point without a solution after
+        # the switch is past a limit induced collapse, which the step is halved towards.
+        tNew = (x - xPrev) / np.linalg.norm(x - xPrev)
+        typing = (state['pv'], state['pq'], state['Sbus'].copy(), info['switchedGens'])
+        state['V'] = Vc
+        if switchGens(state, Vc, lamC):
+            size = len(state['pvpq']) + len(state['pq']) + 1
+            row = np.zeros(size)
+            row[-1] = 1.0
+            x = pack(Vc, lamC, state['pvpq'], state['pq'])
+            lu = factorize(state, Vc, row)
+            x, lu, converged = correct(state, x, row, x, 0.0, lu, maxIter)
+            if not converged:
+                state['Sbus'], info['switchedGens'], state['V'] = typing[2], typing[3], V
+                setTyping(state, typing[0], typing[1])
+                sigma /= 2
+                if sigma < minStep:
+                    info['limitInduced'] = True
+                    break
+                lu = factorize(state, V, t)
+                continue
+            Vc, lamC = unpack(x, Vc, state['pvpq'], state['pq'])
+            state['V'] = Vc
+            lu = factorize(state, Vc, row)
+            tNew = tangent(lu, size)
+            tNew = tNew if (tNew[-1] > 0) == (t[-1] > 0) else -tNew
+        info['steps'] += 1
+        V, lam = Vc, lamC
+        points.append((lam, V.copy()))
+        if lam > nose[0]:
+            nose = (lam, V.copy(), busTangent(state, tNew, nBus))
+        elif tNew[-1] < 0:
+            info['noseReached'] = True
+        if lam < 0 or (info['noseReached'] and lam < stopFraction * nose[0]):
+            break
+        t = tNew
+        sigma = min(maxStep, max(minStep, sigma * min(2.0, max(0.5, np.sqrt(errorTol / max(error, 1e-12))))))
+    return points, nose
+
+# The curve with one vm column per bus, and the buses whose voltages fall fastest at the nose
+def writeResults(projectPth: str, net, points: list, baseLoadMw: float, model: dict,
+                 noseV: np.ndarray, busTangent: np.ndarray, criticalCount: int) -> list:
+    lams = np.array([lam for lam, _ in points])
+    vm = np.abs(np.array([V for _, V in points]))
+    vm[:, ~model['energized']] = np.nan
+    curve = pd.DataFrame(vm, columns = [f'vm_{id}' for id in net.bus.index])
+    curve.insert(0, 'load_mw', (1 + lams) * baseLoadMw)
+    curve.insert(0, 'lambda', lams)
+    curvePath = os.path.join(projectPth, CURVE_FILE)
+    curve.to_csv(curvePath, index_label = 'step')
+
+    order = np.argsort(-np.abs(busTangent))[:criticalCount]
+    order = order[np.abs(busTangent[order]) > 0]
+    critical = pd.DataFrame({'id': net.bus.index[order], 'name': net.bus.name.to_numpy()[order],
+                             'vm_base_pu': vm[0, order], 'vm_nose_pu': np.abs(noseV[order]),
+                             'sensitivity': np.abs(busTangent[order]) / np.abs(busTangent).max()})
+    criticalPath = os.path.join(projectPth, CRITICAL_FILE)
+    critical.to_csv(criticalPath, index = False)
+    return [curvePath, criticalPath]
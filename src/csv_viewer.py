@@ -1,13 +1,22 @@
 from PyQt6.QtWidgets import (QDialog, QTableWidget, QTableWidgetItem, 
-    QVBoxLayout, QHBoxLayout, QPushButton, QWidget, QLabel, QHeaderView, QTabWidget)
+    QVBoxLayout, QHBoxLayout, QPushButton, QWidget, QLabel, QHeaderView, QTabWidget, QMessageBox, QPlainTextEdit)
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPalette, QColor
 from csv import reader
+from os.path import basename, dirname, splitext
+from run_dialogs import describeSolve
+from run_profile import timingRows
 
 class CsvViewer(QDialog):
-    def __init__(self, parent: QWidget = None, csvPaths: dict = None, time = 0, theme: str = 'dark'):
+    def __init__(self, parent: QWidget = None, csvPaths: dict = None, time = 0, theme: str = 'dark',
+                 info: dict = None, resultsPath: str = None):
         super(CsvViewer, self).__init__(parent)
         
+        # With a results file the tabs are filled from it, the csv paths only name the tables
+        # and where they are exported to
+        self.csvPaths = csvPaths
+        self.resultsPath = resultsPath
+        
         self.theme = theme
         self.colors = {
             'dark': {
@@ -28,14 +37,19 @@ class CsvViewer(QDialog):
             }
         }
         
-        self.setWindowTitle('Simulation Results')
+        # Runs on a reduced network only have results inside the study area
+        reduced = bool(info and info.get('reduction'))
+        self.setWindowTitle('Simulation Results (reduced network)' if reduced else 'Simulation Results')
         self.setMinimumSize(1000, 700)
         
         # Create main layout
         mainLayout = QVBoxLayout(self)
         
         # Create execution time label
-        self.exeTimeLabel = QLabel(f'Load flow calculations took {time:.4f} seconds')
+        exeTimeText = f'Load flow calculations took {time:.4f} seconds'
+        if info:
+            exeTimeText += f' and {describeSolve(info)}'
+        self.exeTimeLabel = QLabel(exeTimeText)
         self.exeTimeLabel.setAlignment(Qt.AlignmentFlag.AlignLeft)
         
         # Create tab widget
@@ -47,8 +61,14 @@ class CsvViewer(QDialog):
         self.okButton = QPushButton('OK')
         self.okButton.clicked.connect(self.accept)
         
+        # Create export button, only needed when results are not written as csv
+        self.exportButton = QPushButton('Export CSV')
+        self.exportButton.clicked.connect(self.exportCsvs)
+        self.exportButton.setVisible(resultsPath is not None)
+        
         # Create button layout
         buttonLayout = QHBoxLayout()
+        buttonLayout.addWidget(self.exportButton)
         buttonLayout.addStretch()
         buttonLayout.addWidget(self.okButton)
         
@@ -63,9 +83,15 @@ class CsvViewer(QDialog):
         # Set window modality
         self.setWindowModality(Qt.WindowModality.ApplicationModal)
         
-        # Load CSVs if paths are provided
-        if csvPaths:
+        # Load results or CSVs if paths are provided
+        if csvPaths and resultsPath:
+            self.loadResults(csvPaths)
+        elif csvPaths:
             self.loadCsvs(csvPaths)
+        
+        # Phase timings and the profile report of the run
+        if info and info.get('timings'):
+            self.loadTimings(info)
 
     def styleDialog(self):
         c = self.colors['dark'] if self.theme == 'dark' else self.colors['light']
@@ -169,31 +195,72 @@ class CsvViewer(QDialog):
     def loadCsvs(self, csvPaths: dict):
         for tabName, path in csvPaths.items():
             try:
-                table = self.createTable()
-                
                 with open(path, 'r') as file:
                     csvReader = reader(file)
                     headers = next(csvReader)
                     data = list(csvReader)
-                
-                table.setColumnCount(len(headers))
-                table.setRowCount(len(data))
-                table.setHorizontalHeaderLabels(headers)
-                
-                for i, row in enumerate(data):
-                    for j, value in enumerate(row):
-                        item = QTableWidgetItem(value)
-                        item.setTextAlignment(int(Qt.AlignmentFlag.AlignCenter))
-                        table.setItem(i, j, item)
-                
-                table.resizeColumnsToContents()
-                self.tabWidget.addTab(table, tabName)
-                
+                self.addTable(tabName, headers, data)
+            except Exception as e:
+                self.addErrorTab(tabName, e)
+
+    # Same tables as loadCsvs, read from the results file in the layout of the old csvs
+    def loadResults(self, csvPaths: dict):
+        from results_store import openResults
+        for tabName, path in csvPaths.items():
+            try:
+                results = openResults(self.resultsPath)
+                name = splitext(basename(path))[0]
+                headers = [''] + results.columns[name]
+                columns = [results.index(name)] + [results.column(name, col) for col in headers[1:]]
+                data = [[str(value) for value in row] for row in zip(*columns)]
+                self.addTable(tabName, headers, data)
             except Exception as e:
-                print(f'Error loading CSV for {tabName}: {str(e)}')
-                errorWidget = QWidget()
-                errorLayout = QVBoxLayout(errorWidget)
-                errorLabel = QLabel(f'Error loading data: {str(e)}')
-                errorLabel.setStyleSheet('color: red;')
-                errorLayout.addWidget(errorLabel)
-                self.tabWidget.addTab(errorWidget, tabName)
+                self.addErrorTab(tabName, e)
+
+    def loadTimings(self, info: dict):
+        data = [[name, f'{seconds:.4f}', f'{share:.1f}']
+                for name, seconds, share in timingRows(info['timings'], info['totalTime'])]
+        self.addTable('Timings', ['Phase', 'Time (s)', 'Share (%)'], data)
+        if info.get('profileReport'):
+            report = QPlainTextEdit(info['profileReport'])
+            report.setReadOnly(True)
+            report.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+            report.setStyleSheet('font-family: monospace;')
+            self.tabWidget.addTab(report, 'Profile')
+
+    def addTable(self, tabName: str, headers: list, data: list):
+        table = self.createTable()
+        
+        table.setColumnCount(len(headers))
+        table.setRowCount(len(data))
+        table.setHorizontalHeaderLabels(headers)
+        
+        for i, row in enumerate(data):
+            for j, value in enumerate(row):
+                item = QTableWidgetItem(value)
+                item.setTextAlignment(int(Qt.AlignmentFlag.AlignCenter))
+                table.setItem(i, j, item)
+        
+        table.resizeColumnsToContents()
+        self.tabWidget.addTab(table, tabName)
+
+    def addErrorTab(self, tabName: str, e: Exception):
+        print(f'Error loading CSV for {tabName}: {str(e)}')
+        errorWidget = QWidget()
+        errorLayout = QVBoxLayout(errorWidget)
+        errorLabel = QLabel(f'Error loading data: {str(e)}')
+        errorLabel.setStyleSheet('color: red;')
+        errorLayout.addWidget(errorLabel)
+        self.tabWidget.addTab(errorWidget, tabName)
+
+    # Writes the shown tables as csv files next to the results file
+    def exportCsvs(self):
+        from results_store import exportCsv
+        projectPath = dirname(self.resultsPath)
+        tables = [splitext(basename(path))[0] for path in self.csvPaths.values()]
+        try:
+            paths = exportCsv(projectPath, tables)
+            self.exportButton.setText(f'Exported {len(paths)} CSVs')
+        except Exception as e:
+            print(f'Error exporting CSVs: {str(e)}')
+            QMessageBox.warning(self, 'Export CSV', f'Could not export the results: {str(e)}')
@@ -105,6 +105,8 @@ class Grid(QWidget):
         # Defaults
         self.freq = 50
         self.sBase = 100
+        self.lastRunInfo = None # iterations and init of the last solve
+        self.hostingCapacity = None # bus id -> (MW, binding limit) of the last hosting capacity run
 
         # Mouse Tracking for Hovering
         self.setMouseTracking(True)
@@ -933,8 +935,9 @@ class Grid(QWidget):
 
 
         # Drawing all the busbars here
-        for bus, (point, capacity, orient, points, _) in self.busses.items():
-            self.drawBusbar(painter, bus, point.x(), point.y(), capacity, orient)
+        for bus, (point, capacity, orient, points, id) in self.busses.items():
+            label, color = self.hostingOverlay(bus, id)
+            self.drawBusbar(painter, label, point.x(), point.y(), capacity, orient, color)
             self.update()
 
         # Drawing all the transfos here
@@ -1461,10 +1464,10 @@ class Grid(QWidget):
             self.update()
 
     def openRunDialog(self):
-        self.runSimDialog = RunSimDialog(self, self.freq, self.sBase, self.themeMode)
+        self.runSimDialog = RunSimDialog(self, self.freq, self.sBase, self.themeMode, self.lastRunInfo)
         self.runSimDialog.projectPath = self.projectPath
         self.runSimDialog.exec()
-        return self.runSimDialog.activatedMethod, self.runSimDialog.maxIter, self.runSimDialog.canceled, self.runSimDialog.freq, self.runSimDialog.sBase
+        return self.runSimDialog.activatedMethod, self.runSimDialog.maxIter, self.runSimDialog.canceled, self.runSimDialog.freq, self.runSimDialog.sBase, self.runSimDialog.warmStart, self.runSimDialog.timeBudget, self.runSimDialog.profile
 
     def setDrawingParams(self) -> None:
         if self.dist == 16:
@@ -1478,12 +1481,12 @@ class Grid(QWidget):
         elif self.dist == 256:
             self.drawingParams = [160, 96, 56, 192, 8, 16]
 
-    def drawBusbar(self, painter, bus, x, y, capacity, orient):
+    def drawBusbar(self, painter, bus, x, y, capacity, orient, color = None):
 
         # Draw the main bus line
         self.symbolPen = QPen()
         self.symbolPen.setWidth(self.lineWidth)
-        self.symbolPen.setColor(self.blue)
+        self.symbolPen.setColor(color or self.blue)
         painter.setPen(self.symbolPen)
         
         # Draw lines based on orientation
@@ -1545,6 +1548,17 @@ class Grid(QWidget):
             elif orient == '180':
                 currentX -= self.dist
 
+    # Label and color of a bus with the hosting capacity overlay, red for the least capacity
+    # of the run and green for the most
+    def hostingOverlay(self, bus: str, id: int):
+        if not self.hostingCapacity or id not in self.hostingCapacity:
+            return bus, None
+        capacity = self.hostingCapacity[id][0]
+        capacities = [mw for mw, _ in self.hostingCapacity.values()]
+        low, high = min(capacities), max(capacities)
+        share = (capacity - low) / (high - low) if high > low else 1.0
+        return f'{bus} ({capacity:.1f} MW)', QColor.fromHsv(int(120 * share), 220, 230)
+
     def drawGenerator(self, painter, x, y, orient):
 
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -1813,7 +1827,7 @@ class Grid(QWidget):
                 self.drawingParams[5], self.drawingParams[5]
             )
 
-    def viewResultCsv(self, paths, time):
+    def viewResultCsv(self, paths, time, info = None):
         csvPaths = {
             'Buses': paths['buses'],
             'Lines': paths['lines'],
@@ -1822,7 +1836,10 @@ class Grid(QWidget):
             'Generators': paths['gens'],
             'Slacks': paths['slacks'],
         }
-        self.csvViewer = CsvViewer(self, csvPaths, time, self.themeMode)
+        from project_files import RESULTS_FILE
+        resultsPath = self.projectPath + '/' + RESULTS_FILE
+        self.csvViewer = CsvViewer(self, csvPaths, time, self.themeMode, info,
+                                   resultsPath if isfile(resultsPath) else None)
         self.csvViewer.exec()
 
     def handleHandMode(self):
@@ -2334,121 +2351,113 @@ class Grid(QWidget):
         self.updateSlackGUICSVParams()
         self.updateGuiElementsCSV()
 
+    # Result row of an element by its id, from the results file of the last run or from the
+    # results csv of older projects, None when there is no result for it. The tables are
+    # indexed by element id, not in the order of the project csvs.
+    def resultRow(self, table: str, id: int):
+        from results_store import RESULTS_FILE, openResults
+        resultsPath = self.projectPath + '/' + RESULTS_FILE
+        if isfile(resultsPath):
+            results = openResults(resultsPath)
+            position = results.position(table, id)
+            return None if position is None else results.row(table, position)
+        csvPath = self.projectPath + f'/{table}.csv'
+        if isfile(csvPath):
+            with open(csvPath) as csvfile:
+                for row in DictReader(csvfile):
+                    if row.get('') == str(id):
+                        return row
+        return None
+
+    # Rows the last run left without results: elements outside a reduced study area or in an
+    # island that was not solved
+    def unsolved(self, row: dict) -> bool:
+        values = [value for value in row.values() if isinstance(value, float)]
+        return bool(values) and all(value != value for value in values)
+
     def handleAfterRun(self) -> None:
         # Handle Buses
-        csvPath = self.projectPath + '/results_buses.csv'
-        if isfile(csvPath):
-            for bus, (point, capacity, orient, points, id) in self.busses.items():
-                xRange = range(point.x() - self.dist, point.x() + self.dist)
-                yRange = range(point.y() - self.dist, point.y() + capacity * self.dist)
-                if self.highLightedPoint.x() in xRange and self.highLightedPoint.y() in yRange:
-                    # Open result bus csv
-                    with open(csvPath) as csvfile:
-                        reader = DictReader(csvfile)
-                        for idx, row in enumerate(reader): # this is temporary
-                            if idx + 1 == id:
-                                self.dataToShow = {
-                                    'Vm': f'{float(row['vm_pu']):.4f}' + ' (PU)',
-                                    'Va': f'{float(row['va_degree']):.4f}' + ' (Deg)',
-                                    'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
-                                    'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
-                                }
-                            else:
-                                continue
-                else:
-                    continue
+        for bus, (point, capacity, orient, points, id) in self.busses.items():
+            xRange = range(point.x() - self.dist, point.x() + self.dist)
+            yRange = range(point.y() - self.dist, point.y() + capacity * self.dist)
+            if self.highLightedPoint.x() in xRange and self.highLightedPoint.y() in yRange:
+                row = self.resultRow('results_buses', id)
+                if row is not None and self.unsolved(row):
+                    self.dataToShow = {'Result': 'none, not solved in the last run'}
+                elif row is not None:
+                    self.dataToShow = {
+                        'Vm': f'{float(row['vm_pu']):.4f}' + ' (PU)',
+                        'Va': f'{float(row['va_degree']):.4f}' + ' (Deg)',
+                        'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
+                        'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
+                    }
+                if self.hostingCapacity and id in self.hostingCapacity:
+                    capacity, limit = self.hostingCapacity[id]
+                    self.dataToShow = {**(self.dataToShow or {}),
+                                       'Hosting': f'{capacity:.2f} (MW), {limit}'}
 
         # Handle Trafos
-        csvPath = self.projectPath + '/results_trafos.csv'
-        if isfile(csvPath):
-            for trafo, (point, ori, hands, bus1, bus2) in self.trafos.items():
-                if self.highLightedPoint == point or self.highLightedPoint in hands:
-                    # Open result trafo csv
-                    with open(csvPath) as csvfile:
-                        reader = DictReader(csvfile)
-                        for idx, row in enumerate(reader): # this is temporary
-                            if idx + 1 == trafo:
-                                self.dataToShow = {
-                                    'P HV': f'{float(row['p_hv_mw']):.4f}' + ' (MW)',
-                                    'Q HV': f'{float(row['q_hv_mvar']):.4f}' + ' (MVAR)',
-                                    'P LV': f'{float(row['p_lv_mw']):.4f}' + ' (MW)',
-                                    'Q LV': f'{float(row['q_lv_mvar']):.4f}' + ' (MVAR)',
-                                    'P Loss': f'{float(row['pl_mw']):.4f}' + ' (MW)',
-                                    'Q Loss': f'{float(row['ql_mvar']):.4f}' + ' (MVAR)',
-                                    'I HV': f'{float(row['i_hv_ka']):.4f}' + ' (kA)',
-                                    'I LV': f'{float(row['i_lv_ka']):.4f}' + ' (kA)',
-                                    'Vm HV': f'{float(row['vm_hv_pu']):.4f}' + ' (PU)',
-                                    'Va HV': f'{float(row['va_hv_degree']):.4f}' + ' (Deg)',
-                                    'Vm LV': f'{float(row['vm_lv_pu']):.4f}' + ' (PU)',
-                                    'Va LV': f'{float(row['va_lv_degree']):.4f}' + ' (Deg)',
-                                    'Loading': f'{float(row['loading_percent']):.2f}' + ' (%)',
-                                }
-                            else:
-                                continue
-                else:
-                    continue
+        for trafo, (point, ori, hands, bus1, bus2) in self.trafos.items():
+            if self.highLightedPoint == point or self.highLightedPoint in hands:
+                row = self.resultRow('results_trafos', trafo)
+                if row is not None and self.unsolved(row):
+                    self.dataToShow = {'Result': 'none, not solved in the last run'}
+                elif row is not None:
+                    self.dataToShow = {
+                        'P HV': f'{float(row['p_hv_mw']):.4f}' + ' (MW)',
+                        'Q HV': f'{float(row['q_hv_mvar']):.4f}' + ' (MVAR)',
+                        'P LV': f'{float(row['p_lv_mw']):.4f}' + ' (MW)',
+                        'Q LV': f'{float(row['q_lv_mvar']):.4f}' + ' (MVAR)',
+                        'P Loss': f'{float(row['pl_mw']):.4f}' + ' (MW)',
+                        'Q Loss': f'{float(row['ql_mvar']):.4f}' + ' (MVAR)',
+                        'I HV': f'{float(row['i_hv_ka']):.4f}' + ' (kA)',
+                        'I LV': f'{float(row['i_lv_ka']):.4f}' + ' (kA)',
+                        'Vm HV': f'{float(row['vm_hv_pu']):.4f}' + ' (PU)',
+                        'Va HV': f'{float(row['va_hv_degree']):.4f}' + ' (Deg)',
+                        'Vm LV': f'{float(row['vm_lv_pu']):.4f}' + ' (PU)',
+                        'Va LV': f'{float(row['va_lv_degree']):.4f}' + ' (Deg)',
+                        'Loading': f'{float(row['loading_percent']):.2f}' + ' (%)',
+                    }
 
         # Handle Gens
-        csvPath = self.projectPath + '/results_gens.csv'
-        if isfile(csvPath):
-            for gen, (point, ori, hand) in self.gens.items():
-                if self.highLightedPoint == point or self.highLightedPoint == hand:
-                    # Open result gen csv
-                    with open(csvPath) as csvfile:
-                        reader = DictReader(csvfile)
-                        for idx, row in enumerate(reader): # this is temporary
-                            if idx + 1 == gen:
-                                self.dataToShow = {
-                                    'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
-                                    'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
-                                    'Vm': f'{float(row['vm_pu']):.4f}' + ' (PU)',
-                                    'Va': f'{float(row['va_degree']):.4f}' + ' (Deg)',
-                                }
-                            else:
-                                continue
-                else:
-                    continue
-
+        for gen, (point, ori, hand) in self.gens.items():
+            if self.highLightedPoint == point or self.highLightedPoint == hand:
+                row = self.resultRow('results_gens', gen)
+                if row is not None and self.unsolved(row):
+                    self.dataToShow = {'Result': 'none, not solved in the last run'}
+                elif row is not None:
+                    self.dataToShow = {
+                        'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
+                        'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
+                        'Vm': f'{float(row['vm_pu']):.4f}' + ' (PU)',
+                        'Va': f'{float(row['va_degree']):.4f}' + ' (Deg)',
+                    }
 
         # Handle Loads
-        csvPath = self.projectPath + '/results_loads.csv'
-        if isfile(csvPath):
-            for load, (point, ori, hand) in self.loads.items():
-                centroid = self.centroidMaker(point, ori)
-                if self.highLightedPoint == point or self.highLightedPoint == centroid :
-                    # Open result load csv
-                    with open(csvPath) as csvfile:
-                        reader = DictReader(csvfile)
-                        for idx, row in enumerate(reader): # this is temporary
-                            if idx + 1 == load:
-                                self.dataToShow = {
-                                    'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
-                                    'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
-                                }
-                            else:
-                                continue
-                else:
-                    continue
+        for load, (point, ori, hand) in self.loads.items():
+            centroid = self.centroidMaker(point, ori)
+            if self.highLightedPoint == point or self.highLightedPoint == centroid :
+                row = self.resultRow('results_loads', load)
+                if row is not None and self.unsolved(row):
+                    self.dataToShow = {'Result': 'none, not solved in the last run'}
+                elif row is not None:
+                    self.dataToShow = {
+                        'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
+                        'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
+                    }
 
         # Handle Slacks
-        csvPath = self.projectPath + '/results_slacks.csv'
-        if isfile(csvPath):
-            for slack, (point, ori, hand) in self.slacks.items():
-                centroid = self.centroidMaker(point, ori)
-                if self.highLightedPoint == point or self.highLightedPoint == centroid :
-                    # Open result slack csv
-                    with open(csvPath) as csvfile:
-                        reader = DictReader(csvfile)
-                        for idx, row in enumerate(reader): # this is temporary
-                            if idx + 1 == slack:
-                                self.dataToShow = {
-                                    'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
-                                    'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
-                                }
-                            else:
-                                continue
-                else:
-                    continue
+        for slack, (point, ori, hand) in self.slacks.items():
+            centroid = self.centroidMaker(point, ori)
+            if self.highLightedPoint == point or self.highLightedPoint == centroid :
+                row = self.resultRow('results_slacks', slack)
+                if row is not None and self.unsolved(row):
+                    self.dataToShow = {'Result': 'none, not solved in the last run'}
+                elif row is not None:
+                    self.dataToShow = {
+                        'P': f'{float(row['p_mw']):.4f}' + ' (MW)',
+                        'Q': f'{float(row['q_mvar']):.4f}' + ' (MVAR)',
+                    }
 
     def drawInfoBox(self, painter: QPainter) -> None:
 
@@ -1,15 +1,51 @@
 # Main GUI setup and window management
 
 # Imports
-from csv import DictWriter
-from time import perf_counter
+from csv import DictReader, DictWriter
+from time import perf_counter, time
+from importlib import import_module
+from threading import Thread
 from grid import Grid
-from simulator import runLoadFlow 
+from run_profile import PHASES
+from solver_process import SolverProcess
 from PyQt6.QtCore import QSize
 from start_window import StartUp
-from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtCore import Qt, QPoint, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QAction, QIcon, QCursor, QPixmap, QColor
-from PyQt6.QtWidgets import QHBoxLayout, QMainWindow, QStatusBar, QVBoxLayout, QWidget, QToolButton
+from PyQt6.QtWidgets import QHBoxLayout, QMainWindow, QStatusBar, QVBoxLayout, QWidget, QToolButton, QMessageBox, QInputDialog, QProgressDialog
+from os.path import isfile
+
+# What the progress dialog shows during each phase of a run
+PHASE_LABELS = {
+    'parsing': 'Parsing CSVs...',
+    'building': 'Building the network...',
+    'solving': 'Solving...',
+    'writing': 'Writing results...',
+}
+
+# Modules of the studies that run in the GUI process. They pull in numpy, pandas, scipy and
+# pandapower, so they are imported by the methods that need them and in the background once
+# the window shows, not before the window can appear.
+PRELOAD_MODULES = ['results_store', 'timeseries', 'hosting_capacity', 'continuation']
+
+# Runs a study function off the GUI thread, done carries its (success, error, info). With
+# steps the study also gets progress(done, total), sent on as the progress signal, and
+# canceled(), true once the GUI asked the thread to stop.
+class StudyThread(QThread):
+    done = pyqtSignal(bool, str, object)
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, study, *args, parent = None, steps: bool = False) -> None:
+        super().__init__(parent)
+        self.study = study
+        self.args = args
+        self.kwargs = {'progress': self.progress.emit, 'canceled': self.isInterruptionRequested} if steps else {}
+
+    def run(self) -> None:
+        try:
+            self.done.emit(*self.study(*self.args, **self.kwargs))
+        except Exception as e:
+            self.done.emit(False, str(e), {})
 
 # Main Window Object
 class MainWindow(QMainWindow):
@@ -39,12 +75,19 @@ class MainWindow(QMainWindow):
             }
         }
         self.projectPath = None
+
+        # The solver process starts first and warms the numba JIT up while a project is picked
+        self.solver = SolverProcess()
+        self.solver.start(jitWarmUp = True)
+        self.warmUpStart = time()
         self.startUp = StartUp(self)
         self.buttSize = 26
         if self.projectPath is None:
             self.startUp.exec()
             if not self.startUp.nameError:
                 self.projectPath = self.startUp.projectPath
+        self.startupTimings = {'dialog': time() - self.warmUpStart}
+        self.reportWarmUp()
 
         # Layouts
         self.mainLayout = QHBoxLayout()
@@ -137,6 +180,53 @@ class MainWindow(QMainWindow):
         fdButton.triggered.connect(self.fdLoadFlow)
         loadFlowMenu.addAction(fdButton)
         loadFlowMenu.addSeparator()
+
+        # Run Time Series Button
+        tsButton = QAction('Run Time Series', self)
+        tsButton.setStatusTip('Run the load flow for every timestep of LoadProfiles.csv / GenProfiles.csv')
+        tsButton.triggered.connect(self.runTimeSeries)
+        loadFlowMenu.addAction(tsButton)
+
+        # Run Probabilistic Load Flow Button
+        plfButton = QAction('Run Probabilistic Load Flow', self)
+        plfButton.setStatusTip('Sample the load and generator powers of Distributions.csv and report percentile bands')
+        plfButton.triggered.connect(self.runProbabilistic)
+        loadFlowMenu.addAction(plfButton)
+        loadFlowMenu.addSeparator()
+
+        # Run Hosting Capacity Button
+        hcButton = QAction('Run Hosting Capacity', self)
+        hcButton.setStatusTip('Find how much generation or load every bus takes before a limit is violated')
+        hcButton.triggered.connect(self.runHostingCapacity)
+        loadFlowMenu.addAction(hcButton)
+
+        # Clear Hosting Capacity Button
+        hcClearButton = QAction('Clear Hosting Capacity Overlay', self)
+        hcClearButton.setStatusTip('Draw the buses without their hosting capacity colors')
+        hcClearButton.triggered.connect(self.clearHostingCapacity)
+        loadFlowMenu.addAction(hcClearButton)
+        loadFlowMenu.addSeparator()
+
+        # Run Continuation Power Flow Button
+        cpfButton = QAction('Run Continuation Power Flow', self)
+        cpfButton.setStatusTip('Trace the PV curve of growing load up to the voltage collapse point')
+        cpfButton.triggered.connect(self.runContinuation)
+        loadFlowMenu.addAction(cpfButton)
+        loadFlowMenu.addSeparator()
+
+        # Run Contingency Analysis Button
+        n1Button = QAction('Run N-1 Contingency Analysis', self)
+        n1Button.setStatusTip('Take every line and transformer out in turn and check the limits')
+        n1Button.triggered.connect(self.runContingencies)
+        loadFlowMenu.addAction(n1Button)
+        loadFlowMenu.addSeparator()
+
+        # Study Area Button
+        studyButton = QAction('Set Study Area Zones', self)
+        studyButton.setStatusTip('Replace the network outside the chosen zones by a Ward equivalent in load flows')
+        studyButton.triggered.connect(self.setStudyArea)
+        loadFlowMenu.addAction(studyButton)
+        loadFlowMenu.addSeparator()
         
         # View Toolbox
         self.barWidget = QWidget()
@@ -398,6 +488,47 @@ class MainWindow(QMainWindow):
             background-color: #23272a;
         ''')
 
+        # Load flows run in the solver process, it is polled while a run is going
+        self.solverTimer = QTimer(self)
+        self.solverTimer.setInterval(50)
+        self.solverTimer.timeout.connect(self.pollRun)
+        self.runProgress = None
+        self.runBudget = 0.0
+        self.runStart = 0.0
+        self.runKey = None
+        # Studies other than single load flows run one at a time on a StudyThread
+        self.studyThread = None
+        self.studyProgress = None
+        self.studyFinish = None
+        QTimer.singleShot(0, self.preloadModules)
+
+    # Startup instrumentation: whether the JIT warm-up was done by the time the project was
+    # open, or by the first run. Keeps the answer in startupTimings.
+    def reportWarmUp(self) -> None:
+        self.solver.poll()
+        if self.solver.warmUp is None:
+            self.startupTimings['warmUpInTime'] = False
+            print(f'-> JIT warm-up still running {time() - self.warmUpStart:.2f} s after it started.')
+            return
+        success, error, info = self.solver.warmUp
+        self.startupTimings.update(warmUp = info['seconds'], warmUpInTime = success)
+        if not success:
+            print(f'-> JIT warm-up failed, the first run compiles: {error}')
+            return
+        print(f'-> JIT warm-up done in {info["seconds"]:.2f} s, {time() - info["finishedAt"]:.2f} s before it was needed '
+              f'({info["functions"]} functions cached in {info["cacheDir"]}).')
+
+    # Imports PRELOAD_MODULES on a background thread, a study started before it is done waits
+    # for the module it needs at its own import
+    def preloadModules(self) -> None:
+        def preload() -> None:
+            startTime = perf_counter()
+            for name in PRELOAD_MODULES:
+                import_module(name)
+            self.startupTimings['preload'] = perf_counter() - startTime
+            print(f'-> Numerical modules loaded in the background in {self.startupTimings["preload"]:.2f} s.')
+        Thread(target = preload, daemon = True).start()
+
     def makeProject(self) -> None:
         pass
 
@@ -429,9 +560,12 @@ class MainWindow(QMainWindow):
         pass
 
     def run(self) -> None:
+        if self.solver.running:
+            self.grid.showError('A load flow is already running.')
+            return
         # Takes chosen method from dialog chosen by user
         self.grid.afterRun = True
-        method, maxIter, canceled, freq, sBase = self.grid.openRunDialog()
+        method, maxIter, canceled, freq, sBase, warmStart, timeBudget, profile = self.grid.openRunDialog()
         if not canceled:
             # Passing data csvs to the simulator
             busCsvPath = self.projectPath + '/Buses.csv'
@@ -440,32 +574,322 @@ class MainWindow(QMainWindow):
             genCSV = self.projectPath + '/Gens.csv'
             loadCSV = self.projectPath + '/Loads.csv'
             slacksCSV = self.projectPath + '/Slacks.csv'
-            # Run load flow Simulation
-            startTime = perf_counter()
-            success, error_msg = runLoadFlow(self.projectPath,
+            # An identical earlier run is shown from its stored results without solving,
+            # profiled runs always solve
+            from result_cache import resultKey, lookupResults
+            self.runStart = perf_counter()
+            self.runKey = None if profile else resultKey(
+                self.projectPath, [busCsvPath, lineCSV, trafoCSV, genCSV, loadCSV, slacksCSV],
+                method, maxIter, freq, sBase)
+            info = lookupResults(self.projectPath, self.runKey)
+            if info is not None:
+                self.runKey = None
+                self.finishRun(True, '', dict(info, memoized = True))
+                return
+            # Run load flow Simulation in the solver process, pollRun picks up the results
+            if self.solver.warmUp is None:
+                self.reportWarmUp()
+            self.runBudget = timeBudget
+            self.solver.submit(self.projectPath,
                                 busCsvPath, lineCSV, trafoCSV, genCSV, loadCSV, slacksCSV,
-                                method, maxIter, freq, sBase)
-            executionTime = perf_counter() - startTime
-            print(f'Function took {executionTime:.4f} seconds')
-            # Show results
-            busResultsPath = self.projectPath + '/results_buses.csv'
-            lineResultsPath = self.projectPath + '/results_lines.csv'
-            trafoResultsPath = self.projectPath + '/results_trafos.csv'
-            loadsResultsPath = self.projectPath + '/results_loads.csv'
-            slacksResultsPath = self.projectPath + '/results_slacks.csv'
-            gensResultsPath = self.projectPath + '/results_gens.csv'
-            paths = {
-                'lines': lineResultsPath,
-                'buses': busResultsPath,
-                'transformers': trafoResultsPath,
-                'loads': loadsResultsPath,
-                'gens': gensResultsPath,
-                'slacks': slacksResultsPath,
-            }
-            if success:
-                self.grid.viewResultCsv(paths, executionTime) 
+                                method, maxIter, freq, sBase, warmStart, profile = profile)
+            self.runProgress = QProgressDialog('Starting the solver...', 'Cancel', 0, len(PHASES), self)
+            self.runProgress.setWindowTitle('Running Load Flow')
+            self.runProgress.setWindowModality(Qt.WindowModality.NonModal)
+            self.runProgress.setMinimumDuration(0)
+            self.runProgress.setAutoClose(False)
+            self.runProgress.setAutoReset(False)
+            self.runProgress.canceled.connect(self.cancelRun)
+            self.runProgress.show()
+            self.solverTimer.start()
+
+    def pollRun(self) -> None:
+        for kind, payload in self.solver.poll():
+            if kind == 'phase':
+                self.runProgress.setValue(PHASES.index(payload))
+                self.runProgress.setLabelText(PHASE_LABELS[payload])
             else:
-                self.grid.showError(error_msg)
+                self.finishRun(*payload)
+                return
+        if self.runBudget > 0 and self.solver.elapsed() > self.runBudget:
+            self.solver.cancel()
+            self.finishRun(False, f'Load flow canceled, it ran longer than its time budget of {self.runBudget:g} seconds.', {})
+
+    def cancelRun(self) -> None:
+        if self.solver.running:
+            self.solver.cancel()
+            self.finishRun(False, '', {})
+            self.statusBar.showMessage('Load flow canceled.', 5000)
+
+    def finishRun(self, success: bool, error_msg: str, info: dict) -> None:
+        self.solverTimer.stop()
+        executionTime = perf_counter() - self.runStart
+        print(f'Function took {executionTime:.4f} seconds')
+        if self.runProgress is not None:
+            self.runProgress.canceled.disconnect(self.cancelRun)
+            self.runProgress.close()
+            self.runProgress = None
+        # Show results
+        busResultsPath = self.projectPath + '/results_buses.csv'
+        lineResultsPath = self.projectPath + '/results_lines.csv'
+        trafoResultsPath = self.projectPath + '/results_trafos.csv'
+        loadsResultsPath = self.projectPath + '/results_loads.csv'
+        slacksResultsPath = self.projectPath + '/results_slacks.csv'
+        gensResultsPath = self.projectPath + '/results_gens.csv'
+        paths = {
+            'lines': lineResultsPath,
+            'buses': busResultsPath,
+            'transformers': trafoResultsPath,
+            'loads': loadsResultsPath,
+            'gens': gensResultsPath,
+            'slacks': slacksResultsPath,
+        }
+        if success:
+            if self.runKey is not None:
+                from result_cache import storeResults
+                storeResults(self.projectPath, self.runKey, info)
+                self.runKey = None
+            self.grid.lastRunInfo = info
+            self.grid.viewResultCsv(paths, executionTime, info)
+        elif error_msg:
+            self.grid.showError(error_msg)
+
+    def closeEvent(self, event) -> None:
+        if self.solver.running:
+            self.solver.cancel()
+        self.solver.stop()
+        if self.studyThread is not None:
+            self.studyThread.requestInterruption()
+            self.studyThread.wait()
+        super().closeEvent(event)
+
+    # Runs study with args on a StudyThread behind a progress dialog, finish gets the info of
+    # a successful run. Studies with steps show them and can be canceled.
+    def startStudy(self, title: str, study, args: tuple, finish, steps: bool = False) -> bool:
+        if self.studyThread is not None:
+            self.grid.showError('A study is already running.')
+            return False
+        self.studyThread = StudyThread(study, *args, parent = self, steps = steps)
+        self.studyThread.progress.connect(self.showStudyProgress)
+        self.studyThread.done.connect(self.finishStudy)
+        self.studyFinish = finish
+        self.studyProgress = QProgressDialog(f'Running {title.lower()}...', 'Cancel', 0, 0, self)
+        self.studyProgress.setWindowTitle(title)
+        self.studyProgress.setWindowModality(Qt.WindowModality.NonModal)
+        self.studyProgress.setMinimumDuration(0)
+        self.studyProgress.setAutoClose(False)
+        self.studyProgress.setAutoReset(False)
+        if steps:
+            self.studyProgress.canceled.connect(self.studyThread.requestInterruption)
+        else:
+            self.studyProgress.setCancelButton(None)
+        self.studyProgress.show()
+        self.studyThread.start()
+        return True
+
+    def showStudyProgress(self, done: int, total: int) -> None:
+        if self.studyProgress is not None and not self.studyProgress.wasCanceled():
+            self.studyProgress.setMaximum(total)
+            self.studyProgress.setValue(done)
+            self.studyProgress.setLabelText(f'{self.studyProgress.windowTitle()}: step {done + 1} of {total}')
+
+    def finishStudy(self, success: bool, error_msg: str, info: dict) -> None:
+        title = self.studyProgress.windowTitle()
+        self.studyThread.wait()
+        self.studyThread = None
+        self.studyProgress.close()
+        self.studyProgress = None
+        finish, self.studyFinish = self.studyFinish, None
+        if success:
+            finish(info)
+        elif error_msg:
+            self.grid.showError(error_msg)
+        else:
+            self.statusBar.showMessage(f'{title} canceled.', 5000)
+
+    def runTimeSeries(self) -> None:
+        from timeseries import runTimeSeries, LOAD_PROFILES, GEN_PROFILES
+        # Profiles are read from the project folder
+        loadProfiles = self.projectPath + '/' + LOAD_PROFILES
+        genProfiles = self.projectPath + '/' + GEN_PROFILES
+        loadProfiles = loadProfiles if isfile(loadProfiles) else None
+        genProfiles = genProfiles if isfile(genProfiles) else None
+        if loadProfiles is None and genProfiles is None:
+            self.grid.showError(f'Put a {LOAD_PROFILES} and/or {GEN_PROFILES} in the project folder to run a time series.')
+            return
+        modes = ['Multipliers of the project values', 'Absolute values (MW / MVAr)']
+        modeName, ok = QInputDialog.getItem(self, 'Profile Values', 'Profile values are:', modes, 0, False)
+        if not ok:
+            return
+        method, maxIter, canceled, freq, sBase, warmStart, _, _ = self.grid.openRunDialog()
+        if canceled:
+            return
+        self.startStudy('Time Series', runTimeSeries, (self.projectPath,
+                        self.projectPath + '/Buses.csv', self.projectPath + '/Lines.csv',
+                        self.projectPath + '/Trafos.csv', self.projectPath + '/Gens.csv',
+                        self.projectPath + '/Loads.csv', self.projectPath + '/Slacks.csv',
+                        method, maxIter, freq, sBase, loadProfiles, genProfiles,
+                        'scale' if modeName == modes[0] else 'absolute', 500, warmStart),
+                        self.finishTimeSeries, steps = True)
+
+    def finishTimeSeries(self, info: dict) -> None:
+        QMessageBox.information(self, 'Time Series Finished',
+            f'{info["converged"]} of {info["steps"]} timesteps converged in {info["time"]:.2f} seconds '
+            f'({info["iterations"]} iterations).\n'
+            f'Results were written to the timeseries_*.csv files in the project folder.')
+
+    def runProbabilistic(self) -> None:
+        from probabilistic import runProbabilistic, DISTRIBUTIONS_FILE
+        distributions = self.projectPath + '/' + DISTRIBUTIONS_FILE
+        if not isfile(distributions):
+            self.grid.showError(f'Put a {DISTRIBUTIONS_FILE} in the project folder to run a probabilistic load flow.')
+            return
+        # Empirical distributions draw from the profile csvs, whose values need a meaning
+        profileMode = 'scale'
+        with open(distributions) as csvfile:
+            if any(row.get('dist') == 'empirical' for row in DictReader(csvfile)):
+                modes = ['Multipliers of the project values', 'Absolute values (MW / MVAr)']
+                modeName, ok = QInputDialog.getItem(self, 'Profile Values', 'Profile values are:', modes, 0, False)
+                if not ok:
+                    return
+                profileMode = 'scale' if modeName == modes[0] else 'absolute'
+        maxSamples, ok = QInputDialog.getInt(self, 'Probabilistic Load Flow', 'Most samples to draw:',
+                                             20000, 100, 10000000, 1000)
+        if not ok:
+            return
+        _, maxIter, canceled, freq, sBase, _, _, _ = self.grid.openRunDialog()
+        if canceled:
+            return
+        self.startStudy('Probabilistic Load Flow', runProbabilistic, (self.projectPath,
+                        self.projectPath + '/Buses.csv', self.projectPath + '/Lines.csv',
+                        self.projectPath + '/Trafos.csv', self.projectPath + '/Gens.csv',
+                        self.projectPath + '/Loads.csv', self.projectPath + '/Slacks.csv',
+                        maxIter, freq, sBase, distributions, profileMode, (5, 50, 95), 500,
+                        min(500, maxSamples), maxSamples),
+                        self.finishProbabilistic, steps = True)
+
+    def finishProbabilistic(self, info: dict) -> None:
+        stop = 'the percentiles settled' if info['stoppedEarly'] else 'the sample limit was reached'
+        QMessageBox.information(self, 'Probabilistic Load Flow Finished',
+            f'{info["converged"]} of {info["samples"]} samples converged in {info["time"]:.2f} seconds, '
+            f'sampling stopped after {info["rounds"]} rounds as {stop}.\n'
+            f'Results were written to the probabilistic_*.csv files in the project folder.')
+
+    def runHostingCapacity(self) -> None:
+        from hosting_capacity import runHostingCapacity
+        modes = ['Generation (PV) injected at the bus', 'Load drawn at the bus']
+        modeName, ok = QInputDialog.getItem(self, 'Hosting Capacity', 'Capacity for:', modes, 0, False)
+        if not ok:
+            return
+        maxMw, ok = QInputDialog.getDouble(self, 'Hosting Capacity', 'Largest power to check (MW):',
+                                           100.0, 0.1, 1e6, 1)
+        if not ok:
+            return
+        busNames, ok = QInputDialog.getText(self, 'Hosting Capacity',
+                                            'Bus names separated by commas (empty for every bus):')
+        if not ok:
+            return
+        buses = None
+        if busNames.strip():
+            names = [name.strip() for name in busNames.split(',') if name.strip()]
+            unknown = [name for name in names if name not in self.grid.busses]
+            if unknown:
+                self.grid.showError(f'There is no bus named {unknown[0]}.')
+                return
+            buses = [self.grid.busses[name][4] for name in names]
+        _, maxIter, canceled, freq, sBase, _, _, _ = self.grid.openRunDialog()
+        if canceled:
+            return
+        self.startStudy('Hosting Capacity', runHostingCapacity, (self.projectPath,
+                        self.projectPath + '/Buses.csv', self.projectPath + '/Lines.csv',
+                        self.projectPath + '/Trafos.csv', self.projectPath + '/Gens.csv',
+                        self.projectPath + '/Loads.csv', self.projectPath + '/Slacks.csv',
+                        maxIter, freq, sBase, buses, 'gen' if modeName == modes[0] else 'load', maxMw),
+                        self.finishHostingCapacity)
+
+    def finishHostingCapacity(self, info: dict) -> None:
+        self.grid.hostingCapacity = {id: (capacity, info['limit'][id]) for id, capacity in info['capacity'].items()}
+        self.grid.update()
+        QMessageBox.information(self, 'Hosting Capacity Finished',
+            f'Hosting capacity of {info["buses"]} buses found in {info["time"]:.2f} seconds.\n'
+            f'Buses are colored from red (least) to green (most), the table was written to '
+            f'hosting_capacity.csv in the project folder.')
+
+    def clearHostingCapacity(self) -> None:
+        self.grid.hostingCapacity = None
+        self.grid.update()
+
+    def runContinuation(self) -> None:
+        from continuation import runContinuation
+        modes = ['Loads only, the slack takes the increase', 'Loads and generators by the same factor']
+        modeName, ok = QInputDialog.getItem(self, 'Continuation Power Flow', 'Scale:', modes, 0, False)
+        if not ok:
+            return
+        _, maxIter, canceled, freq, sBase, _, _, _ = self.grid.openRunDialog()
+        if canceled:
+            return
+        self.startStudy('Continuation Power Flow', runContinuation, (self.projectPath,
+                        self.projectPath + '/Buses.csv', self.projectPath + '/Lines.csv',
+                        self.projectPath + '/Trafos.csv', self.projectPath + '/Gens.csv',
+                        self.projectPath + '/Loads.csv', self.projectPath + '/Slacks.csv',
+                        maxIter, freq, sBase, modeName == modes[1]),
+                        self.finishContinuation)
+
+    def finishContinuation(self, info: dict) -> None:
+        names = {bus[4]: name for name, bus in self.grid.busses.items()}
+        critical = ', '.join(str(names.get(id, id)) for id in info['critical'])
+        if info['noseReached']:
+            point = 'Nose'
+        elif info['limitInduced']:
+            point = 'Collapse after generators reached their reactive limits'
+        else:
+            point = 'Largest loading traced'
+        QMessageBox.information(self, 'Continuation Power Flow Finished',
+            f'{point} at {1 + info["lambdaMax"]:.4f} times the base load, a loadability margin of '
+            f'{info["marginMw"]:.2f} MW ({info["steps"]} steps, {info["time"]:.2f} seconds).\n'
+            f'Critical buses: {critical}.\n'
+            f'The curve was written to continuation_curve.csv and the critical buses to '
+            f'continuation_critical.csv in the project folder.')
+
+    def runContingencies(self) -> None:
+        from contingency import runContingencies
+        method, maxIter, canceled, freq, sBase, _, _, _ = self.grid.openRunDialog()
+        if canceled:
+            return
+        self.startStudy('N-1 Contingency Analysis', runContingencies, (self.projectPath,
+                        self.projectPath + '/Buses.csv', self.projectPath + '/Lines.csv',
+                        self.projectPath + '/Trafos.csv', self.projectPath + '/Gens.csv',
+                        self.projectPath + '/Loads.csv', self.projectPath + '/Slacks.csv',
+                        method, maxIter, freq, sBase),
+                        self.finishContingencies)
+
+    def finishContingencies(self, info: dict) -> None:
+        QMessageBox.information(self, 'Contingency Analysis Finished',
+            f'{info["outages"]} outages checked in {info["time"]:.2f} seconds: {info["violating"]} '
+            f'break a limit, {info["islanding"]} island buses and {info["diverged"]} did not converge.\n'
+            f'The outages were written to contingency_summary.csv and the violations to '
+            f'contingency_violations.csv in the project folder.')
+
+    def setStudyArea(self) -> None:
+        from project_files import readStudyZones, writeStudyZones
+        current = ', '.join(str(zone) for zone in readStudyZones(self.projectPath))
+        text, ok = QInputDialog.getText(self, 'Study Area',
+            'Zones to keep (comma separated, empty to solve the full network):', text = current)
+        if not ok:
+            return
+        try:
+            zones = [int(zone) for zone in text.replace(',', ' ').split()]
+            writeStudyZones(self.projectPath, zones)
+        except (ValueError, OSError) as e:
+            self.grid.showError(f'Could not set the study area: {e}')
+            return
+        if zones:
+            QMessageBox.information(self, 'Study Area',
+                f'Load flows keep zone(s) {", ".join(str(zone) for zone in zones)} and replace the rest '
+                f'of the network by a Ward equivalent, computed from a full solve in the next run '
+                f'and reused while the network outside the zones stays the same.')
+        else:
+            QMessageBox.information(self, 'Study Area', 'Load flows solve the full network again.')
 
     def addBus(self) -> None:
         self.unsetCursor()
@@ -0,0 +1,156 @@
+#   Hosting capacity of buses for extra generation (PV) or load
+#
+#   For every selected bus the active power injected there is bisected between 0 and maxMw
+#   until the largest injection that keeps every bus within maxVm / minVm of Buses.csv and
+#   every line and transformer within its thermal limit is known to tolMw. Elements already
+#   beyond a limit in the base case are not checked for it. The buses are independent cases of
+#   the batched Newton-Raphson of batch_solver.py: every bisection step solves all of them at
+#   once, each warm started from its previous step, and groups of buses run in parallel
+#   worker processes. They are spawned, not forked, because the GUI runs studies from a
+#   thread of its Qt application.
+
+# Imports
+import os
+import multiprocessing as mp
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from native_solver import buildTables, solveNative, startVoltages
+from batch_solver import solveNativeBatch
+from network_cache import networkCache
+
+HOSTING_CAPACITY_FILE = 'hosting_capacity.csv'
+HOSTING_MODES = ['gen', 'load']
+
+# Fewest buses a worker process is given
+MIN_CHUNK = 20
+
+# What every worker process keeps between groups of buses
+workerState = {}
+
+def runHostingCapacity(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str,
+                       genCsv: str, loadCsv: str, slacksCsv: str, maxIter, freq: float, sBase,
+                       buses: list = None, mode: str = 'gen', maxMw: float = 100.0,
+                       tolMw: float = 0.1, workers: int = None) -> tuple[bool, str, dict]:
+
+    info = {'buses': 0, 'steps': 0, 'time': 0.0}
+    if mode not in HOSTING_MODES:
+        return False, f'Unknown hosting capacity mode {mode!r}', info
+    startTime = perf_counter()
+    try:
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        net = buildTables(csvPaths, freq, sBase)
+
+        # Base case, the limits of elements already beyond them and every start voltage
+        seed = networkCache.loadWarmStart(projectPth, net)
+        converged, _ = solveNative(net, maxIter, None if seed is None else startVoltages(seed))
+        if not converged:
+            return False, 'Base case load flow did not converge', info
+        limits = baseLimits(net)
+
+        slackBuses = set(net.ext_grid.bus)
+        buses = [bus for bus in (net.bus.index if buses is None else buses) if bus not in slackBuses]
+        missing = [bus for bus in buses if bus not in net.bus.index]
+        if missing:
+            raise KeyError(f'Bus {missing[0]} does not exist')
+        positions = net.bus.index.get_indexer(buses)
+
+        workers = workers or os.cpu_count() or 1
+        chunks = max(1, min(workers, len(positions) // MIN_CHUNK))
+        groups = [group for group in np.array_split(positions, chunks) if len(group)]
+        initargs = (net, maxIter, startVoltages(net.res_bus), limits, mode, maxMw, tolMw)
+        if chunks > 1:
+            with ProcessPoolExecutor(max_workers = chunks, mp_context = mp.get_context('spawn'),
+                                     initializer = initWorker, initargs = initargs) as executor:
+                results = list(executor.map(bisectBuses, groups))
+        else:
+            initWorker(*initargs)
+            results = [bisectBuses(group) for group in groups]
+
+        rows = [row for group in results for row, _ in group]
+        info['steps'] = max((steps for group in results for _, steps in group), default = 0)
+        info['buses'] = len(rows)
+        info['capacity'] = {row['id']: row['capacity_mw'] for row in rows}
+        info['limit'] = {row['id']: row['limit'] for row in rows}
+        info['outputs'] = writeResults(projectPth, rows)
+
+    except Exception as e:
+        return False, str(e), info
+
+    info['time'] = perf_counter() - startTime
+    return True, '', info
+
+# Limits every case is checked against, lifted for elements the base case already breaks
+def baseLimits(net) -> dict:
+    vm = net.res_bus.vm_pu.to_numpy(dtype = float)
+    maxVm, minVm = net.bus.max_vm_pu.to_numpy(dtype = float), net.bus.min_vm_pu.to_numpy(dtype = float)
+    lineLoading = net.res_line.loading_percent.to_numpy(dtype = float)
+    trafoLoading = net.res_trafo.loading_percent.to_numpy(dtype = float)
+    return {'maxVm': np.where(vm > maxVm, np.inf, maxVm), 'minVm': np.where(vm < minVm, -np.inf, minVm),
+            'line': np.where(lineLoading > 100, np.inf, 100.0),
+            'trafo': np.where(trafoLoading > 100, np.inf, 100.0)}
+
+def initWorker(net, maxIter, Vstart: np.ndarray, limits: dict, mode: str, maxMw: float,
+               tolMw: float) -> None:
+    workerState.update(net = net, maxIter = maxIter, Vstart = Vstart, limits = limits,
+                       mode = mode, maxMw = maxMw, tolMw = tolMw)
+
+# First violated limit of every case as (limit, element id), ('', None) where none is
+def violations(net, batch: dict, limits: dict) -> list:
+    checks = [('max_vm', net.bus.index, batch['res_bus']['vm_pu'] > limits['maxVm'] + 1e-9),
+              ('min_vm', net.bus.index, batch['res_bus']['vm_pu'] < limits['minVm'] - 1e-9),
+              ('line', net.line.name, batch['res_line']['loading_percent'] > limits['line'] + 1e-6),
+              ('trafo', net.trafo.index, batch['res_trafo']['loading_percent'] > limits['trafo'] + 1e-6)]
+    found = [('', None)] * len(batch['converged'])
+    for case in np.flatnonzero(~batch['converged']):
+        found[case] = ('diverged', None)
+    for limit, ids, broken in reversed(checks):
+        for case in np.flatnonzero(broken.any(axis = 1) & batch['converged']):
+            found[case] = (limit, ids[np.argmax(broken[case])])
+    return found
+
+# Bisects the injection at every bus position of a group together, returns
+# [(row of the result table, bisection steps)]
+def bisectBuses(positions: np.ndarray) -> list:
+    net, limits = workerState['net'], workerState['limits']
+    maxMw, tolMw = workerState['maxMw'], workerState['tolMw']
+    sign = 1.0 if workerState['mode'] == 'gen' else -1.0
+    nCases, nBus = len(positions), len(net.bus)
+    low, high = np.zeros(nCases), np.full(nCases, float(maxMw))
+    binding = [('', None)] * nCases
+    V = np.broadcast_to(workerState['Vstart'], (nCases, nBus)).copy()
+    cases = np.arange(nCases)
+    probe = high.copy()
+    steps = np.zeros(nCases, dtype = int)
+
+    # maxMw first, buses that take it need no bisection
+    while len(cases):
+        injection = np.zeros((len(cases), nBus), dtype = complex)
+        injection[np.arange(len(cases)), positions[cases]] = sign * probe[cases]
+        batch = solveNativeBatch(net, {}, len(cases), workerState['maxIter'], V[cases],
+                                 injection = injection)
+        found = violations(net, batch, limits)
+        steps[cases] += 1
+        for i, case in enumerate(cases):
+            if found[i][0]:
+                high[case], binding[case] = probe[case], found[i]
+            else:
+                low[case] = probe[case]
+            if batch['converged'][i]:
+                V[case] = batch['V'][i]
+        cases = cases[high[cases] - low[cases] > tolMw]
+        probe[cases] = (low[cases] + high[cases]) / 2
+
+    rows = []
+    for case, position in enumerate(positions):
+        limit, element = binding[case] if low[case] < maxMw else ('', None)
+        rows.append(({'id': net.bus.index[position], 'name': net.bus.name.iat[position],
+                      'capacity_mw': low[case], 'limit': limit or f'above {maxMw:g} MW',
+                      'element': '' if element is None else element}, int(steps[case])))
+    return rows
+
+def writeResults(projectPth: str, rows: list) -> list:
+    path = os.path.join(projectPth, HOSTING_CAPACITY_FILE)
+    pd.DataFrame(rows, columns = ['id', 'name', 'capacity_mw', 'limit', 'element']).to_csv(path, index = False)
+    return [path]
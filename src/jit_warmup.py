@@ -0,0 +1,80 @@
+#   Numba JIT warm-up and the persistent cache of pandapower's compiled functions
+#
+#   pp.runpp(..., numba = True) compiles pandapower's numba functions (Ybus, Jacobian, power
+#   flow results) on their first call in every process, and pandapower declares them with
+#   cache = False, so every session paid for the compilation again. enableJitCache switches
+#   numba's on disk cache on for them before their first call, in JIT_CACHE_DIR, so only the
+#   first session after an install or update compiles. warmUp runs a three bus load flow
+#   with the options of simulator.solve, the solver process does it while the StartUp
+#   dialog is open so the first run of the session finds the functions compiled.
+
+# Imports
+import os
+import importlib
+from time import perf_counter, time
+
+# Where the compiled functions are kept, NUMBA_CACHE_DIR overrides it like it does for numba
+JIT_CACHE_DIR = os.environ.get('NUMBA_CACHE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'loadflowx', 'numba')
+
+# pandapower modules holding the numba functions of runpp
+JIT_MODULES = ['pandapower.auxiliary', 'pandapower.build_bus', 'pandapower.pf.makeYbus_numba',
+               'pandapower.pf.dSbus_dV_numba', 'pandapower.pf.create_jacobian_numba',
+               'pandapower.pf.pfsoln_numba']
+
+# Functions whose cache is switched on, filled by the first enableJitCache of the process
+cachedFunctions = []
+
+# Switches the on disk cache on for the numba functions of JIT_MODULES, returns how many
+# functions use it. Without numba pandapower solves without it and nothing is cached.
+def enableJitCache(cacheDir: str = JIT_CACHE_DIR) -> int:
+    if cachedFunctions:
+        return len(cachedFunctions)
+    try:
+        import numba
+        from numba.core.registry import CPUDispatcher
+        from numba.core.caching import NullCache
+    except ImportError:
+        return 0
+    try:
+        os.makedirs(cacheDir, exist_ok = True)
+    except OSError as e:
+        print(f'-> Could not create the JIT cache folder {cacheDir}: {e}')
+        return 0
+    numba.config.CACHE_DIR = cacheDir
+    for moduleName in JIT_MODULES:
+        try:
+            module = importlib.import_module(moduleName)
+        except ImportError:
+            continue
+        for function in vars(module).values():
+            if isinstance(function, CPUDispatcher) and function not in cachedFunctions:
+                if isinstance(function._cache, NullCache):
+                    function.enable_caching()
+                cachedFunctions.append(function)
+    return len(cachedFunctions)
+
+# Compiles, or loads from the cache, every function a Newton-Raphson run of pandapower calls.
+# info holds the seconds it took, the cached function count and finishedAt, a time() stamp
+# that can be compared across processes.
+def warmUp() -> tuple[bool, str, dict]:
+    info = {'seconds': 0.0, 'functions': 0, 'cacheDir': JIT_CACHE_DIR, 'finishedAt': 0.0}
+    startTime = perf_counter()
+    try:
+        info['functions'] = enableJitCache()
+        import pandapower as pp
+        net = pp.create_empty_network(sn_mva = 100)
+        hv = pp.create_bus(net, vn_kv = 110)
+        mv = pp.create_bus(net, vn_kv = 20)
+        end = pp.create_bus(net, vn_kv = 20)
+        pp.create_ext_grid(net, hv, vm_pu = 1.0)
+        pp.create_transformer(net, hv, mv, std_type = '25 MVA 110/20 kV')
+        pp.create_line(net, mv, end, length_km = 5, std_type = 'NA2XS2Y 1x240 RM/25 12/20 kV')
+        pp.create_gen(net, mv, p_mw = 5, vm_pu = 1.01, min_q_mvar = -1, max_q_mvar = 1)
+        pp.create_load(net, end, p_mw = 8, q_mvar = 2)
+        pp.runpp(net, algorithm = 'nr', enforce_q_lims = True, numba = True)
+    except Exception as e:
+        return False, str(e), info
+    info['seconds'] = perf_counter() - startTime
+    info['finishedAt'] = time()
+    return True, '', info
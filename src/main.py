@@ -2,6 +2,7 @@
 
 #   Imports
 import sys
+from multiprocessing import freeze_support
 from PyQt6.QtWidgets import QApplication 
 from gui import MainWindow
 
@@ -12,4 +13,5 @@ def main():
     app.exec()
 
 if __name__ == '__main__':
+    freeze_support()        #   the solver process is spawned from this executable when frozen
     main()
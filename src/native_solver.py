@@ -0,0 +1,388 @@
+#   Newton-Raphson load flow straight from the project csvs, without building a pandapower net
+#
+#   The admittance matrix is assembled from Buses.csv, Lines.csv and Trafos.csv with the same
+#   per unit model pandapower uses for these elements (pi model lines on the from bus base,
+#   transformers as series impedances on the S base) and solved by the sparse Newton-Raphson
+#   of sparse_nr.py, generators switching from pv to pq at their reactive limits. The tables it
+#   returns carry pandapower's names and columns, so results, warm starts and the results
+#   viewer treat both solvers alike. Electrically separate islands with slacks of their own are
+#   solved one by one on their part of Ybus, big ones in parallel, and an island that does not
+#   converge is left without results instead of failing the others.
+
+# Imports
+import os
+import numpy as np
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from sparse_nr import newtonRaphsonQLimits
+from run_profile import timed
+from project_csv import readProject
+from topology_check import validateTopology
+
+# pandapower's NAYY 4x50 SE std type, used by lines without parameters of their own
+NAYY_4X50_SE = {'r_ohm_per_km': 0.642, 'x_ohm_per_km': 0.083, 'c_nf_per_km': 210.0,
+                'max_i_ka': 0.142, 'type': 'cs'}
+
+# Islands with at least this many buses are solved in parallel when there are several of them
+ISLAND_PARALLEL_BUSES = 5000
+
+# Tables of a native solve under pandapower's names, used as net.bus or net['bus']
+class NativeNet(dict):
+    def __getattr__(self, name: str):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value) -> None:
+        self[name] = value
+
+# Positions of bus ids in net.bus
+def busPositions(net: 'NativeNet', ids, element: str) -> np.ndarray:
+    positions = net.bus.index.get_indexer(ids)
+    if (positions < 0).any():
+        raise KeyError(f'A {element} is connected to a bus that does not exist')
+    return positions
+
+# Element tables of the project in the layout of the pandapower tables buildNetwork creates
+def buildTables(csvPaths: list, freq: float, sBase, progress = None) -> NativeNet:
+    buses, lines, trafos, gens, loads, slacks = readProject(csvPaths)
+    validateTopology(buses, lines, trafos, gens, loads, slacks)
+    if progress:
+        progress('building')
+
+    with timed('elements'):
+        bus = pd.DataFrame({'name': buses['name'], 'vn_kv': buses['vMag'], 'type': 'b',
+                            'zone': buses['zone'], 'in_service': True,
+                            'max_vm_pu': buses['maxVm'], 'min_vm_pu': buses['minVm']},
+                           index = buses['id'])
+
+        # Lines without R use the std type, the others carry their own parameters
+        own = lines['R'] != 'None'
+        def lineParam(column: str, key: str) -> np.ndarray:
+            values = np.full(len(own), NAYY_4X50_SE[key], dtype = float)
+            values[own] = lines[column][own].astype(float)
+            return values
+        line = pd.DataFrame({
+            'name': lines['name'].astype(str),
+            'std_type': np.where(own, [f'custom_type_{name}' for name in lines['name']], 'NAYY 4x50 SE'),
+            'from_bus': lines['bus1id'], 'to_bus': lines['bus2id'], 'length_km': lines['len'],
+            'r_ohm_per_km': lineParam('R', 'r_ohm_per_km'), 'x_ohm_per_km': lineParam('X', 'x_ohm_per_km'),
+            'c_nf_per_km': lineParam('c_nf_per_km', 'c_nf_per_km'), 'g_us_per_km': 0.0,
+            'max_i_ka': lineParam('max_i_ka', 'max_i_ka'), 'df': 1.0, 'parallel': 1,
+            'type': np.where(own, 'ol', NAYY_4X50_SE['type']), 'in_service': True,
+        })
+
+        trafo = pd.DataFrame({
+            'name': trafos['name'], 'hv_bus': trafos['hvBus'], 'lv_bus': trafos['lvBus'],
+            'sn_mva': trafos['sn_mva'], 'vn_hv_kv': bus.vn_kv.reindex(trafos['hvBus']).to_numpy(),
+            'vn_lv_kv': bus.vn_kv.reindex(trafos['lvBus']).to_numpy(),
+            'vk_percent': trafos['vk_percent'], 'vkr_percent': trafos['vkr_percent'],
+            'pfe_kw': 0.0, 'i0_percent': 0.0, 'shift_degree': 0.0,
+            'tap_step_percent': trafos['tap_step_percent'], 'tap_pos': 0, 'parallel': 1,
+            'df': 1.0, 'in_service': True,
+        }, index = pd.Index(trafos['id']))
+
+        gen = pd.DataFrame({'name': gens['name'], 'bus': gens['bus'], 'p_mw': gens['pMW'],
+                            'vm_pu': gens['vmPU'], 'min_q_mvar': gens['minQMvar'],
+                            'max_q_mvar': gens['maxQMvar'], 'min_p_mw': gens['minPMW'],
+                            'max_p_mw': gens['maxPMW'], 'in_service': True},
+                           index = pd.Index(gens['id']))
+        load = pd.DataFrame({'name': np.arange(1, len(loads['id']) + 1), 'bus': loads['bus'],
+                             'p_mw': loads['pMW'], 'q_mvar': loads['qMW'], 'scaling': 1.0,
+                             'in_service': True}, index = pd.Index(loads['id']))
+        extGrid = pd.DataFrame({'bus': slacks['bus'], 'vm_pu': slacks['vmPU'],
+                                'va_degree': slacks['vaD'], 'max_p_mw': slacks['maxP'],
+                                'min_p_mw': slacks['minP'], 'max_q_mvar': slacks['maxQ'],
+                                'min_q_mvar': slacks['minQ'], 'in_service': True},
+                               index = pd.Index(slacks['id']))
+
+        # Impedances and wards are only added by network equivalents (network_reduction.py)
+        impedance = pd.DataFrame({'from_bus': pd.Series(dtype = np.int64), 'to_bus': pd.Series(dtype = np.int64),
+                                  'rft_pu': pd.Series(dtype = float), 'xft_pu': pd.Series(dtype = float),
+                                  'sn_mva': pd.Series(dtype = float), 'in_service': pd.Series(dtype = bool)})
+        ward = pd.DataFrame({'bus': pd.Series(dtype = np.int64), 'ps_mw': pd.Series(dtype = float),
+                             'qs_mvar': pd.Series(dtype = float), 'pz_mw': pd.Series(dtype = float),
+                             'qz_mvar': pd.Series(dtype = float), 'in_service': pd.Series(dtype = bool)})
+    return NativeNet(bus = bus, line = line, trafo = trafo, gen = gen, load = load,
+                     ext_grid = extGrid, impedance = impedance, ward = ward,
+                     f_hz = float(freq), sn_mva = float(sBase))
+
+# Per unit branch model: from / to bus positions and the four admittances of every branch,
+# lines first, transformers and impedances after, and the shunt admittance of wards per bus
+def branchModel(net: NativeNet) -> dict:
+    vn = net.bus.vn_kv.to_numpy(dtype = float)
+    line, trafo = net.line, net.trafo
+    lineFrom, lineTo = busPositions(net, line.from_bus, 'line'), busPositions(net, line.to_bus, 'line')
+    trafoHv, trafoLv = busPositions(net, trafo.hv_bus, 'trafo'), busPositions(net, trafo.lv_bus, 'trafo')
+
+    # Lines: pi model in per unit of the from bus voltage
+    baseR = vn[lineFrom] ** 2 / net.sn_mva
+    length, parallel = line.length_km.to_numpy(dtype = float), line.parallel.to_numpy(dtype = float)
+    r = line.r_ohm_per_km.to_numpy(dtype = float) * length / parallel / baseR
+    x = line.x_ohm_per_km.to_numpy(dtype = float) * length / parallel / baseR
+    b = 2 * np.pi * net.f_hz * line.c_nf_per_km.to_numpy(dtype = float) * 1e-9 * length * parallel * baseR
+    g = line.g_us_per_km.to_numpy(dtype = float) * 1e-6 * length * parallel * baseR
+    lineY = 1 / (r + 1j * x)
+    lineShunt = (g + 1j * b) / 2
+
+    # Transformers at neutral tap with rated voltages equal to the bus voltages and no
+    # magnetizing branch: a series impedance of vk on the S base
+    snRatio = net.sn_mva / (trafo.sn_mva.to_numpy(dtype = float) * trafo.parallel.to_numpy(dtype = float))
+    zSc = trafo.vk_percent.to_numpy(dtype = float) / 100 * snRatio
+    rSc = trafo.vkr_percent.to_numpy(dtype = float) / 100 * snRatio
+    trafoY = 1 / (rSc + 1j * np.sign(zSc) * np.sqrt(zSc ** 2 - rSc ** 2))
+
+    # Impedances: series impedances in per unit of their own sn_mva like pandapower's
+    impedance = net.impedance
+    impFrom = busPositions(net, impedance.from_bus, 'impedance')
+    impTo = busPositions(net, impedance.to_bus, 'impedance')
+    impY = 1 / ((impedance.rft_pu + 1j * impedance.xft_pu).to_numpy(dtype = complex)
+                * net.sn_mva / impedance.sn_mva.to_numpy(dtype = float))
+
+    # Wards: the constant impedance part of their load as a shunt at 1 pu
+    ward = net.ward
+    wardBus = busPositions(net, ward.bus, 'ward')
+    busShunt = np.bincount(wardBus, ward.pz_mw.to_numpy(dtype = float), len(vn)) \
+        - 1j * np.bincount(wardBus, ward.qz_mvar.to_numpy(dtype = float), len(vn))
+
+    series = np.r_[lineY, trafoY, impY]
+    shunt = np.r_[lineShunt, np.zeros(len(trafo) + len(impedance), dtype = complex)]
+    return {'from': np.r_[lineFrom, trafoHv, impFrom].astype(np.int64),
+            'to': np.r_[lineTo, trafoLv, impTo].astype(np.int64),
+            'Yff': series + shunt, 'Yft': -series, 'Ytf': -series, 'Ytt': series + shunt,
+            'lines': len(line), 'trafos': len(trafo), 'busShunt': busShunt / net.sn_mva}
+
+# Bus admittance matrix and the from / to branch admittance matrices (I = Yf V, I = Yt V)
+def admittance(branches: dict, nBus: int) -> tuple:
+    f, t = branches['from'], branches['to']
+    rows = np.arange(len(f))
+    Yf = sp.csr_matrix((np.r_[branches['Yff'], branches['Yft']], (np.r_[rows, rows], np.r_[f, t])),
+                       shape = (len(f), nBus))
+    Yt = sp.csr_matrix((np.r_[branches['Ytf'], branches['Ytt']], (np.r_[rows, rows], np.r_[f, t])),
+                       shape = (len(f), nBus))
+    Ybus = sp.csr_matrix((np.r_[branches['Yff'], branches['Yft'], branches['Ytf'], branches['Ytt']],
+                          (np.r_[f, f, t, t], np.r_[f, t, f, t])), shape = (nBus, nBus))
+    if branches['busShunt'].any():
+        Ybus = (Ybus + sp.diags(branches['busShunt'])).tocsr()
+    return Ybus, Yf, Yt
+
+# Bus typing, injections and start voltages in bus position order. Buses without a path to
+# a slack are left out of the solve like pandapower's isolated buses.
+def busModel(net: NativeNet, branches: dict, V0: np.ndarray = None) -> dict:
+    nBus, baseMVA = len(net.bus), net.sn_mva
+    _, island = connected_components(
+        sp.coo_matrix((np.ones(len(branches['from'])), (branches['from'], branches['to'])),
+                      shape = (nBus, nBus)), directed = False)
+    slackBus = busPositions(net, net.ext_grid.bus, 'slack')
+    energized = np.isin(island, island[slackBus])
+
+    genBus, loadBus = busPositions(net, net.gen.bus, 'generator'), busPositions(net, net.load.bus, 'load')
+    load, ward = net.load, net.ward
+    wardBus = busPositions(net, ward.bus, 'ward')
+    wardS = np.bincount(wardBus, ward.ps_mw.to_numpy(dtype = float), nBus) \
+        + 1j * np.bincount(wardBus, ward.qs_mvar.to_numpy(dtype = float), nBus)
+    Sbus = (np.bincount(genBus, net.gen.p_mw.to_numpy(dtype = float), nBus)
+            - np.bincount(loadBus, (load.p_mw * load.scaling).to_numpy(dtype = float), nBus)
+            - 1j * np.bincount(loadBus, (load.q_mvar * load.scaling).to_numpy(dtype = float), nBus)
+            - wardS) / baseMVA
+    qMax = Sbus.imag + np.bincount(genBus, net.gen.max_q_mvar.to_numpy(dtype = float), nBus) / baseMVA
+    qMin = Sbus.imag + np.bincount(genBus, net.gen.min_q_mvar.to_numpy(dtype = float), nBus) / baseMVA
+
+    isRef = np.zeros(nBus, dtype = bool)
+    isRef[slackBus] = True
+    isPv = np.zeros(nBus, dtype = bool)
+    isPv[genBus] = True
+    isPv &= ~isRef
+    ref = np.flatnonzero(isRef)
+    pv = np.flatnonzero(isPv & energized)
+    pq = np.flatnonzero(~isRef & ~isPv & energized)
+
+    # Flat start at the slack angle unless voltages are given, setpoints at slacks and gens
+    angle = np.deg2rad(net.ext_grid.va_degree.to_numpy(dtype = float))
+    if V0 is None:
+        V0 = np.full(nBus, np.exp(1j * angle[0]) if len(angle) else 1.0 + 0j)
+    # Buses without a start voltage (an island that did not converge last time) start flat
+    V0 = np.where(np.isfinite(V0), V0, np.exp(1j * angle[0]) if len(angle) else 1.0 + 0j).astype(complex)
+    V0[genBus] = net.gen.vm_pu.to_numpy(dtype = float) * V0[genBus] / np.abs(V0[genBus])
+    V0[slackBus] = net.ext_grid.vm_pu.to_numpy(dtype = float) * np.exp(1j * angle)
+    return {'Sbus': Sbus, 'qMin': qMin, 'qMax': qMax, 'ref': ref, 'pv': pv, 'pq': pq,
+            'V0': V0, 'energized': energized, 'genBus': genBus, 'loadBus': loadBus,
+            'slackBus': slackBus, 'island': island, 'wardS': wardS}
+
+# Solves the net and fills its res_* tables, returns (converged, iterations). Vstart are
+# bus voltages in net.bus order to start from, a flat start when None. Every energized island
+# is solved on its own and listed in net.res_island, converged is True when all of them did.
+# Results are written when at least one island converged, the others get NaN.
+def solveNative(net: NativeNet, maxIter, Vstart: np.ndarray = None, tol: float = 1e-8,
+                workers: int = None) -> tuple:
+    with timed('ybus'):
+        branches = branchModel(net)
+        Ybus, Yf, Yt = admittance(branches, len(net.bus))
+    model = busModel(net, branches, Vstart)
+    with timed('solve'):
+        islands = energizedIslands(model)
+        if len(islands) == 1:
+            V, converged, iterations, Sbus, pv, pq = newtonRaphsonQLimits(
+                Ybus, model['Sbus'], model['V0'], model['ref'], model['pv'], model['pq'],
+                model['qMin'], model['qMax'], tol = tol, maxIter = maxIter)
+            outcomes = [(converged, iterations)]
+        else:
+            V, outcomes = solveIslands(Ybus, model, islands, maxIter, tol, workers)
+    net['res_island'] = pd.DataFrame({
+        'buses': [len(buses) for buses in islands],
+        'slack_bus': [net.bus.index[np.intersect1d(buses, model['slackBus'])[0]] for buses in islands],
+        'converged': [bool(converged) for converged, _ in outcomes],
+        'iterations': [int(iterations) for _, iterations in outcomes],
+    })
+    for buses, (converged, _) in zip(islands, outcomes):
+        if not converged:
+            model['energized'][buses] = False
+    if net.res_island.converged.any():
+        with timed('pf results'):
+            writeNativeResults(net, model, branches, Ybus, Yf, Yt, V)
+    return bool(net.res_island.converged.all()), int(net.res_island.iterations.max())
+
+# Bus positions of every energized island, the island of the first slack first
+def energizedIslands(model: dict) -> list:
+    island = model['island']
+    labels = list(dict.fromkeys(island[model['slackBus']].tolist()))
+    if len(labels) == 1:
+        return [np.flatnonzero(model['energized'])]
+    order = np.argsort(island, kind = 'stable')
+    starts = np.searchsorted(island[order], labels)
+    ends = np.searchsorted(island[order], labels, side = 'right')
+    return [order[start:end] for start, end in zip(starts, ends)]
+
+# Solves the islands on their parts of Ybus, returns the merged voltages and (converged,
+# iterations) of every island. Several big islands are spread over spawned worker processes, or over
+# threads inside a daemonic process (the GUI's solver process) that cannot start any.
+def solveIslands(Ybus, model: dict, islands: list, maxIter, tol: float, workers: int = None) -> tuple:
+    local = np.full(len(model['V0']), -1, dtype = np.int64)
+    tasks = []
+    for buses in islands:
+        local[buses] = np.arange(len(buses))
+        ref, pv, pq = (local[positions[np.isin(positions, buses)]]
+                       for positions in (model['ref'], model['pv'], model['pq']))
+        tasks.append((Ybus[buses][:, buses], model['Sbus'][buses], model['V0'][buses], ref, pv, pq,
+                      model['qMin'][buses], model['qMax'][buses], tol, maxIter))
+
+    big = sum(len(buses) >= ISLAND_PARALLEL_BUSES for buses in islands)
+    workers = min(workers or os.cpu_count() or 1, big)
+    if workers > 1:
+        if mp.current_process().daemon:
+            pool = ThreadPoolExecutor(max_workers = workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers = workers, mp_context = mp.get_context('spawn'))
+        with pool as executor:
+            solved = list(executor.map(solveIsland, tasks))
+    else:
+        solved = [solveIsland(task) for task in tasks]
+
+    V = model['V0'].copy()
+    for buses, (Visland, _, _) in zip(islands, solved):
+        V[buses] = Visland
+    return V, [(converged, iterations) for _, converged, iterations in solved]
+
+# One island, from the arguments of newtonRaphsonQLimits. Returns (V, converged, iterations).
+def solveIsland(task: tuple) -> tuple:
+    Ybus, Sbus, V0, ref, pv, pq, qMin, qMax, tol, maxIter = task
+    V, converged, iterations, *_ = newtonRaphsonQLimits(Ybus, Sbus, V0, ref, pv, pq, qMin, qMax,
+                                                        tol = tol, maxIter = maxIter)
+    return V, converged, iterations
+
+def writeNativeResults(net: NativeNet, model: dict, branches: dict, Ybus, Yf, Yt, V: np.ndarray) -> None:
+    baseMVA = net.sn_mva
+    vn = net.bus.vn_kv.to_numpy(dtype = float)
+    V = np.where(model['energized'], V, np.nan)
+    vm, va = np.abs(V), np.rad2deg(np.angle(V))
+    # Power into the branches, the ward shunts of Ybus count as loads of their bus
+    wardShunt = np.abs(V) ** 2 * np.conj(branches['busShunt']) * baseMVA
+    Sinj = V * np.conj(Ybus @ np.nan_to_num(V)) * baseMVA - wardShunt
+
+    # Bus powers in load convention like pandapower's res_bus
+    net['res_bus'] = pd.DataFrame({'vm_pu': vm, 'va_degree': va, 'p_mw': -Sinj.real,
+                                   'q_mvar': -Sinj.imag}, index = net.bus.index)
+
+    # Branch flows, currents and loadings
+    f, t = branches['from'], branches['to']
+    Vc = np.nan_to_num(V)
+    Sf = V[f] * np.conj(Yf @ Vc) * baseMVA
+    St = V[t] * np.conj(Yt @ Vc) * baseMVA
+    iFrom = np.abs(Yf @ Vc) * baseMVA / (np.sqrt(3) * vn[f])
+    iTo = np.abs(Yt @ Vc) * baseMVA / (np.sqrt(3) * vn[t])
+    dead = ~(model['energized'][f] & model['energized'][t])
+    iFrom[dead], iTo[dead] = np.nan, np.nan
+    nLine, nTrafo = branches['lines'], branches['lines'] + branches['trafos']
+    line, trafo = net.line, net.trafo
+    lineI = np.maximum(iFrom[:nLine], iTo[:nLine])
+    net['res_line'] = pd.DataFrame({
+        'p_from_mw': Sf.real[:nLine], 'q_from_mvar': Sf.imag[:nLine],
+        'p_to_mw': St.real[:nLine], 'q_to_mvar': St.imag[:nLine],
+        'pl_mw': (Sf + St).real[:nLine], 'ql_mvar': (Sf + St).imag[:nLine],
+        'i_from_ka': iFrom[:nLine], 'i_to_ka': iTo[:nLine], 'i_ka': lineI,
+        'vm_from_pu': vm[f[:nLine]], 'va_from_degree': va[f[:nLine]],
+        'vm_to_pu': vm[t[:nLine]], 'va_to_degree': va[t[:nLine]],
+        'loading_percent': lineI / (line.max_i_ka * line.df * line.parallel).to_numpy(dtype = float) * 100,
+    }, index = line.index)
+    iHv, iLv = iFrom[nLine:nTrafo], iTo[nLine:nTrafo]
+    trafoLoading = np.maximum(iHv * trafo.vn_hv_kv.to_numpy(dtype = float),
+                              iLv * trafo.vn_lv_kv.to_numpy(dtype = float)) * np.sqrt(3) \
+        / (trafo.sn_mva * trafo.parallel * trafo.df).to_numpy(dtype = float) * 100
+    net['res_trafo'] = pd.DataFrame({
+        'p_hv_mw': Sf.real[nLine:nTrafo], 'q_hv_mvar': Sf.imag[nLine:nTrafo],
+        'p_lv_mw': St.real[nLine:nTrafo], 'q_lv_mvar': St.imag[nLine:nTrafo],
+        'pl_mw': (Sf + St).real[nLine:nTrafo], 'ql_mvar': (Sf + St).imag[nLine:nTrafo],
+        'i_hv_ka': iHv, 'i_lv_ka': iLv,
+        'vm_hv_pu': vm[f[nLine:nTrafo]], 'va_hv_degree': va[f[nLine:nTrafo]],
+        'vm_lv_pu': vm[t[nLine:nTrafo]], 'va_lv_degree': va[t[nLine:nTrafo]],
+        'loading_percent': trafoLoading,
+    }, index = trafo.index)
+
+    # Loads draw what they are set to, generators and slacks cover the rest of their bus
+    nBus = len(net.bus)
+    load, gen, extGrid = net.load, net.gen, net.ext_grid
+    loadP = (load.p_mw * load.scaling).to_numpy(dtype = float)
+    loadQ = (load.q_mvar * load.scaling).to_numpy(dtype = float)
+    net['res_load'] = pd.DataFrame({'p_mw': loadP, 'q_mvar': loadQ}, index = load.index)
+    # Wards draw their constant power and shunt part like loads
+    busLoadQ = np.bincount(model['loadBus'], loadQ, nBus) + model['wardS'].imag + wardShunt.imag
+    busLoadP = np.bincount(model['loadBus'], loadP, nBus) + model['wardS'].real + wardShunt.real
+    net['res_gen'] = pd.DataFrame({'p_mw': gen.p_mw.to_numpy(dtype = float),
+                                   'q_mvar': genReactivePower(gen, model['genBus'], Sinj.imag + busLoadQ),
+                                   'va_degree': va[model['genBus']], 'vm_pu': vm[model['genBus']]},
+                                  index = gen.index)
+
+    # Slacks sharing a bus split its remaining power equally
+    slackBus = model['slackBus']
+    busGenP = np.bincount(model['genBus'], gen.p_mw.to_numpy(dtype = float), nBus)
+    busGenQ = np.bincount(model['genBus'], net.res_gen.q_mvar.to_numpy(dtype = float), nBus)
+    share = np.bincount(slackBus, minlength = nBus)[slackBus]
+    net['res_ext_grid'] = pd.DataFrame({
+        'p_mw': (Sinj.real + busLoadP - busGenP)[slackBus] / share,
+        'q_mvar': (Sinj.imag + busLoadQ - busGenQ)[slackBus] / share,
+    }, index = extGrid.index)
+
+# Reactive power of every generator from the total of its bus, split between generators of
+# one bus in proportion to their reactive ranges the way pypower's pfsoln does. busQ is one
+# value per bus, or one row per case of a batch.
+def genReactivePower(gen: pd.DataFrame, genBus: np.ndarray, busQ: np.ndarray) -> np.ndarray:
+    qMin, qMax = gen.min_q_mvar.to_numpy(dtype = float), gen.max_q_mvar.to_numpy(dtype = float)
+    nBus = busQ.shape[-1]
+    count = np.bincount(genBus, minlength = nBus)[genBus]
+    q = busQ[..., genBus] / count
+    several = count > 1
+    if several.any():
+        busMin = np.bincount(genBus, qMin, nBus)[genBus]
+        busMax = np.bincount(genBus, qMax, nBus)[genBus]
+        ranged = several & (busMax != busMin)
+        q[..., ranged] = qMin[ranged] + (busQ[..., genBus] - busMin)[..., ranged] / (busMax - busMin)[ranged] \
+            * (qMax - qMin)[ranged]
+    return q
+
+# Start voltages in net.bus order from the res_bus of an earlier solve
+def startVoltages(resBus: pd.DataFrame) -> np.ndarray:
+    return resBus.vm_pu.to_numpy(dtype = float) * np.exp(1j * np.deg2rad(resBus.va_degree.to_numpy(dtype = float)))
@@ -0,0 +1,141 @@
+#   Cache of built pandapower networks keyed by fingerprints of the project csvs
+
+# Imports
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from results_store import RESULTS_FILE, openResults
+from project_files import WARM_START_INFO, fingerprintCsvs
+
+CACHE_NET = 'net_cache.p'
+CACHE_INFO = 'net_cache.json'
+
+# What a built network depends on: the csv contents and the network constants
+def cacheKey(prints: dict, freq: float, sBase) -> dict:
+    return {
+        'freq': float(freq),
+        'sBase': float(sBase),
+        'csvs': {name: fp['hash'] for name, fp in prints.items()},
+    }
+
+# Hash of what decides the shape of the load flow problem: buses, branches and where the
+# voltage controlled elements sit
+def topologyHash(net) -> str:
+    digest = hashlib.blake2b(digest_size = 16)
+    for part in (net.bus.index, net.bus.in_service,
+                 net.line.from_bus, net.line.to_bus, net.line.in_service,
+                 net.trafo.hv_bus, net.trafo.lv_bus, net.trafo.in_service,
+                 net.gen.bus, net.gen.in_service, net.ext_grid.bus, net.ext_grid.in_service):
+        digest.update(np.ascontiguousarray(np.asarray(part, dtype = np.int64)).tobytes())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+class NetworkCache():
+    def __init__(self) -> None:
+        self.entries = {} # project path -> {'prints', 'key', 'net'}
+        self.warmStarts = {} # project path -> {'topology', 'res_bus'}
+
+    def get(self, projectPath: str, csvPaths: list, freq: float, sBase):
+        # Returns (net, prints, key, changed), changed lists the csvs that differ from the
+        # cached network and is None when there is nothing usable to patch
+        projectPath = os.path.abspath(projectPath)
+        entry = self.entries.get(projectPath)
+        if entry is None:
+            entry = self.readFromDisk(projectPath)
+        prints = fingerprintCsvs(csvPaths, entry['prints'] if entry else None)
+        key = cacheKey(prints, freq, sBase)
+        if entry is None or entry['key']['freq'] != key['freq'] \
+                or entry['key']['sBase'] != key['sBase'] \
+                or entry['key']['csvs'].keys() != key['csvs'].keys():
+            return None, prints, key, None
+        self.entries[projectPath] = entry
+        changed = [name for name, digest in key['csvs'].items()
+                   if entry['key']['csvs'][name] != digest]
+        if not changed:
+            entry['prints'] = prints
+        return entry['net'], prints, key, changed
+
+    def put(self, projectPath: str, net, prints: dict, key: dict) -> None:
+        projectPath = os.path.abspath(projectPath)
+        self.entries[projectPath] = {'prints': prints, 'key': key, 'net': net}
+        self.writeToDisk(projectPath, net, prints, key)
+
+    def invalidate(self, projectPath: str) -> None:
+        self.entries.pop(os.path.abspath(projectPath), None)
+        for name in (CACHE_INFO, CACHE_NET):
+            path = os.path.join(projectPath, name)
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def readFromDisk(self, projectPath: str):
+        infoPath = os.path.join(projectPath, CACHE_INFO)
+        netPath = os.path.join(projectPath, CACHE_NET)
+        if not (os.path.isfile(infoPath) and os.path.isfile(netPath)):
+            return None
+        try:
+            with open(infoPath) as file:
+                info = json.load(file)
+            net = pp.from_pickle(netPath)
+        except Exception as e:
+            print(f'-> Ignoring unreadable network cache in {projectPath}: {e}')
+            return None
+        return {'prints': info['prints'], 'key': info['key'], 'net': net}
+
+    def writeToDisk(self, projectPath: str, net, prints: dict, key: dict) -> None:
+        # The info file is written last so a half written pickle is never trusted
+        infoPath = os.path.join(projectPath, CACHE_INFO)
+        if os.path.isfile(infoPath):
+            os.remove(infoPath)
+        try:
+            pp.to_pickle(net, os.path.join(projectPath, CACHE_NET))
+            with open(infoPath, 'w') as file:
+                json.dump({'prints': prints, 'key': key}, file)
+        except Exception as e:
+            print(f'-> Could not write network cache to {projectPath}: {e}')
+
+    # Remembers the last converged bus voltages, the results file holds them across sessions
+    def saveWarmStart(self, projectPath: str, net) -> None:
+        projectPath = os.path.abspath(projectPath)
+        topology = topologyHash(net)
+        self.warmStarts[projectPath] = {
+            'topology': topology,
+            'res_bus': net.res_bus.copy(),
+        }
+        try:
+            with open(os.path.join(projectPath, WARM_START_INFO), 'w') as file:
+                json.dump({'topology': topology}, file)
+        except OSError as e:
+            print(f'-> Could not write warm start info to {projectPath}: {e}')
+
+    # Returns the last converged res_bus if it was solved on the same topology, else None
+    def loadWarmStart(self, projectPath: str, net):
+        projectPath = os.path.abspath(projectPath)
+        topology = topologyHash(net)
+        warm = self.warmStarts.get(projectPath)
+        if warm is not None and warm['topology'] == topology:
+            return warm['res_bus'].copy()
+        infoPath = os.path.join(projectPath, WARM_START_INFO)
+        resultsPath = os.path.join(projectPath, RESULTS_FILE)
+        csvPath = os.path.join(projectPath, 'results_buses.csv')
+        if not os.path.isfile(infoPath) or not (os.path.isfile(resultsPath) or os.path.isfile(csvPath)):
+            return None
+        try:
+            with open(infoPath) as file:
+                if json.load(file).get('topology') != topology:
+                    return None
+            if os.path.isfile(resultsPath):
+                resBus = openResults(resultsPath).table('results_buses').copy()
+            else:
+                resBus = pd.read_csv(csvPath, index_col = 0)
+        except Exception as e:
+            print(f'-> Ignoring unreadable warm start in {projectPath}: {e}')
+            return None
+        voltages = resBus[['vm_pu', 'va_degree']]
+        if not resBus.index.equals(net.bus.index) or voltages.isna().any(axis = None):
+            return None
+        return resBus
+
+networkCache = NetworkCache()
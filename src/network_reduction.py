@@ -0,0 +1,196 @@
+#   Ward equivalent of the network outside a study area
+#
+#   The buses of the study zones (the zone column of Buses.csv) and the slack buses are kept,
+#   the external rest is Kron reduced onto the kept buses it connects to, the boundary:
+#   Yeq = Ybb - Ybe Yee^-1 Yeb over the branches that touch an external bus. Yeq becomes
+#   impedances between boundary buses and the shunts of wards at them, and the power the
+#   external network drew at every boundary bus in a full native solve, less what Yeq draws
+#   at the same voltages, becomes the constant power of the wards, so the reduced network
+#   reproduces that solve. External generators stay at their output of that solve and no
+#   longer hold voltages.
+#   Equivalents are kept in reduction_cache.json of the project folder under a hash of the
+#   external elements and the boundary, so edits inside the study area reuse them. runLoadFlow
+#   solves the reduced network while Reduction.json of the project names study zones, its
+#   results are written in the layout of the full network with NaN for the replaced elements.
+
+# Imports
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+from run_profile import timed, timing
+from results_store import RESULT_TABLES, DATA_TABLES
+from native_solver import NativeNet, buildTables, branchModel, admittance, solveNative, startVoltages
+
+REDUCTION_CACHE = 'reduction_cache.json'
+REDUCTION_CACHE_SIZE = 4
+
+# Couplings of the equivalent below this admittance (per unit) are left out
+MIN_ADMITTANCE = 1e-9
+
+# Columns of the external elements an equivalent depends on, present in pandapower nets and
+# native tables alike
+KEY_COLUMNS = {
+    'bus': ['vn_kv'],
+    'line': ['from_bus', 'to_bus', 'length_km', 'r_ohm_per_km', 'x_ohm_per_km', 'c_nf_per_km',
+             'g_us_per_km', 'parallel'],
+    'trafo': ['hv_bus', 'lv_bus', 'sn_mva', 'vk_percent', 'vkr_percent', 'parallel'],
+    'gen': ['bus', 'p_mw', 'vm_pu', 'min_q_mvar', 'max_q_mvar'],
+    'load': ['bus', 'p_mw', 'q_mvar', 'scaling'],
+}
+
+IMPEDANCE_COLUMNS = {'from_bus': np.int64, 'to_bus': np.int64, 'rft_pu': float, 'xft_pu': float,
+                     'sn_mva': float}
+WARD_COLUMNS = {'bus': np.int64, 'ps_mw': float, 'qs_mvar': float, 'pz_mw': float, 'qz_mvar': float}
+
+# Kept buses in net.bus order: the buses of the study zones and the slack buses
+def retainedBuses(net, zones: list) -> np.ndarray:
+    inZones = net.bus.zone.isin(zones).to_numpy()
+    if not inZones.any():
+        raise ValueError(f'No bus is in study zone(s) {", ".join(str(zone) for zone in zones)}')
+    return inZones | net.bus.index.isin(net.ext_grid.bus)
+
+# Hash of the external elements, the boundary and the settings an equivalent is computed for
+def equivalentKey(net, keep: np.ndarray, zones: list) -> str:
+    ids = net.bus.index.to_numpy()
+    external = ids[~keep]
+    ends = {'line': ('from_bus', 'to_bus'), 'trafo': ('hv_bus', 'lv_bus')}
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(json.dumps({'zones': zones, 'sn_mva': float(net.sn_mva), 'f_hz': float(net.f_hz)}).encode())
+    boundary = set()
+    for table, columns in KEY_COLUMNS.items():
+        frame = net[table]
+        if table == 'bus':
+            rows = ~keep
+        elif table in ends:
+            fromBus, toBus = frame[ends[table][0]].isin(external), frame[ends[table][1]].isin(external)
+            rows = (fromBus | toBus).to_numpy()
+            boundary.update(frame[ends[table][1]][fromBus & ~toBus].tolist())
+            boundary.update(frame[ends[table][0]][toBus & ~fromBus].tolist())
+        else:
+            rows = frame.bus.isin(external).to_numpy()
+        values = frame.loc[rows, [column for column in columns if column in frame]].astype(float)
+        digest.update(pd.util.hash_pandas_object(values, index = True).to_numpy().tobytes())
+        digest.update(b'|')
+    digest.update(np.asarray(sorted(boundary), dtype = np.int64).tobytes())
+    return digest.hexdigest()
+
+# Ward equivalent of the buses outside the study zones from a full native solve of the
+# project: {'impedance': rows, 'ward': rows, 'boundary', 'external', 'dropped'}
+def computeEquivalent(csvPaths: list, freq: float, sBase, zones: list, maxIter) -> dict:
+    net = buildTables(csvPaths, freq, sBase)
+    converged, iterations = solveNative(net, maxIter)
+    if not converged:
+        raise ValueError(f'The full network did not converge in {iterations} iterations, '
+                         'no equivalent can be computed from it')
+    keep, nBus, baseMVA = retainedBuses(net, zones), len(net.bus), net.sn_mva
+
+    # Admittances of the branches that touch an external bus
+    branches = branchModel(net)
+    outer = ~(keep[branches['from']] & keep[branches['to']])
+    external = {name: branches[name][outer] for name in ('from', 'to', 'Yff', 'Yft', 'Ytf', 'Ytt')}
+    Yx, _, _ = admittance(dict(external, busShunt = np.zeros(nBus, dtype = complex)), nBus)
+    touched = np.bincount(np.r_[external['from'], external['to']], minlength = nBus) > 0
+    boundary = np.flatnonzero(keep & touched)
+
+    # External buses without a path to the boundary carry nothing over and are dropped
+    outside = np.flatnonzero(~keep)
+    _, label = connected_components(abs(Yx[outside][:, outside]), directed = False)
+    linked = np.unique(label[np.asarray(abs(Yx[outside][:, boundary]).sum(axis = 1)).ravel() > 0])
+    reach = outside[np.isin(label, linked)]
+    equivalent = {'impedance': [], 'ward': [], 'boundary': len(boundary), 'external': len(outside),
+                  'dropped': len(outside) - len(reach)}
+    if not len(boundary):
+        return equivalent
+
+    Ybe, Yeb = Yx[boundary][:, reach], Yx[reach][:, boundary]
+    Yeq = Yx[boundary][:, boundary].toarray() - Ybe @ splu(Yx[reach][:, reach].tocsc()).solve(Yeb.toarray())
+    V = np.nan_to_num(startVoltages(net.res_bus))
+    Vb = V[boundary]
+    wardS = (Vb * np.conj(Yx[boundary] @ V) - Vb * np.conj(Yeq @ Vb)) * baseMVA
+    shunt = Yeq.sum(axis = 1) * baseMVA
+    ids = net.bus.index.to_numpy()[boundary]
+    equivalent['ward'] = [{'bus': int(bus), 'ps_mw': float(s.real), 'qs_mvar': float(s.imag),
+                           'pz_mw': float(y.real), 'qz_mvar': float(-y.imag)}
+                          for bus, s, y in zip(ids, wardS, shunt)]
+    for i, j in zip(*np.triu_indices(len(boundary), 1)):
+        y = -(Yeq[i, j] + Yeq[j, i]) / 2
+        if abs(y) > MIN_ADMITTANCE:
+            z = 1 / y
+            equivalent['impedance'].append({'from_bus': int(ids[i]), 'to_bus': int(ids[j]),
+                                            'rft_pu': float(z.real), 'xft_pu': float(z.imag),
+                                            'sn_mva': float(baseMVA)})
+    return equivalent
+
+def readCache(projectPth: str) -> dict:
+    try:
+        with open(os.path.join(projectPth, REDUCTION_CACHE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def writeCache(projectPth: str, cache: dict) -> None:
+    try:
+        with open(os.path.join(projectPth, REDUCTION_CACHE), 'w') as file:
+            json.dump(cache, file)
+    except OSError as e:
+        print(f'-> Could not write the network equivalent cache of {projectPth}: {e}')
+
+# The kept part of net with the equivalent added, net itself is left as it is. Native tables
+# stay native tables, pandapower nets get pandapower impedances and wards.
+def applyEquivalent(net, keep: np.ndarray, equivalent: dict):
+    ids = net.bus.index[keep]
+    impedance = pd.DataFrame(equivalent['impedance'], columns = list(IMPEDANCE_COLUMNS)).astype(IMPEDANCE_COLUMNS)
+    ward = pd.DataFrame(equivalent['ward'], columns = list(WARD_COLUMNS)).astype(WARD_COLUMNS)
+    if isinstance(net, NativeNet):
+        reduced = NativeNet({name: table for name, table in net.items() if not name.startswith('res_')})
+        reduced.bus = net.bus[keep]
+        reduced.line = net.line[net.line.from_bus.isin(ids) & net.line.to_bus.isin(ids)]
+        reduced.trafo = net.trafo[net.trafo.hv_bus.isin(ids) & net.trafo.lv_bus.isin(ids)]
+        for table in ('gen', 'load', 'ext_grid'):
+            reduced[table] = net[table][net[table].bus.isin(ids)]
+        reduced.impedance = impedance.assign(in_service = True)
+        reduced.ward = ward.assign(in_service = True)
+        return reduced
+
+    import pandapower as pp
+    reduced = pp.select_subnet(net, ids)
+    for row in impedance.itertuples():
+        pp.create_impedance(reduced, row.from_bus, row.to_bus, row.rft_pu, row.xft_pu, row.sn_mva)
+    for row in ward.itertuples():
+        pp.create_ward(reduced, row.bus, row.ps_mw, row.qs_mvar, row.pz_mw, row.qz_mvar)
+    return reduced
+
+# Replaces the network outside the study zones by its equivalent, computed from the project
+# csvs when none is cached for the external part of net. Returns (reduced net, info).
+def reduceNetwork(projectPth: str, net, csvPaths: list, zones: list, freq: float, sBase,
+                  maxIter) -> tuple:
+    keep = retainedBuses(net, zones)
+    key = equivalentKey(net, keep, zones)
+    cache = readCache(projectPth)
+    equivalent = cache.pop(key, None)
+    cached = equivalent is not None
+    if not cached:
+        # The full solve behind it counts as the equivalent, not as phases of the run
+        with timed('equivalent'), timing(None):
+            equivalent = computeEquivalent(csvPaths, freq, sBase, zones, maxIter)
+    # Most recently used last, the oldest ones go first
+    cache[key] = equivalent
+    writeCache(projectPth, dict(list(cache.items())[-REDUCTION_CACHE_SIZE:]))
+    reduced = applyEquivalent(net, keep, equivalent)
+    info = {'zones': zones, 'retained': int(keep.sum()), 'external': equivalent['external'],
+            'boundary': equivalent['boundary'], 'impedances': len(equivalent['impedance']),
+            'cached': cached}
+    return reduced, info
+
+# Tables of a reduced run for writeResults in the layout of the full network: the element
+# tables of full and the results of reduced on their index, NaN for the replaced elements
+def expandResults(full, reduced) -> dict:
+    tables = {}
+    for (_, result), (_, element) in zip(RESULT_TABLES, DATA_TABLES):
+        tables[element] = full[element]
+        tables[result] = reduced[result].reindex(full[element].index)
+    return tables
@@ -0,0 +1,228 @@
+#   Monte Carlo probabilistic load flow
+#
+#   A distribution csv (Distributions.csv in the project folder) attaches a distribution to
+#   load and generator powers, one row per element and quantity:
+#       element     'load' or 'gen'
+#       id          id of the element in Loads.csv / Gens.csv
+#       quantity    'p' or 'q' for loads, 'p' for generators
+#       dist        'normal'    mean (project value when empty) and std in MW / MVAr
+#                   'uniform'   low and high in MW / MVAr
+#                   'empirical' drawn from the p_<id> / q_<id> column of LoadProfiles.csv or
+#                               GenProfiles.csv, multipliers or absolute values by profileMode
+#   Samples are drawn in rounds and solved by the batched Newton-Raphson of batch_solver.py,
+#   split over spawned worker processes and warm started from the base case. Sampling stops once the
+#   confidence intervals of every reported percentile of bus voltages and branch loadings
+#   are narrower than the tolerances, or at maxSamples. progress(done, total) is told before
+#   every round, the run stops without writing results once canceled() turns true.
+
+# Imports
+import os
+import multiprocessing as mp
+import math
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+from native_solver import buildTables, solveNative, startVoltages
+from batch_solver import solveNativeBatch
+from network_cache import networkCache
+from timeseries import LOAD_PROFILES, GEN_PROFILES
+
+DISTRIBUTIONS_FILE = 'Distributions.csv'
+DISTRIBUTIONS = ['normal', 'uniform', 'empirical']
+
+# (element, quantity) of the distribution csv -> (table, column) of the native tables
+QUANTITIES = {('load', 'p'): ('load', 'p_mw'), ('load', 'q'): ('load', 'q_mvar'),
+              ('gen', 'p'): ('gen', 'p_mw')}
+
+# Fewest samples a worker process is given, smaller rounds are not worth the transfer
+MIN_CHUNK = 100
+
+# What every worker process keeps between chunks
+workerState = {}
+
+def runProbabilistic(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str,
+                     genCsv: str, loadCsv: str, slacksCsv: str, maxIter, freq: float, sBase,
+                     distributionCsv: str = None, profileMode: str = 'scale',
+                     percentiles: tuple = (5, 50, 95), batchSize: int = 500,
+                     minSamples: int = 500, maxSamples: int = 20000, vmTol: float = 1e-3,
+                     loadingTol: float = 1.0, confidence: float = 0.95, randomSeed = None,
+                     workers: int = None, progress = None, canceled = None) -> tuple[bool, str, dict]:
+
+    info = {'samples': 0, 'converged': 0, 'rounds': 0, 'stoppedEarly': False, 'time': 0.0,
+            'canceled': False}
+    progress = progress or (lambda done, total: None)
+    canceled = canceled or (lambda: False)
+    if profileMode not in ('scale', 'absolute'):
+        return False, f'Unknown profile mode {profileMode!r}', info
+    startTime = perf_counter()
+    try:
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        net = buildTables(csvPaths, freq, sBase)
+        distributionCsv = distributionCsv or os.path.join(projectPth, DISTRIBUTIONS_FILE)
+        samplers = readDistributions(projectPth, net, distributionCsv, profileMode)
+
+        # Base case, every sample warm starts from it
+        seed = networkCache.loadWarmStart(projectPth, net)
+        converged, _ = solveNative(net, maxIter, None if seed is None else startVoltages(seed))
+        if not converged:
+            return False, 'Base case load flow did not converge', info
+        Vstart = startVoltages(net.res_bus)
+
+        rng = np.random.default_rng(randomSeed)
+        z = norm.ppf(0.5 + confidence / 2)
+        workers = workers or os.cpu_count() or 1
+        chunks = max(1, min(workers, batchSize // MIN_CHUNK))
+        vm, lineLoading, trafoLoading = [], [], []
+        executor = ProcessPoolExecutor(max_workers = chunks, mp_context = mp.get_context('spawn'),
+                                       initializer = initWorker,
+                                       initargs = (net, maxIter, Vstart)) if chunks > 1 else None
+        try:
+            initWorker(net, maxIter, Vstart)
+            rounds = math.ceil(maxSamples / batchSize)
+            while info['samples'] < maxSamples:
+                if canceled():
+                    info['canceled'] = True
+                    break
+                progress(info['rounds'], rounds)
+                size = min(batchSize, maxSamples - info['samples'])
+                columns = drawSamples(net, samplers, size, rng)
+                parts = [{key: values[part] for key, values in columns.items()}
+                         for part in np.array_split(np.arange(size), chunks) if len(part)]
+                results = executor.map(solveChunk, parts) if executor else map(solveChunk, parts)
+                for ok, busVm, lineLoad, trafoLoad in results:
+                    info['converged'] += int(ok.sum())
+                    vm.append(busVm[ok])
+                    lineLoading.append(lineLoad[ok])
+                    trafoLoading.append(trafoLoad[ok])
+                info['samples'] += size
+                info['rounds'] += 1
+
+                # Widths of the confidence intervals of every percentile, NaN columns are
+                # dead buses / branches and do not hold sampling back
+                if info['converged'] >= minSamples:
+                    widths = [np.nanmax(percentileIntervals(np.concatenate(samples), percentiles, z),
+                                        initial = 0.0)
+                              for samples in (vm, lineLoading, trafoLoading)]
+                    info['vmInterval'], info['loadingInterval'] = widths[0], max(widths[1:])
+                    if widths[0] <= vmTol and max(widths[1:]) <= loadingTol:
+                        info['stoppedEarly'] = info['samples'] < maxSamples
+                        break
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if info['canceled']:
+            return False, '', info
+        if not info['converged']:
+            return False, 'No sample converged', info
+        info['outputs'] = writeResults(projectPth, net, np.concatenate(vm), np.concatenate(lineLoading),
+                                       np.concatenate(trafoLoading), percentiles)
+
+    except Exception as e:
+        return False, str(e), info
+
+    info['time'] = perf_counter() - startTime
+    return True, '', info
+
+# One sampler per row of the distribution csv: (table, column, position, draw(size, rng))
+def readDistributions(projectPth: str, net, distributionCsv: str, profileMode: str) -> list:
+    table = pd.read_csv(distributionCsv)
+    profiles = {'load': os.path.join(projectPth, LOAD_PROFILES), 'gen': os.path.join(projectPth, GEN_PROFILES)}
+    samplers = []
+    for _, row in table.iterrows():
+        key = (row['element'], row['quantity'])
+        if key not in QUANTITIES:
+            raise KeyError(f'No distribution can be given for {row["element"]} {row["quantity"]}')
+        element, column = QUANTITIES[key]
+        elementId = int(row['id'])
+        if elementId not in net[element].index:
+            raise KeyError(f'Distribution of {element} {elementId} does not match any {element} id')
+        position = net[element].index.get_loc(elementId)
+        value = float(net[element][column].iat[position])
+
+        if row['dist'] == 'normal':
+            mean = value if pd.isna(row.get('mean')) else float(row['mean'])
+            std = float(row['std'])
+            draw = lambda size, rng, mean = mean, std = std: rng.normal(mean, std, size)
+        elif row['dist'] == 'uniform':
+            low, high = float(row['low']), float(row['high'])
+            draw = lambda size, rng, low = low, high = high: rng.uniform(low, high, size)
+        elif row['dist'] == 'empirical':
+            profileCol = f'{row["quantity"]}_{elementId}'
+            profile = pd.read_csv(profiles[row['element']], usecols = [profileCol])[profileCol]
+            observed = profile.dropna().to_numpy(dtype = float)
+            if not len(observed):
+                raise ValueError(f'Profile column {profileCol} holds no values')
+            if profileMode == 'scale':
+                observed = observed * value
+            draw = lambda size, rng, observed = observed: rng.choice(observed, size)
+        else:
+            raise ValueError(f'Unknown distribution {row["dist"]!r}, use one of {", ".join(DISTRIBUTIONS)}')
+        samplers.append((element, column, position, draw))
+    if not samplers:
+        raise ValueError(f'{distributionCsv} attaches no distribution')
+    return samplers
+
+# (samples, rows) arrays of the sampled columns, the rest keep their project values
+def drawSamples(net, samplers: list, size: int, rng: np.random.Generator) -> dict:
+    columns = {}
+    for element, column, position, draw in samplers:
+        if (element, column) not in columns:
+            base = net[element][column].to_numpy(dtype = float)
+            columns[(element, column)] = np.broadcast_to(base, (size, len(base))).copy()
+        columns[(element, column)][:, position] = draw(size, rng)
+    return columns
+
+def initWorker(net, maxIter, Vstart: np.ndarray) -> None:
+    workerState['net'] = net
+    workerState['maxIter'] = maxIter
+    workerState['Vstart'] = Vstart
+
+# Returns (converged, bus vm, line loading, trafo loading) of a chunk of samples
+def solveChunk(columns: dict) -> tuple:
+    size = len(next(iter(columns.values())))
+    batch = solveNativeBatch(workerState['net'], columns, size, workerState['maxIter'], workerState['Vstart'])
+    return (batch['converged'], batch['res_bus']['vm_pu'], batch['res_line']['loading_percent'],
+            batch['res_trafo']['loading_percent'])
+
+# Width of the distribution free confidence interval of every percentile of every column,
+# between the order statistics at n q -+ z sqrt(n q (1 - q)). Returns (percentiles, columns).
+def percentileIntervals(samples: np.ndarray, percentiles: tuple, z: float) -> np.ndarray:
+    n = len(samples)
+    ordered = np.sort(samples, axis = 0)
+    widths = []
+    for percentile in percentiles:
+        q = percentile / 100
+        spread = z * math.sqrt(n * q * (1 - q))
+        low = min(max(int(math.floor(n * q - spread)), 0), n - 1)
+        high = min(max(int(math.ceil(n * q + spread)), 0), n - 1)
+        widths.append(ordered[high] - ordered[low])
+    return np.array(widths)
+
+# Percentile bands, mean and the share of samples beyond the limits of every bus and branch
+def writeResults(projectPth: str, net, vm: np.ndarray, lineLoading: np.ndarray,
+                 trafoLoading: np.ndarray, percentiles: tuple) -> list:
+    paths = []
+    outputs = [('buses', net.bus.index, vm, 'vm_pu'),
+               ('lines', net.line.index, lineLoading, 'loading_percent'),
+               ('trafos', net.trafo.index, trafoLoading, 'loading_percent')]
+    for suffix, index, samples, name in outputs:
+        frame = pd.DataFrame(index = pd.Index(index, name = 'id'))
+        if len(index):
+            bands = np.percentile(samples, percentiles, axis = 0)
+            for percentile, band in zip(percentiles, bands):
+                frame[f'{name}_p{percentile:g}'] = band
+            frame[f'{name}_mean'] = samples.mean(axis = 0)
+            frame[f'{name}_std'] = samples.std(axis = 0)
+            if suffix == 'buses':
+                outside = (samples > net.bus.max_vm_pu.to_numpy(dtype = float)) | \
+                          (samples < net.bus.min_vm_pu.to_numpy(dtype = float))
+                frame['p_violation'] = outside.mean(axis = 0)
+            else:
+                frame['p_overload'] = (samples > 100).mean(axis = 0)
+        path = os.path.join(projectPth, f'probabilistic_{suffix}.csv')
+        frame.to_csv(path, index = True)
+        paths.append(path)
+    return paths
@@ -0,0 +1,62 @@
+#   Readers of the element csvs of a project, shared by the pandapower and the native solver
+
+# Imports
+import numpy as np
+import pandas as pd
+from run_profile import timed
+
+# Reads a project csv once and returns the requested columns as typed arrays
+def readCsvColumns(csvPath: str, columns: dict, defaults: dict = None) -> dict:
+    defaults = defaults or {}
+    with timed('csv parsing'):
+        try:
+            df = pd.read_csv(csvPath, dtype = str, keep_default_na = False)
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()
+    data = {}
+    for col, dtype in columns.items():
+        if col in df.columns:
+            data[col] = df[col].to_numpy().astype(dtype)
+        elif col in defaults:
+            data[col] = np.full(len(df), defaults[col], dtype = dtype)
+        else:
+            raise KeyError(f'{csvPath} has no column {col!r}')
+    return data
+
+def readBuses(busCsv: str) -> dict:
+    return readCsvColumns(busCsv, {'id': int, 'vMag': float, 'zone': int, 'name': object,
+                                   'maxVm': float, 'minVm': float})
+
+def readLines(lineCsv: str) -> dict:
+    # Lines connecting a bus to itself are dropped
+    lines = readCsvColumns(lineCsv, {'name': object, 'bus1id': int, 'bus2id': int, 'R': object,
+                                     'X': object, 'len': float, 'c_nf_per_km': object,
+                                     'max_i_ka': object})
+    keep = lines['bus1id'] != lines['bus2id']
+    return {col: values[keep] for col, values in lines.items()}
+
+def readTrafos(trafoCsv: str) -> dict:
+    return readCsvColumns(trafoCsv, {'id': int, 'name': object, 'hvBus': int, 'lvBus': int,
+                                     'sn_mva': float, 'vk_percent': float,
+                                     'vkr_percent': float, 'tap_step_percent': float})
+
+def readGens(genCsv: str) -> dict:
+    return readCsvColumns(genCsv, {'id': int, 'bus': int, 'name': object, 'pMW': float,
+                                   'vmPU': float, 'minQMvar': float, 'maxQMvar': float,
+                                   'minPMW': float, 'maxPMW': float},
+                          defaults = {'vmPU': 1.0, 'minQMvar': -1e6, 'maxQMvar': 1e6,
+                                      'minPMW': 0.0, 'maxPMW': 1e6})
+
+def readLoads(loadCsv: str) -> dict:
+    return readCsvColumns(loadCsv, {'id': int, 'bus': int, 'pMW': float, 'qMW': float})
+
+def readSlacks(slacksCsv: str) -> dict:
+    return readCsvColumns(slacksCsv, {'id': int, 'bus': int, 'vmPU': float, 'vaD': float,
+                                      'maxP': float, 'minP': float, 'maxQ': float,
+                                      'minQ': float})
+
+# All six element tables of a project, in the order of its csv paths
+def readProject(csvPaths: list) -> tuple:
+    busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv = csvPaths
+    return (readBuses(busCsv), readLines(lineCsv), readTrafos(trafoCsv), readGens(genCsv),
+            readLoads(loadCsv), readSlacks(slacksCsv))
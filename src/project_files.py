@@ -0,0 +1,58 @@
+#   Files of a project folder the GUI reads before a run
+#
+#   Names of the files runs leave in the project folder, fingerprints of the project csvs and
+#   the study zones of a reduction. Only the standard library is imported here, so the GUI
+#   can key and look up a run on its own thread without loading numpy, pandas or pandapower.
+
+# Imports
+import os
+import json
+import hashlib
+
+RESULTS_FILE = 'results.npz'
+WARM_START_INFO = 'warm_start.json'
+REDUCTION_SETTINGS = 'Reduction.json'
+
+# Size, mtime and content hash of every csv, the hash is reused while size and mtime match
+def fingerprintCsvs(csvPaths: list, previous: dict = None) -> dict:
+    previous = previous or {}
+    prints = {}
+    for path in csvPaths:
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        old = previous.get(name)
+        if old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime_ns:
+            prints[name] = old
+            continue
+        with open(path, 'rb') as file:
+            digest = hashlib.blake2b(file.read(), digest_size = 16).hexdigest()
+        prints[name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest}
+    return prints
+
+# Forgets that results.npz holds converged voltages to warm start from, for runs that replace
+# it with results of the dc load flow
+def dropWarmStart(projectPth: str) -> None:
+    path = os.path.join(projectPth, WARM_START_INFO)
+    try:
+        if os.path.isfile(path):
+            os.remove(path)
+    except OSError as e:
+        print(f'-> Could not remove the warm start info of {projectPth}: {e}')
+
+# Study zones of a project, empty when the full network is solved
+def readStudyZones(projectPth: str) -> list:
+    try:
+        with open(os.path.join(projectPth, REDUCTION_SETTINGS)) as file:
+            return sorted({int(zone) for zone in json.load(file).get('zones', [])})
+    except (OSError, ValueError, TypeError, AttributeError):
+        return []
+
+# Stores the study zones of a project, no zones switch the reduction off
+def writeStudyZones(projectPth: str, zones: list) -> None:
+    path = os.path.join(projectPth, REDUCTION_SETTINGS)
+    if not zones:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+    with open(path, 'w') as file:
+        json.dump({'zones': sorted({int(zone) for zone in zones})}, file)
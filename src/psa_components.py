@@ -1,9 +1,14 @@
 #   Components like Bus, Line and Network...
+from __future__ import annotations
 import csv
 import json
 from enum import Enum
+from typing import TYPE_CHECKING
 from termcolor import colored
-from PyQt6.QtCore import QPoint
+
+# Positions only need x() and y(), so the data classes work without Qt installed
+if TYPE_CHECKING:
+    from PyQt6.QtCore import QPoint
 
 class BusType(Enum):
     SLACK = 'slack'
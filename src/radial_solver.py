@@ -0,0 +1,108 @@
+#   Backward / forward sweep load flow for radial feeders
+#
+#   On a tree fed from one slack, the current of every branch is the sum of the bus currents
+#   below it (backward sweep) and every bus voltage is its parent's voltage minus the drop on
+#   the branch to it (forward sweep). With the buses in breadth first order from the slack,
+#   both sweeps are a solve with the same triangular matrix K = I - P, P[parent, child] = 1,
+#   and its transpose. K is factored once per solve, every sweep is then two sparse solves.
+#   Meshed networks and networks with voltage controlled generators are left to Newton-Raphson.
+
+# Imports
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order
+from scipy.sparse.linalg import splu
+from run_profile import timed
+from native_solver import NativeNet, branchModel, admittance, busModel, solveNative, writeNativeResults
+
+# Breadth first ordering of an energized tree, or None with the reason it is not one
+def radialOrder(branches: dict, model: dict, nBus: int) -> tuple:
+    if len(model['ref']) != 1:
+        return None, 'more than one slack'
+    if len(model['pv']):
+        return None, 'voltage controlled generators'
+    f, t = branches['from'], branches['to']
+    energized = model['energized']
+    inTree = energized[f] & energized[t]
+    if inTree.sum() != energized.sum() - 1:
+        return None, 'meshed'
+    # Entries of the graph hold branch number + 1, so the branch to every parent can be looked up
+    graph = sp.csr_matrix((np.arange(1, len(f) + 1)[inTree], (f[inTree], t[inTree])), shape = (nBus, nBus))
+    graph = (graph + graph.T).tocsr()
+    order, parents = breadth_first_order(graph, int(model['ref'][0]), directed = False)
+    children = order[1:]
+    parentBranch = np.asarray(graph[parents[children], children]).ravel().astype(np.int64) - 1
+    return {'order': order, 'parents': parents[children], 'children': children,
+            'parentBranch': parentBranch}, ''
+
+# Sweep matrices of a radial order: K in breadth first numbering, its factorization and the
+# series impedance and shunt admittance per bus of the branches
+def sweepModel(radial: dict, branches: dict, nBus: int) -> dict:
+    order = radial['order']
+    position = np.full(nBus, -1)
+    position[order] = np.arange(len(order))
+    n = len(order)
+    childPos, parentPos = position[radial['children']], position[radial['parents']]
+    K = sp.csc_matrix((np.r_[np.ones(n), -np.ones(len(childPos))],
+                       (np.r_[np.arange(n), parentPos], np.r_[np.arange(n), childPos])),
+                      shape = (n, n), dtype = complex)
+
+    # Series impedance from the parent to every bus, pi model shunts at both branch ends and
+    # the shunts of wards
+    branch = radial['parentBranch']
+    z = np.zeros(n, dtype = complex)
+    z[childPos] = -1 / branches['Yft'][branch]
+    shunt = np.zeros(nBus, dtype = complex)
+    np.add.at(shunt, branches['from'], branches['Yff'] + branches['Yft'])
+    np.add.at(shunt, branches['to'], branches['Ytt'] + branches['Ytf'])
+    shunt += branches['busShunt']
+    return {'K': splu(K), 'z': z, 'shunt': shunt[order]}
+
+# Returns (V in bus position order, converged, iterations)
+def sweep(sweeper: dict, order: np.ndarray, Sbus: np.ndarray, V0: np.ndarray, tol: float = 1e-10,
+          maxIter: int = 100) -> tuple:
+    K, z, shunt = sweeper['K'], sweeper['z'], sweeper['shunt']
+    S = Sbus[order]
+    V = V0[order].copy()
+    slack = V[0]
+    for iteration in range(1, int(maxIter) + 1):
+        # Backward: bus currents drawn by loads and shunts, summed up towards the slack
+        current = np.conj(-S / V) + shunt * V
+        branchCurrent = K.solve(current)
+        # Forward: voltage drops from the slack down
+        rhs = -z * branchCurrent
+        rhs[0] = slack
+        Vnew = K.solve(rhs, trans = 'T')
+        change = np.max(np.abs(Vnew - V))
+        V = Vnew
+        if not np.all(np.isfinite(V)):
+            break
+        if change < tol:
+            result = np.empty_like(V0)
+            result[order] = V
+            return result, True, iteration
+    result = V0.copy()
+    result[order] = V
+    return result, False, int(maxIter)
+
+# Solves the net with a sweep if it is radial and with Newton-Raphson otherwise, fills its
+# res_* tables and returns (converged, iterations, radial)
+def solveRadial(net: NativeNet, maxIter, Vstart: np.ndarray = None) -> tuple:
+    with timed('ybus'):
+        branches = branchModel(net)
+        Ybus, Yf, Yt = admittance(branches, len(net.bus))
+    model = busModel(net, branches, Vstart)
+    with timed('radial check'):
+        radial, reason = radialOrder(branches, model, len(net.bus))
+    if radial is None:
+        print(f'-> Network is not radial ({reason}), solving with Newton-Raphson.')
+        converged, iterations = solveNative(net, maxIter, Vstart)
+        return converged, iterations, False
+    with timed('solve'):
+        sweeper = sweepModel(radial, branches, len(net.bus))
+        V, converged, iterations = sweep(sweeper, radial['order'], model['Sbus'], model['V0'],
+                                         maxIter = maxIter)
+    if converged:
+        with timed('pf results'):
+            writeNativeResults(net, model, branches, Ybus, Yf, Yt, V)
+    return converged, iterations, True
@@ -0,0 +1,104 @@
+#   Memoized load flow results of a project
+#
+#   A run is keyed by the content hashes of the six project csvs and the run settings that
+#   change its results: method, maxIter, freq, sBase and the study zones of a reduction. After
+#   a converged run its results.npz and run info are kept in result_cache/ of the project
+#   folder, a later run with the same key puts them back as results.npz instead of solving.
+#   The last RESULT_CACHE_SIZE keys of a project are kept, the least recently used one goes
+#   first, so flipping between recent variants of a network costs a file copy. Only plain file
+#   helpers are imported, the GUI keys and looks up runs here without loading pandapower.
+
+# Imports
+import os
+import json
+import shutil
+import hashlib
+from project_files import RESULTS_FILE, fingerprintCsvs, readStudyZones, dropWarmStart
+
+RESULT_CACHE_DIR = 'result_cache'
+RESULT_CACHE_INDEX = 'index.json'
+RESULT_CACHE_SIZE = 8
+
+# Key of a run, None when a csv is missing and nothing can be stored for it
+def resultKey(projectPth: str, csvPaths: list, method: str, maxIter, freq: float, sBase):
+    index = readIndex(projectPth)
+    try:
+        prints = fingerprintCsvs(csvPaths, index['prints'])
+    except OSError:
+        return None
+    index['prints'] = prints
+    writeIndex(projectPth, index)
+    # Warm starting is left out: it only picks the voltages the solver starts from, a
+    # converged run ends at the same solution within the tolerance either way
+    settings = {'method': method, 'maxIter': int(maxIter), 'freq': float(freq), 'sBase': float(sBase),
+                'studyZones': readStudyZones(projectPth),
+                'csvs': {name: fp['hash'] for name, fp in sorted(prints.items())}}
+    return hashlib.blake2b(json.dumps(settings, sort_keys = True).encode(), digest_size = 16).hexdigest()
+
+def readIndex(projectPth: str) -> dict:
+    path = os.path.join(projectPth, RESULT_CACHE_DIR, RESULT_CACHE_INDEX)
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {'prints': {}, 'keys': []}
+
+def writeIndex(projectPth: str, index: dict) -> None:
+    folder = os.path.join(projectPth, RESULT_CACHE_DIR)
+    try:
+        os.makedirs(folder, exist_ok = True)
+        with open(os.path.join(folder, RESULT_CACHE_INDEX), 'w') as file:
+            json.dump(index, file)
+    except OSError as e:
+        print(f'-> Could not write the result cache index of {projectPth}: {e}')
+
+# Puts the stored results of a key back as results.npz and returns the info of the run that
+# made them, None when the key is not stored
+def lookupResults(projectPth: str, key: str):
+    index = readIndex(projectPth)
+    if key is None or key not in index['keys']:
+        return None
+    folder = os.path.join(projectPth, RESULT_CACHE_DIR)
+    try:
+        with open(os.path.join(folder, f'{key}.json')) as file:
+            info = json.load(file)
+        # Copied next to the results file and swapped in, like results_store writes it
+        path = os.path.join(projectPth, RESULTS_FILE)
+        shutil.copyfile(os.path.join(folder, f'{key}.npz'), path + '.tmp')
+        os.replace(path + '.tmp', path)
+    except (OSError, ValueError):
+        index['keys'].remove(key)
+        writeIndex(projectPth, index)
+        return None
+    # Stored dc results replace the voltages a warm start would read from results.npz
+    if info.get('method') == 'dc':
+        dropWarmStart(projectPth)
+    index['keys'].remove(key)
+    index['keys'].insert(0, key)
+    writeIndex(projectPth, index)
+    return info
+
+# Stores the results.npz of a converged run under its key, dropping the least recently used
+# keys beyond size
+def storeResults(projectPth: str, key: str, info: dict, size: int = RESULT_CACHE_SIZE) -> None:
+    if key is None:
+        return
+    folder = os.path.join(projectPth, RESULT_CACHE_DIR)
+    index = readIndex(projectPth)
+    try:
+        os.makedirs(folder, exist_ok = True)
+        shutil.copyfile(os.path.join(projectPth, RESULTS_FILE), os.path.join(folder, f'{key}.npz'))
+        with open(os.path.join(folder, f'{key}.json'), 'w') as file:
+            json.dump(info, file, default = str)
+    except OSError as e:
+        print(f'-> Could not store the results of the run in {folder}: {e}')
+        return
+    index['keys'] = [key] + [old for old in index['keys'] if old != key]
+    for old in index['keys'][size:]:
+        for suffix in ('.npz', '.json'):
+            try:
+                os.remove(os.path.join(folder, old + suffix))
+            except OSError:
+                pass
+    index['keys'] = index['keys'][:size]
+    writeIndex(projectPth, index)
@@ -0,0 +1,128 @@
+#   Binary columnar store for the tables of a load flow run
+#
+#   Everything a run used to write as data_*.csv and results_*.csv goes into one uncompressed
+#   results.npz in the project folder, one .npy member per column named <table>/<column>, plus
+#   <table>/index. Members are stored without compression, so a reader can memory map every
+#   column straight out of the file instead of parsing text. CSVs are only written on export.
+
+# Imports
+import os
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+from project_files import RESULTS_FILE
+
+COLUMNS_MEMBER = '__columns__'
+
+# (table name in the file, pandapower table), the names match the old csv file names
+RESULT_TABLES = [('results_buses', 'res_bus'), ('results_lines', 'res_line'),
+                 ('results_trafos', 'res_trafo'), ('results_loads', 'res_load'),
+                 ('results_gens', 'res_gen'), ('results_slacks', 'res_ext_grid')]
+DATA_TABLES = [('data_buses', 'bus'), ('data_lines', 'line'), ('data_trafos', 'trafo'),
+               ('data_loads', 'load'), ('data_gens', 'gen'), ('data_slacks', 'ext_grid')]
+
+# Numbers and booleans are stored as they are, everything else as fixed width text
+def columnArray(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_bool_dtype(column) or pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy()
+    return column.astype(str).to_numpy(dtype = str)
+
+def writeResults(projectPth: str, net) -> str:
+    members, columns = {}, {}
+    for name, table in RESULT_TABLES + DATA_TABLES:
+        frame = net[table]
+        columns[name] = [str(col) for col in frame.columns]
+        members[f'{name}/index'] = frame.index.to_numpy()
+        for col in frame.columns:
+            members[f'{name}/{col}'] = columnArray(frame[col])
+    members[COLUMNS_MEMBER] = np.array(json.dumps(columns))
+
+    # Written next to the old file and swapped in, readers never see half a file
+    path = os.path.join(projectPth, RESULTS_FILE)
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'wb') as file:
+        np.savez(file, **members)
+    os.replace(tmpPath, path)
+    return path
+
+class ResultsFile():
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.members = {} # member name -> (offset, dtype, shape, fortranOrder)
+        self.positions = {} # table -> {element id: row position}, built on first lookup
+        with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+            for member in archive.infolist():
+                if member.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(f'{path} holds compressed members and cannot be memory mapped')
+                # Local file header: 30 fixed bytes, then the name and the extra field
+                file.seek(member.header_offset + 26)
+                nameLength, extraLength = np.frombuffer(file.read(4), dtype = '<u2')
+                file.seek(member.header_offset + 30 + int(nameLength) + int(extraLength))
+                version = np.lib.format.read_magic(file)
+                if version == (1, 0):
+                    shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(file)
+                else:
+                    shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(file)
+                self.members[member.filename[:-len('.npy')]] = (file.tell(), dtype, shape, fortranOrder)
+        self.columns = json.loads(str(self.array(COLUMNS_MEMBER)))
+
+    # Read only memory map of one member, nothing is read until it is used
+    def array(self, member: str) -> np.ndarray:
+        offset, dtype, shape, fortranOrder = self.members[member]
+        if int(np.prod(shape)) == 0 or dtype.hasobject:
+            with open(self.path, 'rb') as file:
+                file.seek(offset)
+                return np.fromfile(file, dtype = dtype, count = int(np.prod(shape))).reshape(shape)
+        return np.memmap(self.path, dtype = dtype, mode = 'r', offset = offset, shape = shape,
+                         order = 'F' if fortranOrder else 'C')
+
+    def tables(self) -> list:
+        return list(self.columns)
+
+    def column(self, table: str, column: str) -> np.ndarray:
+        return self.array(f'{table}/{column}')
+
+    def index(self, table: str) -> np.ndarray:
+        return self.array(f'{table}/index')
+
+    def table(self, table: str) -> pd.DataFrame:
+        return pd.DataFrame({col: self.column(table, col) for col in self.columns[table]},
+                            index = self.index(table), copy = False)
+
+    # Values of the row at a position, without building the whole table
+    def row(self, table: str, position: int) -> dict:
+        return {col: self.column(table, col)[position] for col in self.columns[table]}
+
+    # Row position of an element id in a table, None when the table has no row for it
+    def position(self, table: str, id: int):
+        if table not in self.positions:
+            ids = self.index(table).tolist()
+            self.positions[table] = {int(index): position for position, index in enumerate(ids)}
+        return self.positions[table].get(int(id))
+
+    def rowCount(self, table: str) -> int:
+        return self.members[f'{table}/index'][2][0]
+
+# The last opened file per path, reopened once the file on disk changes
+openedFiles = {}
+
+def openResults(path: str) -> ResultsFile:
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    cached = openedFiles.get(path)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, ResultsFile(path))
+        openedFiles[path] = cached
+    return cached[1]
+
+# Writes the tables of the results file as <table>.csv into the project folder, the layout
+# of the csvs earlier runs wrote
+def exportCsv(projectPth: str, tables: list = None) -> list:
+    results = openResults(os.path.join(projectPth, RESULTS_FILE))
+    paths = []
+    for table in tables or results.tables():
+        path = os.path.join(projectPth, f'{table}.csv')
+        results.table(table).to_csv(path, index = True, na_rep = 'NaN')
+        paths.append(path)
+    return paths
@@ -1,15 +1,18 @@
 # Import
-from PyQt6.QtWidgets import QDialog, QLabel, QWidget, QHBoxLayout, QLineEdit, QComboBox, QVBoxLayout, QDialogButtonBox, QMessageBox
+from PyQt6.QtWidgets import QDialog, QLabel, QWidget, QHBoxLayout, QLineEdit, QComboBox, QVBoxLayout, QDialogButtonBox, QMessageBox, QCheckBox
 
 # Dialogs to handle user input for running load flow calculation
 class RunSimDialog(QDialog):
-    def __init__(self, parent, freq, sBase, theme = 'dark') -> None:
+    def __init__(self, parent, freq, sBase, theme = 'dark', lastRun = None) -> None:
         super().__init__(parent)
         self.projectPath = None
         self.freq = freq # frequency of the network
         self.sBase = sBase
         self.activatedMethod = 'nr' # set default load flow method to newton-raphson
         self.maxIter = 1000
+        self.warmStart = True # seed the solver with the last converged results
+        self.timeBudget = 0.0 # seconds a run may take before it is canceled, 0 for no limit
+        self.profile = '' # '', 'cprofile' or 'tracemalloc'
         self.canceled = False
 
         # Styling
@@ -33,6 +36,10 @@ class RunSimDialog(QDialog):
             font-size: 14px;
             color: {'#ffffff' if theme == 'dark' else '#000000'};
         }}
+        QCheckBox {{
+            font-size: 12px;
+            color: {'#ffffff' if theme == 'dark' else '#000000'};
+        }}
         QComboBox {{
             font-size: 12px;
             color: {'#ffffff' if theme == 'dark' else '#000000'};
@@ -75,6 +82,9 @@ class RunSimDialog(QDialog):
         self.methDropDown.addItem('Newton Raphson')
         self.methDropDown.addItem('Gauss Seidel')
         self.methDropDown.addItem('Fast Decoupled')
+        self.methDropDown.addItem('DC Load Flow')
+        self.methDropDown.addItem('Newton Raphson (Native)')
+        self.methDropDown.addItem('Backward/Forward Sweep (Radial)')
         self.methDropDown.activated.connect(self.method)
         self.methHBox.addWidget(self.methDropDown)
         self.methWidget.setLayout(self.methHBox)
@@ -106,11 +116,36 @@ class RunSimDialog(QDialog):
         self.maxIterInput = QLineEdit(self)
         self.maxIterInput.setPlaceholderText('Max Iterations')
         self.maxIterInput.setText('1000')  # Default value
+        self.timeBudgetLabel = QLabel('Time Budget (s):')
+        self.timeBudgetInput = QLineEdit(self)
+        self.timeBudgetInput.setPlaceholderText('0 for no limit')
+        self.timeBudgetInput.setText('0')
         self.maxIterHBox.addWidget(self.maxIterLabel)
         self.maxIterHBox.addWidget(self.maxIterInput)
+        self.maxIterHBox.addWidget(self.timeBudgetLabel)
+        self.maxIterHBox.addWidget(self.timeBudgetInput)
         self.maxIterWidget = QWidget()
         self.maxIterWidget.setLayout(self.maxIterHBox)
 
+        # Warm start check box
+        self.warmStartCheck = QCheckBox('Warm start from the last converged results', self)
+        self.warmStartCheck.setChecked(self.warmStart)
+
+        # Profiling of the run, shown in the results and logged to run_log.jsonl
+        self.profileLabel = QLabel('Profiling:')
+        self.profileHBox = QHBoxLayout()
+        self.profileDropDown = QComboBox(self)
+        self.profileDropDown.addItem('Off')
+        self.profileDropDown.addItem('cProfile (CPU time per function)')
+        self.profileDropDown.addItem('tracemalloc (memory per line)')
+        self.profileHBox.addWidget(self.profileLabel)
+        self.profileHBox.addWidget(self.profileDropDown)
+        self.profileWidget = QWidget()
+        self.profileWidget.setLayout(self.profileHBox)
+
+        # Iterations of the previous solve
+        self.lastRunLabel = QLabel(f'Last run: {describeSolve(lastRun) if lastRun else "none"}')
+
         # Button Box
         self.buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
         self.buttonBox.rejected.connect(self.reject)
@@ -123,6 +158,9 @@ class RunSimDialog(QDialog):
         layout.addWidget(self.fsLabel)
         layout.addWidget(self.fsWidget)
         layout.addWidget(self.maxIterWidget)
+        layout.addWidget(self.warmStartCheck)
+        layout.addWidget(self.profileWidget)
+        layout.addWidget(self.lastRunLabel)
         layout.addWidget(self.buttonBox)
         self.setLayout(layout)
 
@@ -131,9 +169,13 @@ class RunSimDialog(QDialog):
         inputList.append(self.freqInput.text())
         inputList.append(self.sBaseInput.text())
         inputList.append(self.maxIterInput.text())
+        inputList.append(self.timeBudgetInput.text())
         self.freq = float(self.freqInput.text())
         self.sBase = float(self.sBaseInput.text())
         self.maxIter = int(self.maxIterInput.text())
+        self.warmStart = self.warmStartCheck.isChecked()
+        self.timeBudget = float(self.timeBudgetInput.text() or 0)
+        self.profile = ['', 'cprofile', 'tracemalloc'][self.profileDropDown.currentIndex()]
         if '' in inputList:
             self.inputError = True
             QMessageBox.warning(self, 'Fill all the fields.',
@@ -151,7 +193,43 @@ class RunSimDialog(QDialog):
             self.activatedMethod = 'gs'
         elif index == 2:
             self.activatedMethod = 'fdbx'
+        elif index == 3:
+            self.activatedMethod = 'dc'
+        elif index == 4:
+            self.activatedMethod = 'native'
+        elif index == 5:
+            self.activatedMethod = 'sweep'
+        # a dc load flow is one linear solve, it neither iterates nor warm starts
+        self.maxIterInput.setEnabled(self.activatedMethod != 'dc')
+        self.warmStartCheck.setEnabled(self.activatedMethod != 'dc')
 
     def reject(self) -> None:
         self.canceled = True
         super().accept()
+
+# Describes how many iterations a solve took and how it was started
+def describeSolve(info: dict) -> str:
+    if info.get('memoized'):
+        return f'reused the results of an identical earlier run: {describeSolve(dict(info, memoized = False))}'
+    if info.get('method') == 'dc':
+        return 'DC load flow (one linear solve, no reactive power)'
+    start = 'warm start' if info['init'] == 'results' else 'flat start'
+    if info.get('fallback'):
+        start = 'flat start after a diverged warm start'
+    if info.get('method') == 'sweep':
+        solver = 'radial sweep' if info.get('radial') else 'not radial, Newton Raphson'
+        start = f'{start}, {solver}'
+    if info.get('islands', 1) > 1:
+        start = f'{start}, {info["islands"]} islands solved separately'
+    text = f'{info["iterations"]} iterations ({start})'
+    if info.get('reduction'):
+        reduction = info['reduction']
+        zones = ', '.join(str(zone) for zone in reduction['zones'])
+        equivalent = 'cached equivalent' if reduction['cached'] else 'new equivalent'
+        text += (f'; {reduction["external"]} buses outside zone(s) {zones} replaced by a {equivalent} '
+                 f'at {reduction["boundary"]} boundary buses, the replaced elements have no results')
+    if info.get('divergedIslands'):
+        diverged = info['divergedIslands']
+        islands = 'islands at slack buses' if len(diverged) > 1 else 'island at slack bus'
+        text += f'; the {islands} {", ".join(str(bus) for bus in diverged)} did not converge and have no results'
+    return text
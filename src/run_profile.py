@@ -0,0 +1,158 @@
+#   Timing of the phases of a load flow run, optional profiling and the run log of a project
+#
+#   The simulator wraps its steps in timed(phase). Phases nest, a phase only counts the time
+#   not spent in the phases inside it, so the timings of a run add up to its total. While a
+#   timer is active, pandapower's conversion to the internal model, Ybus building and result
+#   extraction are timed as phases of their own inside the solve, pandapower is left as it
+#   was once the timer ends.
+
+# Imports
+import io
+import os
+import json
+import pstats
+import cProfile
+import functools
+import importlib
+import contextlib
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+# Phases of simulator.runLoadFlow in order, reported through its progress callback. They live
+# here so the GUI can show them without importing the simulator and pandapower.
+PHASES = ['parsing', 'building', 'solving', 'writing']
+
+RUN_LOG_FILE = 'run_log.jsonl'
+PROFILE_FILE = 'run_profile.prof'
+PROFILE_MODES = ['', 'cprofile', 'tracemalloc']
+
+# (module, function, phase) of the pandapower steps timed inside pp.runpp / pp.rundcpp
+PANDAPOWER_PHASES = [('pandapower.powerflow', '_pd2ppc', 'ppc'),
+                     ('pandapower.pf.run_newton_raphson_pf', '_get_Y_bus', 'ybus'),
+                     ('pandapower.powerflow', '_ppci_to_net', 'pf results')]
+
+class PhaseTimer():
+    def __init__(self) -> None:
+        self.timings = {} # phase -> seconds, in the order the phases first ran
+        self.stack = []   # [phase, start of its current stretch] of the running phases
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        now = perf_counter()
+        if self.stack:
+            self.add(self.stack[-1][0], now - self.stack[-1][1])
+        entry = [name, now]
+        self.stack.append(entry)
+        try:
+            yield
+        finally:
+            now = perf_counter()
+            self.stack.pop()
+            self.add(name, now - entry[1])
+            if self.stack:
+                self.stack[-1][1] = now
+
+    def add(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+# Timer of the run in progress, None outside of runs
+activeTimer = None
+
+def timed(name: str):
+    if activeTimer is None:
+        return contextlib.nullcontext()
+    return activeTimer.phase(name)
+
+@contextlib.contextmanager
+def timing(timer: PhaseTimer):
+    global activeTimer
+    hooked = hookPandapower()
+    previous, activeTimer = activeTimer, timer
+    try:
+        yield timer
+    finally:
+        activeTimer = previous
+        for module, functionName, function in hooked:
+            setattr(module, functionName, function)
+
+def timedFunction(name: str, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with timed(name):
+            return function(*args, **kwargs)
+    wrapper.timedPhase = name
+    return wrapper
+
+# Wraps the pandapower steps not wrapped yet, returns (module, name, original function) of
+# each to restore. Steps missing in the installed version stay part of 'solve'.
+def hookPandapower() -> list:
+    hooked = []
+    for moduleName, functionName, name in PANDAPOWER_PHASES:
+        try:
+            module = importlib.import_module(moduleName)
+            function = getattr(module, functionName)
+        except (ImportError, AttributeError):
+            continue
+        if not hasattr(function, 'timedPhase'):
+            setattr(module, functionName, timedFunction(name, function))
+            hooked.append((module, functionName, function))
+    return hooked
+
+# Runs the block under cProfile or tracemalloc, the text report goes to report['profileReport'].
+# cProfile also dumps its stats to run_profile.prof in the project folder (snakeviz, pstats).
+@contextlib.contextmanager
+def profiled(mode: str, report: dict, projectPth: str):
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream = stream).sort_stats('cumulative').print_stats(25)
+            report['profileReport'] = stream.getvalue()
+            try:
+                profiler.dump_stats(os.path.join(projectPth, PROFILE_FILE))
+            except OSError as e:
+                print(f'-> Could not write the profile to {projectPth}: {e}')
+    elif mode == 'tracemalloc':
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report['peakMemoryMb'] = peak / 1e6
+            lines = [f'Peak traced memory: {peak / 1e6:.1f} MB', 'Largest allocations by line:']
+            lines += [str(stat) for stat in snapshot.statistics('lineno')[:25]]
+            report['profileReport'] = '\n'.join(lines)
+    else:
+        yield
+
+def appendRunLog(projectPth: str, record: dict) -> None:
+    record = {'time': datetime.now().isoformat(timespec = 'seconds'), **record}
+    try:
+        with open(os.path.join(projectPth, RUN_LOG_FILE), 'a') as file:
+            file.write(json.dumps(record) + '\n')
+    except OSError as e:
+        print(f'-> Could not append to the run log of {projectPth}: {e}')
+
+def readRunLog(projectPth: str) -> list:
+    path = os.path.join(projectPth, RUN_LOG_FILE)
+    if not os.path.isfile(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+# Rows (phase, seconds, share of the total in percent) of the timings of a run
+def timingRows(timings: dict, total: float) -> list:
+    rows = [(name, seconds, 100 * seconds / total if total else 0.0)
+            for name, seconds in timings.items()]
+    return rows + [('total', total, 100.0 if total else 0.0)]
+
+def formatTimings(timings: dict, total: float) -> str:
+    return '\n'.join(f'  {name:<16}{seconds:>10.4f} s {share:>6.1f} %'
+                     for name, seconds, share in timingRows(timings, total))
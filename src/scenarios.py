@@ -0,0 +1,228 @@
+#   Batch runner for variants of one project spread over spawned worker processes
+#
+#   A scenario table is a csv with one row per case. 'name' labels the case, the other
+#   columns are optional and empty cells leave the project value alone:
+#       loadScale, genScale         multiply every load P/Q or generator P
+#       slackVm                     voltage setpoint of every slack
+#       load_p_<id>, load_q_<id>    MW / MVAr of one load of Loads.csv
+#       gen_p_<id>, gen_vm_<id>     MW / setpoint of one generator of Gens.csv
+#       slack_vm_<id>               setpoint of one slack of Slacks.csv
+#
+#   With batched = True every case is solved in one vectorized Newton-Raphson of
+#   batch_solver.py on the native tables instead of one solver call per case in the pool.
+
+# Imports
+import os
+import multiprocessing as mp
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from network_cache import networkCache
+from simulator import loadNetwork, solveWithFallback
+from native_solver import buildTables, solveNative, startVoltages
+from batch_solver import solveNativeBatch
+
+# (element table, column) a scenario column can set, keyed by its prefix
+ELEMENT_COLUMNS = {
+    'load_p_': ('load', 'p_mw'),
+    'load_q_': ('load', 'q_mvar'),
+    'gen_p_': ('gen', 'p_mw'),
+    'gen_vm_': ('gen', 'vm_pu'),
+    'slack_vm_': ('ext_grid', 'vm_pu'),
+}
+
+# (result table, columns, output file suffix) gathered for every scenario
+RESULTS = [
+    ('res_bus', ['vm_pu', 'va_degree', 'p_mw', 'q_mvar'], 'buses'),
+    ('res_line', ['p_from_mw', 'q_from_mvar', 'pl_mw', 'ql_mvar', 'i_ka', 'loading_percent'], 'lines'),
+    ('res_trafo', ['p_hv_mw', 'q_hv_mvar', 'pl_mw', 'ql_mvar', 'loading_percent'], 'trafos'),
+    ('res_gen', ['p_mw', 'q_mvar', 'vm_pu', 'va_degree'], 'gens'),
+    ('res_ext_grid', ['p_mw', 'q_mvar'], 'slacks'),
+]
+
+# What every worker process keeps between cases
+workerState = {}
+
+def runScenarios(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str,
+                 genCsv: str, loadCsv: str, slacksCsv: str, method: str, maxIter,
+                 freq: float, sBase, scenarioCsv: str, workers: int = None,
+                 batched: bool = False) -> tuple[bool, str, dict]:
+
+    info = {'scenarios': 0, 'converged': 0, 'failed': [], 'time': 0.0}
+    startTime = perf_counter()
+    try:
+        scenarios = pd.read_csv(scenarioCsv)
+        if 'name' not in scenarios.columns:
+            scenarios['name'] = [f'Scenario {i + 1}' for i in range(len(scenarios))]
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        if batched:
+            net = buildTables(csvPaths, freq, sBase)
+            checkScenarioColumns(net, scenarios)
+            results = runBatched(projectPth, net, scenarios, maxIter)
+        else:
+            net = loadNetwork(projectPth, csvPaths, freq, sBase)
+            checkScenarioColumns(net, scenarios)
+            results = runPool(projectPth, net, scenarios, method, maxIter, workers)
+
+        info['outputs'] = writeResults(projectPth, net, results)
+        info['scenarios'] = len(results)
+        info['converged'] = sum(result['converged'] for result in results)
+        info['failed'] = [result['name'] for result in results if not result['converged']]
+
+    except Exception as e:
+        return False, str(e), info
+
+    info['time'] = perf_counter() - startTime
+    return True, '', info
+
+# Solves the cases one by one in worker processes, warm started from the base case
+def runPool(projectPth: str, net, scenarios: pd.DataFrame, method: str, maxIter, workers: int) -> list:
+    # Solve the base case once so every scenario can warm start from it
+    init = 'flat'
+    seed = networkCache.loadWarmStart(projectPth, net)
+    if seed is not None:
+        net.res_bus, init = seed, 'results'
+    baseInfo = {}
+    try:
+        solveWithFallback(net, method, maxIter, init, baseInfo)
+        warm = True
+    except (pp.LoadflowNotConverged, UserWarning):
+        warm = False
+
+    cases = [row.dropna().to_dict() for _, row in scenarios.iterrows()]
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(cases)))
+    chunk = max(1, len(cases) // (workers * 4))
+    with ProcessPoolExecutor(max_workers = workers, mp_context = mp.get_context('spawn'),
+                             initializer = initWorker, initargs = (net, method, maxIter, warm)) as executor:
+        return list(executor.map(runCase, cases, chunksize = chunk))
+
+# Solves all cases at once with the batched native Newton-Raphson, warm started from the
+# base case
+def runBatched(projectPth: str, net, scenarios: pd.DataFrame, maxIter) -> list:
+    seed = networkCache.loadWarmStart(projectPth, net)
+    converged, _ = solveNative(net, maxIter, None if seed is None else startVoltages(seed))
+    Vstart = startVoltages(net.res_bus) if converged else None
+    batch = solveNativeBatch(net, scenarioColumns(net, scenarios), len(scenarios), maxIter, Vstart)
+
+    results = []
+    for case, name in enumerate(scenarios['name']):
+        result = {'name': name, 'converged': bool(batch['converged'][case]),
+                  'iterations': 0, 'error': ''}
+        if result['converged']:
+            result['iterations'] = int(batch['iterations'][case])
+            for table, columns, _ in RESULTS:
+                result[table] = np.stack([batch[table][col][case] for col in columns], axis = 1)
+        else:
+            result['error'] = 'Load flow did not converge'
+        results.append(result)
+    return results
+
+# Element values of every scenario as (scenarios, rows) arrays, the way applyScenario sets them
+def scenarioColumns(net, scenarios: pd.DataFrame) -> dict:
+    nCases = len(scenarios)
+    columns = {}
+    for element, column in set(ELEMENT_COLUMNS.values()):
+        base = net[element][column].to_numpy(dtype = float)
+        columns[(element, column)] = np.broadcast_to(base, (nCases, len(base))).copy()
+    for scale, targets in (('loadScale', [('load', 'p_mw'), ('load', 'q_mvar')]),
+                           ('genScale', [('gen', 'p_mw')])):
+        if scale in scenarios:
+            factor = scenarios[scale].fillna(1.0).to_numpy(dtype = float)[:, None]
+            for target in targets:
+                columns[target] *= factor
+    if 'slackVm' in scenarios:
+        given = scenarios['slackVm'].to_numpy(dtype = float)[:, None]
+        columns[('ext_grid', 'vm_pu')] = np.where(np.isnan(given), columns[('ext_grid', 'vm_pu')], given)
+    for col in scenarios.columns:
+        prefix = next((p for p in ELEMENT_COLUMNS if col.startswith(p)), None)
+        if prefix is not None:
+            element, column = ELEMENT_COLUMNS[prefix]
+            position = net[element].index.get_loc(int(col[len(prefix):]))
+            given = scenarios[col].to_numpy(dtype = float)
+            values = columns[(element, column)]
+            values[:, position] = np.where(np.isnan(given), values[:, position], given)
+    return columns
+
+# Rejects columns that do not name a known element before any worker starts
+def checkScenarioColumns(net, scenarios: pd.DataFrame) -> None:
+    for col in scenarios.columns:
+        if col in ('name', 'loadScale', 'genScale', 'slackVm'):
+            continue
+        prefix = next((p for p in ELEMENT_COLUMNS if col.startswith(p)), None)
+        if prefix is None:
+            raise KeyError(f'Unknown scenario column {col}')
+        element, _ = ELEMENT_COLUMNS[prefix]
+        if int(col[len(prefix):]) not in net[element].index:
+            raise KeyError(f'Scenario column {col} does not match any {element} id')
+
+# Runs once per worker, the network is shipped here and not with every case
+def initWorker(net, method: str, maxIter, warm: bool) -> None:
+    workerState['net'] = net
+    workerState['method'] = method
+    workerState['maxIter'] = maxIter
+    workerState['baseResBus'] = net.res_bus.copy() if warm else None
+    workerState['base'] = {
+        (element, column): net[element][column].copy()
+        for element, column in set(ELEMENT_COLUMNS.values())
+    }
+
+def applyScenario(net, case: dict) -> None:
+    if 'loadScale' in case:
+        net.load['p_mw'] *= case['loadScale']
+        net.load['q_mvar'] *= case['loadScale']
+    if 'genScale' in case:
+        net.gen['p_mw'] *= case['genScale']
+    if 'slackVm' in case:
+        net.ext_grid['vm_pu'] = case['slackVm']
+    for col, value in case.items():
+        prefix = next((p for p in ELEMENT_COLUMNS if col.startswith(p)), None)
+        if prefix is not None:
+            element, column = ELEMENT_COLUMNS[prefix]
+            net[element].loc[int(col[len(prefix):]), column] = value
+
+def runCase(case: dict) -> dict:
+    net = workerState['net']
+    for (element, column), values in workerState['base'].items():
+        net[element][column] = values
+    applyScenario(net, case)
+
+    result = {'name': case['name'], 'converged': False, 'iterations': 0, 'error': ''}
+    init = 'flat'
+    if workerState['baseResBus'] is not None:
+        net.res_bus, init = workerState['baseResBus'].copy(), 'results'
+    stepInfo = {}
+    try:
+        solveWithFallback(net, workerState['method'], workerState['maxIter'], init, stepInfo)
+    except (pp.LoadflowNotConverged, UserWarning) as e:
+        result['error'] = str(e) or 'Load flow did not converge'
+        return result
+    result['converged'] = True
+    result['iterations'] = stepInfo['iterations']
+    for table, columns, _ in RESULTS:
+        result[table] = net[table][columns].to_numpy()
+    return result
+
+# Writes one long table per element type with a scenario column, plus a summary
+def writeResults(projectPth: str, net, results: list) -> list:
+    paths = []
+    summary = pd.DataFrame([{key: result[key] for key in ('name', 'converged', 'iterations', 'error')}
+                            for result in results])
+    path = os.path.join(projectPth, 'scenarios_summary.csv')
+    summary.to_csv(path, index = False)
+    paths.append(path)
+    for table, columns, suffix in RESULTS:
+        index = net[table[len('res_'):]].index
+        missing = np.full((len(index), len(columns)), np.nan)
+        path = os.path.join(projectPth, f'scenarios_{suffix}.csv')
+        if results:
+            # One frame for all scenarios, building one per scenario dominates large batches
+            values = np.concatenate([result.get(table, missing) for result in results])
+            frame = pd.DataFrame(values, columns = columns,
+                                 index = pd.Index(np.tile(index, len(results)), name = 'id'))
+            frame.insert(0, 'scenario', np.repeat([result['name'] for result in results], len(index)))
+            frame.to_csv(path, index = True)
+        paths.append(path)
+    return paths
@@ -0,0 +1,220 @@
+#   DC sensitivities of a project: power transfer (PTDF) and line outage (LODF) distribution factors
+#
+#   Rows of both matrices are the branches of the net, lines first and transformers after,
+#   PTDF columns are its buses. PTDF[l, b] is the MW change on branch l per MW injected at bus b
+#   and taken out at the slack, LODF[l, k] the share of branch k's flow that moves onto branch l
+#   when k goes out. The matrices only depend on the DC model of the network, so they are
+#   stored in the project folder and reused until its topology or branch reactances change.
+#   The DC base case flows are stored with them, an unchanged net needs no DC solve at all.
+
+# Imports
+import os
+import copy
+from time import perf_counter
+import hashlib
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from pandapower.pd2ppc import _pd2ppc
+from pandapower.pypower.idx_brch import F_BUS, T_BUS, BR_X, TAP, SHIFT, BR_STATUS
+from pandapower.pypower.idx_bus import BUS_TYPE, REF
+from pandapower.pypower.makePTDF import makePTDF
+from pandapower.pypower.makeLODF import makeLODF
+from network_cache import topologyHash
+from simulator import loadNetwork
+
+SENSITIVITY_FILE = 'sensitivity.npz'
+
+# Project path -> the last sensitivities loaded or computed there
+sensitivityCache = {}
+
+# Topology hash of the net extended by what the DC model of its branches depends on
+def sensitivityKey(net, ppci: dict) -> str:
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(topologyHash(net).encode())
+    branch = ppci['branch'][:, [F_BUS, T_BUS, BR_X, TAP, SHIFT, BR_STATUS]].real
+    digest.update(np.ascontiguousarray(branch, dtype = np.float64).tobytes())
+    digest.update(np.flatnonzero(ppci['bus'][:, BUS_TYPE] == REF).astype(np.int64).tobytes())
+    return digest.hexdigest()
+
+# Hash of every element table of the net and its base values. An equal hash means equal
+# matrices and base flows, so it is checked before anything is solved.
+def netHash(net) -> str:
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(f'{float(net.sn_mva)}|{float(net.f_hz)}'.encode())
+    for name in sorted(net.keys()):
+        table = net[name]
+        if (not isinstance(table, pd.DataFrame) or table.empty or name.startswith(('res_', '_'))
+                or name.endswith('geodata')):
+            continue
+        digest.update(name.encode())
+        digest.update(pd.util.hash_pandas_object(table, index = True).to_numpy().tobytes())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+# Returns the sensitivities of the net together with its DC base case flows:
+#   ptdf, lodf     float32 matrices, NaN rows for branches out of service
+#   buses          bus ids of the PTDF columns
+#   branches       DataFrame with element ('line' / 'trafo') and id of every row
+#   flows          DC base case MW flow of every branch, at its from / hv side
+#   ratings        MW a branch carries at 100 % loading with 1 pu voltage
+#   cached         whether the matrices came from memory or from the project folder
+def loadSensitivities(projectPth: str, net) -> dict:
+    projectPth = os.path.abspath(projectPth)
+    branches = pd.DataFrame({
+        'element': ['line'] * len(net.line) + ['trafo'] * len(net.trafo),
+        'id': np.r_[net.line.index.to_numpy(), net.trafo.index.to_numpy()].astype(np.int64),
+    })
+    ratings = np.r_[
+        (np.sqrt(3) * net.bus.vn_kv.loc[net.line.from_bus].to_numpy() * net.line.max_i_ka.to_numpy()
+         * net.line.df.to_numpy() * net.line.parallel.to_numpy()),
+        (net.trafo.sn_mva * net.trafo.parallel * net.trafo.df).to_numpy(),
+    ]
+    sensitivities = {'buses': net.bus.index.to_numpy(), 'branches': branches, 'ratings': ratings}
+
+    # The same net as last time gives the stored matrices and flows without solving
+    netKey = netHash(net)
+    matrices = sensitivityCache.get(projectPth)
+    cached = matrices is not None and matrices['netKey'] == netKey
+    if not cached:
+        matrices = readSensitivities(projectPth, 'netKey', netKey)
+        cached = matrices is not None
+
+    if not cached:
+        # A DC solve on a copy gives the internal model and the base flows, the cached net
+        # keeps its own results. Only changed injections keep the matrices of the topology.
+        dcNet = copy.deepcopy(net)
+        pp.rundcpp(dcNet)
+        _, ppci = _pd2ppc(dcNet)
+        key = sensitivityKey(dcNet, ppci)
+        flows = np.r_[dcNet.res_line.p_from_mw.to_numpy(), dcNet.res_trafo.p_hv_mw.to_numpy()]
+
+        matrices = sensitivityCache.get(projectPth)
+        cached = matrices is not None and matrices['key'] == key
+        if not cached:
+            matrices = readSensitivities(projectPth, 'key', key)
+            cached = matrices is not None
+        if not cached:
+            matrices = computeSensitivities(dcNet, ppci, key)
+        matrices = dict(matrices, netKey = netKey, flows = flows)
+        writeSensitivities(projectPth, matrices)
+
+    sensitivityCache[projectPth] = matrices
+    sensitivities.update(ptdf = matrices['ptdf'], lodf = matrices['lodf'], flows = matrices['flows'],
+                         key = matrices['key'], cached = cached)
+    return sensitivities
+
+# PTDF and LODF in net order, computed on the internal bus and branch order of pandapower
+def computeSensitivities(net, ppci: dict, key: str) -> dict:
+    ptdf = makePTDF(ppci['baseMVA'], ppci['bus'], ppci['branch'], using_sparse_solver = True)
+    lodf = makeLODF(ppci['branch'], ptdf)
+
+    # A branch that carries all of its own transfer is a bridge, taking it out islands part
+    # of the network. Rounding can leave its LODF column finite, so it is cleared here.
+    rowRange = np.arange(ptdf.shape[0])
+    fromBus = ppci['branch'][:, F_BUS].real.astype(np.int64)
+    toBus = ppci['branch'][:, T_BUS].real.astype(np.int64)
+    own = ptdf[rowRange, fromBus] - ptdf[rowRange, toBus]
+    lodf[:, np.abs(1 - own) < 1e-6] = np.nan
+
+    # Internal rows of the net's branches, -1 for branches left out of the internal model
+    branchIs = ppci['internal']['branch_is']
+    ppciRow = np.cumsum(branchIs) - 1
+    rows = []
+    for element in ('line', 'trafo'):
+        start, end = net._pd2ppc_lookups['branch'].get(element, (0, 0))
+        ppcRows = np.arange(start, end)
+        rows.append(np.where(branchIs[ppcRows], ppciRow[ppcRows], -1))
+    rows = np.concatenate(rows)
+    busRows = net._pd2ppc_lookups['bus'][net.bus.index]
+    busIn = (busRows >= 0) & (busRows < ppci['bus'].shape[0])
+
+    netPtdf = np.full((len(rows), len(busRows)), np.nan, dtype = np.float32)
+    netPtdf[np.ix_(rows >= 0, busIn)] = ptdf[np.ix_(rows[rows >= 0], busRows[busIn])]
+    netLodf = np.full((len(rows), len(rows)), np.nan, dtype = np.float32)
+    netLodf[np.ix_(rows >= 0, rows >= 0)] = lodf[np.ix_(rows[rows >= 0], rows[rows >= 0])]
+    return {'ptdf': netPtdf, 'lodf': netLodf, 'key': key}
+
+# Stored sensitivities whose key field ('key' or 'netKey') matches, None otherwise
+def readSensitivities(projectPth: str, field: str, key: str):
+    path = os.path.join(projectPth, SENSITIVITY_FILE)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if field not in data.files or str(data[field]) != key:
+                return None
+            return {name: data[name] if name in ('ptdf', 'lodf', 'flows') else str(data[name])
+                    for name in ('key', 'netKey', 'ptdf', 'lodf', 'flows')}
+    except Exception as e:
+        print(f'-> Ignoring unreadable sensitivities in {projectPth}: {e}')
+        return None
+
+def writeSensitivities(projectPth: str, matrices: dict) -> None:
+    try:
+        np.savez_compressed(os.path.join(projectPth, SENSITIVITY_FILE), key = matrices['key'],
+                            netKey = matrices['netKey'], ptdf = matrices['ptdf'],
+                            lodf = matrices['lodf'], flows = matrices['flows'])
+    except OSError as e:
+        print(f'-> Could not write sensitivities to {projectPth}: {e}')
+
+# Estimated MW flow of every branch (rows) after each outage (columns) without solving,
+# outages are (element, id) pairs and default to every branch. Outages that island a part
+# of the network have no estimate and give NaN columns.
+def estimateOutageFlows(sensitivities: dict, outages: list = None) -> pd.DataFrame:
+    branches = sensitivities['branches']
+    labels = pd.MultiIndex.from_frame(branches)
+    if outages is None:
+        columns = np.arange(len(branches))
+    else:
+        columns = labels.get_indexer(pd.MultiIndex.from_tuples(outages))
+        if (columns < 0).any():
+            raise KeyError('Outage does not match any line or transformer')
+    flows = sensitivities['flows']
+    lodf = sensitivities['lodf'][:, columns].astype(np.float64)
+    estimate = flows[:, None] + lodf * flows[columns][None, :]
+    estimate[:, np.isnan(lodf).all(axis = 0)] = np.nan
+    return pd.DataFrame(estimate, index = labels, columns = labels[columns])
+
+# Estimated MW flow of every branch after injecting MW at buses ({bus id: MW}), taken out
+# at the slack
+def estimateTransferFlows(sensitivities: dict, injections: dict) -> pd.Series:
+    buses = pd.Index(sensitivities['buses'])
+    positions = buses.get_indexer(list(injections))
+    if (positions < 0).any():
+        raise KeyError('Injection does not match any bus id')
+    change = sensitivities['ptdf'][:, positions].astype(np.float64) @ np.fromiter(
+        injections.values(), dtype = np.float64, count = len(injections))
+    return pd.Series(sensitivities['flows'] + change,
+                     index = pd.MultiIndex.from_frame(sensitivities['branches']))
+
+# Loading in percent of the branch ratings for estimated flows
+def estimateLoading(sensitivities: dict, flows):
+    ratings = pd.Series(sensitivities['ratings'], index = pd.MultiIndex.from_frame(sensitivities['branches']))
+    if isinstance(flows, pd.DataFrame):
+        return flows.abs().div(ratings, axis = 0) * 100
+    return flows.abs() / ratings * 100
+
+# Computes or loads the sensitivities of a project and writes them as sensitivity_ptdf.csv
+# (a column per bus id) and sensitivity_lodf.csv (a column per outaged branch)
+def runSensitivities(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str, genCsv: str,
+                     loadCsv: str, slacksCsv: str, freq: float, sBase) -> tuple[bool, str, dict]:
+
+    info = {'buses': 0, 'branches': 0, 'cached': False, 'time': 0.0, 'outputs': []}
+    startTime = perf_counter()
+    try:
+        net = loadNetwork(projectPth, [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv], freq, sBase)
+        sensitivities = loadSensitivities(projectPth, net)
+        labels = pd.MultiIndex.from_frame(sensitivities['branches'])
+        ptdf = pd.DataFrame(sensitivities['ptdf'], index = labels, columns = sensitivities['buses'])
+        lodf = pd.DataFrame(sensitivities['lodf'], index = labels,
+                            columns = [f'{element}_{index}' for element, index in labels])
+        for name, table in (('sensitivity_ptdf.csv', ptdf), ('sensitivity_lodf.csv', lodf)):
+            path = os.path.join(projectPth, name)
+            table.to_csv(path)
+            info['outputs'].append(path)
+        info.update(buses = ptdf.shape[1], branches = ptdf.shape[0], cached = sensitivities['cached'])
+    except Exception as e:
+        return False, str(e), info
+    info['time'] = perf_counter() - startTime
+    return True, '', info
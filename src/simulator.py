@@ -1,214 +1,633 @@
 # Imports
+import os
 from csv import DictReader
+import numpy as np
+import pandas as pd
 import pandapower as pp
+from network_cache import networkCache
+from time import perf_counter
+from results_store import writeResults, exportCsv as exportResultsCsv
+from run_profile import PHASES, PhaseTimer, timed, timing, profiled, appendRunLog
+from project_csv import readProject
+from results_store import RESULT_TABLES
+from native_solver import buildTables, solveNative, startVoltages
+from radial_solver import solveRadial
+from jit_warmup import enableJitCache
+from topology_check import validateTopology
+from project_files import readStudyZones, dropWarmStart
+from network_reduction import reduceNetwork, expandResults
+
+CSV_NAMES = ['Buses.csv', 'Lines.csv', 'Trafos.csv', 'Gens.csv', 'Loads.csv', 'Slacks.csv']
+
+# Methods solved on the csv tables without a pandapower net
+NATIVE_METHODS = ['native', 'sweep']
 
 # Methods of load flow calculations 
 def runLoadFlow(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str, 
                 genCsv: str, loadCsv: str, slacksCsv: str, method: str, maxIter,
-                freq: float, sBase) -> tuple[bool, str]:
+                freq: float, sBase, warmStart: bool = True,
+                progress = None, exportCsv: bool = False, profile: str = '',
+                printTables: bool = False) -> tuple[bool, str, dict]:
+
+    # Every run is timed phase by phase, profiled if asked for and logged to run_log.jsonl
+    timer, report = PhaseTimer(), {}
+    startTime = perf_counter()
+    with timing(timer), profiled(profile, report, projectPth):
+        success, error, info = solveProject(projectPth, busCsv, lineCsv, trafoCsv, genCsv,
+                                            loadCsv, slacksCsv, method, maxIter, freq, sBase,
+                                            warmStart, progress, exportCsv, printTables)
+    totalTime = perf_counter() - startTime
+    timings = dict(timer.timings)
+    timings['other'] = max(totalTime - sum(timings.values()), 0.0)
+    info.update(timings = timings, totalTime = totalTime, profileMode = profile, **report)
+    appendRunLog(projectPth, {
+        'method': method, 'maxIter': maxIter, 'freq': freq, 'sBase': sBase,
+        'warmStart': warmStart, 'profile': profile, 'success': success, 'error': error,
+        'iterations': info['iterations'], 'init': info['init'], 'fallback': info['fallback'],
+        'size': info.get('size', {}), 'divergedIslands': info.get('divergedIslands', []),
+        'totalTime': totalTime, 'timings': timings,
+        'peakMemoryMb': report.get('peakMemoryMb'),
+    })
+    return success, error, info
+
+def solveProject(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str, genCsv: str,
+                 loadCsv: str, slacksCsv: str, method: str, maxIter, freq: float, sBase,
+                 warmStart: bool, progress, exportCsv: bool,
+                 printTables: bool) -> tuple[bool, str, dict]:
 
+    info = {'iterations': 0, 'init': 'flat', 'fallback': False, 'method': method}
+    progress = progress or (lambda phase: None)
     try:
-        # Create empty network from scratch
         print('sBase:', sBase, 'freq:', freq)
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        if method in NATIVE_METHODS:
+            # The native solvers needs no pandapower net, its tables come straight from the csvs
+            progress('parsing')
+            net = buildTables(csvPaths, freq, sBase, progress)
+        else:
+            net = loadNetwork(projectPth, csvPaths, freq, sBase, progress)
+
+        # Outside the study zones of the project the network is replaced by its equivalent
+        zones, fullNet = readStudyZones(projectPth), net
+        if zones:
+            with timed('reduction'):
+                net, info['reduction'] = reduceNetwork(projectPth, net, csvPaths, zones, freq, sBase, maxIter)
+        info['size'] = {'buses': len(net.bus), 'lines': len(net.line), 'trafos': len(net.trafo),
+                        'gens': len(net.gen), 'loads': len(net.load), 'slacks': len(net.ext_grid)}
+
+        # The network tables only go to the console when asked for, printing them costs more
+        # than solving small networks
+        if printTables:
+            for name, table in (('bus', net.bus), ('line', net.line), ('trafo', net.trafo),
+                                ('load', net.load), ('gen', net.gen), ('slack', net.ext_grid)):
+                print(name, 30 * '-')
+                print(table)
+
+        # Seed the solver with the last converged voltages if the topology is the same
+        init = 'flat'
+        if warmStart and method != 'dc':
+            with timed('warm start'):
+                seed = networkCache.loadWarmStart(projectPth, net)
+            if seed is not None:
+                net.res_bus = seed
+                init = 'results'
+
+        progress('solving')
+        try:
+            with timed('solve'):
+                solveWithFallback(net, method, maxIter, init, info)
+
+        # Check for convergence
+        except pp.LoadflowNotConverged:
+            return False, 'Load flow did not converge', info
+
+        # Save network's data and results to results.npz, csvs only when asked for. A dc
+        # load flow leaves reactive powers as NaN, and results.npz no longer holds voltages
+        # an ac run can start from.
+        progress('writing')
+        with timed('writing'):
+            writeResults(projectPth, expandResults(fullNet, net) if zones else net)
+            if exportCsv:
+                exportResultsCsv(projectPth)
+            if method != 'dc':
+                networkCache.saveWarmStart(projectPth, net)
+            else:
+                dropWarmStart(projectPth)
+        return True, '', info
+
+    except Exception as e:
+        return False, str(e), info
+
+# The six project csvs in the argument order of runLoadFlow
+def projectCsvs(projectPath: str) -> list:
+    return [f'{projectPath}/{name}' for name in CSV_NAMES]
+
+# Reuses the cached network if no project csv changed, patches it if only element
+# parameters changed, otherwise builds it. Changed csvs are validated before either, from
+# the same parsed tables the patch or the build uses.
+def loadNetwork(projectPth: str, csvPaths: list, freq: float, sBase,
+                progress = None) -> pp.pandapowerNet:
+    progress = progress or (lambda phase: None)
+    progress('parsing')
+    with timed('cache lookup'):
+        net, prints, key, changed = networkCache.get(projectPth, csvPaths, freq, sBase)
+    tables = None
+    if net is None or changed:
+        tables = readProject(csvPaths)
+        validateTopology(*tables)
+    patched = False
+    if net is not None and changed:
+        with timed('elements'):
+            patched = patchNetwork(net, csvPaths, changed, tables)
+    if net is not None and not changed:
+        print('-> Project csvs unchanged, reusing cached network.')
+        progress('building')
+    elif patched:
+        progress('building')
+        with timed('cache store'):
+            networkCache.put(projectPth, net, prints, key)
+    else:
+        net = buildTablesNetwork(tables, freq, sBase, progress)
+        with timed('cache store'):
+            networkCache.put(projectPth, net, prints, key)
+    return net
+
+# Solves from init, a diverged warm start gets one more try from flat start
+def solveWithFallback(net, method: str, maxIter, init: str, info: dict) -> None:
+    info['init'], info['fallback'] = init, False
+    try:
+        info['iterations'] = solve(net, method, init, maxIter, info)
+    except (pp.LoadflowNotConverged, UserWarning) as e:
+        if init == 'flat':
+            raise
+        print(f'-> Warm start failed ({e}), retrying from flat start.')
+        info['init'], info['fallback'] = 'flat', True
+        info['iterations'] = solve(net, method, 'flat', maxIter, info)
+
+# Solves the net in place and returns the iterations it took
+def solve(net, method: str, init: str, maxIter, info: dict = None) -> int:
+    if method == 'sweep':
+        Vstart = startVoltages(net.res_bus) if init == 'results' else None
+        converged, iterations, radial = solveRadial(net, maxIter, Vstart)
+        if info is not None:
+            info['radial'] = radial
+        if radial and not converged:
+            raise pp.LoadflowNotConverged(f'Radial load flow did not converge in {iterations} iterations')
+        if not radial:
+            checkIslands(net, converged, iterations, info)
+        return iterations
+    if method == 'native':
+        Vstart = startVoltages(net.res_bus) if init == 'results' else None
+        converged, iterations = solveNative(net, maxIter, Vstart)
+        checkIslands(net, converged, iterations, info)
+        return iterations
+    if method == 'dc':
+        # Linearized flow: flat voltage magnitudes, no losses and no reactive power. The
+        # results of an earlier ac solve are dropped so no stale reactive power is left.
+        pp.reset_results(net)
+        pp.rundcpp(net)
+    else:
+        # pandapower's numba functions are loaded from the on disk cache once it is on
+        enableJitCache()
+        pp.runpp(
+            net, algorithm = method, init = init, enforce_q_lims = True, numba = True,
+            max_iteration = maxIter
+        )
+    return int(net._ppc['iterations'])
+
+# Confines a divergence of the native solver to its islands: raises only when no island
+# converged and lists the slack buses of the islands left without results in info
+def checkIslands(net, converged: bool, iterations: int, info: dict = None) -> None:
+    islands = net.res_island
+    if info is not None:
+        info['islands'] = len(islands)
+    if converged:
+        return
+    if not islands.converged.any():
+        raise pp.LoadflowNotConverged(f'Native load flow did not converge in {iterations} iterations')
+    diverged = islands.slack_bus[~islands.converged].tolist()
+    print(f'-> {len(diverged)} of {len(islands)} islands did not converge, their buses have no results.')
+    if info is not None:
+        info['divergedIslands'] = diverged
+
+# Solves a project with pandapower's and with the native Newton-Raphson and returns the
+# largest difference of every result column between them
+def crossCheck(projectPth: str, freq: float, sBase, maxIter = 100, tol: float = 1e-6) -> pd.DataFrame:
+    csvPaths = projectCsvs(projectPth)
+    net = buildNetwork(*csvPaths, freq, sBase)
+    solve(net, 'nr', 'flat', maxIter)
+    native = buildTables(csvPaths, freq, sBase)
+    solve(native, 'native', 'flat', maxIter)
+    rows = []
+    for name, table in RESULT_TABLES:
+        expected = net[table]
+        actual = native[table].reindex(index = expected.index, columns = expected.columns)
+        for column in expected.columns:
+            a = expected[column].to_numpy(dtype = float)
+            b = actual[column].to_numpy(dtype = float)
+            diff = np.where(np.isnan(a) & np.isnan(b), 0.0, np.abs(a - b))
+            diff = np.where(np.isnan(diff), np.inf, diff)
+            worst = float(diff.max()) if len(diff) else 0.0
+            scale = float(np.nanmax(np.abs(a))) if len(a) and not np.isnan(a).all() else 0.0
+            rows.append({'table': name, 'column': column, 'max_diff': worst,
+                         'ok': worst <= tol * max(1.0, scale)})
+    return pd.DataFrame(rows)
+
+# Builds the pandapower network with one bulk create call per element type
+def buildNetwork(busCsv: str, lineCsv: str, trafoCsv: str, genCsv: str, loadCsv: str,
+                 slacksCsv: str, freq: float, sBase, progress = None) -> pp.pandapowerNet:
+    tables = readProject([busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv])
+    return buildTablesNetwork(tables, freq, sBase, progress)
+
+# buildNetwork from the element tables readProject parsed
+def buildTablesNetwork(tables: tuple, freq: float, sBase, progress = None) -> pp.pandapowerNet:
+    buses, lines, trafos, gens, loads, slacks = tables
+    if progress:
+        progress('building')
+    with timed('elements'):
         net = pp.create_empty_network(sn_mva = sBase, f_hz = freq)
+        addBuses(net, buses)
+        addLines(net, lines)
+        addGens(net, gens)
+        addTrafos(net, trafos)
+        addLoads(net, loads)
+        addSlacks(net, slacks)
+    return net
 
-        # Load and add buses
-        with open(busCsv) as csvfile:
-            reader = DictReader(csvfile)
-            for row in reader:
-                pp.create_bus(
-                    net, vn_kv = float(row['vMag']), zone = int(row['zone']),
-                    name = row['name'], index = int(row['id']), in_service = True,
-                    type = 'b', max_vm_pu = float(row['maxVm']), min_vm_pu = float(row['minVm']),
-                )
-        
-        # Load and add lines
-        # First create the standard type with the actual parameters you want
-        with open(lineCsv) as csvfile:
-            reader = DictReader(csvfile)
-            for row in reader:
-                if row['bus1id'] != row['bus2id']:
-                    # Create a unique std_type for each line
-                    stdTypeName = f'custom_type_{row['name']}'
-                    if row['R'] == 'None':
-                        stdTypeName = 'NAYY 4x50 SE'
-                    else:
-                        pp.create_std_type(
-                            net,
-                            {
-                                'r_ohm_per_km': float(row['R']),
-                                'x_ohm_per_km': float(row['X']),
-                                'c_nf_per_km': float(row['c_nf_per_km']),
-                                'max_i_ka': float(row['max_i_ka']),
-                                'type': 'ol',
-                                'g_us_per_km': float(0)
-                            },
-                            name=stdTypeName,
-                            element='line'
-                        )
-                    # if not given the std_type params set it to default
-
-                    fromBus, toBus = int(row['bus1id']), int(row['bus2id'])
-                    pp.create_line(
-                        net, 
-                        from_bus=int(fromBus),
-                        to_bus=int(toBus), 
-                        length_km=float(row['len']),
-                        name=str(row['name']), 
-                        std_type=stdTypeName,  # Use the custom type we just created
-                        in_service=bool(True),
-                        max_loading_percent=float(100), 
-                        df=int(1), 
-                        parallel=int(1),
+def busEntries(buses: dict) -> dict:
+    return {'vn_kv': buses['vMag'], 'zone': buses['zone'], 'name': buses['name'],
+            'max_vm_pu': buses['maxVm'], 'min_vm_pu': buses['minVm']}
+
+def addBuses(net, buses: dict) -> None:
+    if len(buses['id']):
+        pp.create_buses(net, len(buses['id']), index = buses['id'], type = 'b',
+                        in_service = True, **busEntries(buses))
+
+# Every line with given parameters gets its own std_type, the others use NAYY 4x50 SE
+def lineEntries(net, lines: dict) -> dict:
+    stdTypes, stdTypeNames = {}, []
+    with timed('std types'):
+        for name, r, x, c, maxI in zip(lines['name'], lines['R'], lines['X'],
+                                       lines['c_nf_per_km'], lines['max_i_ka']):
+            if r == 'None':
+                stdTypeNames.append('NAYY 4x50 SE')
+                continue
+            stdTypeName = f'custom_type_{name}'
+            stdTypes[stdTypeName] = {
+                'r_ohm_per_km': float(r),
+                'x_ohm_per_km': float(x),
+                'c_nf_per_km': float(c),
+                'max_i_ka': float(maxI),
+                'type': 'ol',
+                'g_us_per_km': float(0)
+            }
+            stdTypeNames.append(stdTypeName)
+        if stdTypes:
+            pp.create_std_types(net, stdTypes, element = 'line')
+        params = [pp.load_std_type(net, name, 'line') for name in stdTypeNames]
+    return {
+        'length_km': lines['len'],
+        'std_type': np.array(stdTypeNames, dtype = object),
+        'r_ohm_per_km': np.array([p['r_ohm_per_km'] for p in params], dtype = float),
+        'x_ohm_per_km': np.array([p['x_ohm_per_km'] for p in params], dtype = float),
+        'c_nf_per_km': np.array([p['c_nf_per_km'] for p in params], dtype = float),
+        'max_i_ka': np.array([p['max_i_ka'] for p in params], dtype = float),
+        'g_us_per_km': np.array([p.get('g_us_per_km', 0) for p in params], dtype = float),
+        'type': np.array([p.get('type', None) for p in params], dtype = object),
+    }
+
+def addLines(net, lines: dict) -> None:
+    if len(lines['name']):
+        entries = lineEntries(net, lines)
+        pp.create_lines(
+            net, from_buses = lines['bus1id'], to_buses = lines['bus2id'],
+            length_km = entries['length_km'], std_type = list(entries['std_type']),
+            name = lines['name'].astype(str), in_service = True,
+            max_loading_percent = float(100), df = int(1), parallel = int(1),
+        )
+
+def genEntries(gens: dict) -> dict:
+    return {'bus': gens['bus'], 'name': gens['name'], 'p_mw': gens['pMW'],
+            'vm_pu': gens['vmPU'], 'min_q_mvar': gens['minQMvar'],
+            'max_q_mvar': gens['maxQMvar'], 'min_p_mw': gens['minPMW'],
+            'max_p_mw': gens['maxPMW']}
+
+def addGens(net, gens: dict) -> None:
+    if len(gens['id']):
+        entries = genEntries(gens)
+        index = pp.create_gens(
+            net, buses = entries.pop('bus'), controllable = True, slack = False,
+            slack_weight = 0, index = gens['id'], **entries,
+        )
+        net.gen.loc[index, 'type'] = None
+
+# Transformer std_types are keyed by voltage levels like createTransformerStdType
+def trafoEntries(net, trafos: dict) -> dict:
+    hvKv = net.bus.vn_kv.loc[trafos['hvBus']].to_numpy()
+    lvKv = net.bus.vn_kv.loc[trafos['lvBus']].to_numpy()
+    stdTypes, stdTypeNames = {}, []
+    with timed('std types'):
+        for i in range(len(trafos['id'])):
+            stdTypeName = f'custom_std_type_{hvKv[i]}_{lvKv[i]}'
+            stdTypes[stdTypeName] = trafoStdTypeParams(
+                hvKv[i], lvKv[i], trafos['sn_mva'][i], trafos['vk_percent'][i],
+                trafos['vkr_percent'][i], trafos['tap_step_percent'][i])
+            stdTypeNames.append(stdTypeName)
+        if stdTypes:
+            pp.create_std_types(net, stdTypes, element = 'trafo')
+    return {'name': trafos['name'], 'sn_mva': trafos['sn_mva'], 'vn_hv_kv': hvKv,
+            'vn_lv_kv': lvKv, 'vk_percent': trafos['vk_percent'],
+            'vkr_percent': trafos['vkr_percent'],
+            'tap_step_percent': trafos['tap_step_percent'],
+            'std_type': np.array(stdTypeNames, dtype = object)}
+
+def addTrafos(net, trafos: dict) -> None:
+    if len(trafos['id']):
+        entries = trafoEntries(net, trafos)
+        index = pp.create_transformers_from_parameters(
+            net, hv_buses = trafos['hvBus'], lv_buses = trafos['lvBus'],
+            sn_mva = entries['sn_mva'], vn_hv_kv = entries['vn_hv_kv'],
+            vn_lv_kv = entries['vn_lv_kv'], vkr_percent = entries['vkr_percent'],
+            vk_percent = entries['vk_percent'], pfe_kw = 0., i0_percent = 0.,
+            shift_degree = 0., tap_side = 'hv', tap_neutral = 0, tap_max = 0, tap_min = 0,
+            tap_pos = 0, tap_step_percent = entries['tap_step_percent'],
+            name = entries['name'], index = trafos['id'],
+        )
+        net.trafo.loc[index, 'std_type'] = entries['std_type']
+
+def loadEntries(loads: dict) -> dict:
+    return {'bus': loads['bus'], 'p_mw': loads['pMW'], 'q_mvar': loads['qMW']}
+
+# Loads are named by their row counter
+def addLoads(net, loads: dict) -> None:
+    if len(loads['id']):
+        entries = loadEntries(loads)
+        index = pp.create_loads(
+            net, buses = entries.pop('bus'), name = list(range(1, len(loads['id']) + 1)),
+            scaling = 1, type = None, in_service = True, index = loads['id'],
+            controllable = False, **entries,
+        )
+        net.load.loc[index, 'type'] = None
+
+def slackEntries(slacks: dict) -> dict:
+    return {'bus': slacks['bus'], 'vm_pu': slacks['vmPU'], 'va_degree': slacks['vaD'],
+            'max_p_mw': slacks['maxP'], 'min_p_mw': slacks['minP'],
+            'max_q_mvar': slacks['maxQ'], 'min_q_mvar': slacks['minQ']}
+
+# pandapower has no bulk ext_grid creation and projects hold only a few slacks
+def addSlacks(net, slacks: dict) -> None:
+    for i in range(len(slacks['id'])):
+        pp.create_ext_grid(net, bus = int(slacks['bus'][i]), vm_pu = float(slacks['vmPU'][i]),
+                           va_degree = float(slacks['vaD'][i]), slack_weight = 1,
+                           in_service = True, max_p_mw = float(slacks['maxP'][i]),
+                           min_p_mw = float(slacks['minP'][i]),
+                           max_q_mvar = float(slacks['maxQ'][i]),
+                           min_q_mvar = float(slacks['minQ'][i]), index = int(slacks['id'][i]))
+
+# Writes only the cells that differ from the new values, returns how many changed
+def patchTable(table: pd.DataFrame, entries: dict) -> int:
+    changedCells = 0
+    for col, new in entries.items():
+        old, new = table[col].to_numpy(), np.asarray(new)
+        if old.dtype.kind == 'f' and new.dtype.kind == 'f':
+            same = (old == new) | (np.isnan(old) & np.isnan(new))
+        else:
+            same = np.array([a == b for a, b in zip(old, new)], dtype = bool)
+        if not same.all():
+            table.loc[table.index[~same], col] = new[~same]
+            changedCells += int((~same).sum())
+    return changedCells
+
+# Replaces every row of an element table, used when elements were added or removed
+def replaceElements(net, element: str, add, data: dict) -> None:
+    net[element] = net[element].iloc[0:0]
+    add(net, data)
+
+# Forgets the std_types created from project csvs so they are created again in csv order
+def dropStdTypes(net, element: str, prefix: str) -> None:
+    net.std_types[element] = {name: params for name, params in net.std_types[element].items()
+                              if not name.startswith(prefix)}
+
+# Patches the cached network in place from the changed csvs, returns False if it needs
+# a rebuild because buses, lines or transformers were added or removed. tables are the
+# element tables readProject parsed from csvPaths.
+def patchNetwork(net, csvPaths: list, changed: list, tables: tuple) -> bool:
+    busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv = csvPaths
+    changed = set(changed)
+    patched = 0
+    parsed = dict(zip(csvPaths, tables))
+
+    buses = parsed[busCsv] if os.path.basename(busCsv) in changed else None
+    lines = parsed[lineCsv] if os.path.basename(lineCsv) in changed else None
+    trafos = parsed[trafoCsv] if os.path.basename(trafoCsv) in changed else None
+
+    # Topology checks, any of these means a rebuild
+    if buses is not None and not np.array_equal(buses['id'], net.bus.index.to_numpy()):
+        return False
+    if lines is not None:
+        if len(lines['name']) != len(net.line):
+            return False
+        if not (np.array_equal(lines['bus1id'], net.line.from_bus.to_numpy())
+                and np.array_equal(lines['bus2id'], net.line.to_bus.to_numpy())
+                and list(lines['name'].astype(str)) == list(net.line.name)):
+            return False
+    if trafos is not None:
+        if not (np.array_equal(trafos['id'], net.trafo.index.to_numpy())
+                and np.array_equal(trafos['hvBus'], net.trafo.hv_bus.to_numpy())
+                and np.array_equal(trafos['lvBus'], net.trafo.lv_bus.to_numpy())):
+            return False
+
+    if buses is not None:
+        kvChanged = not np.array_equal(buses['vMag'], net.bus.vn_kv.to_numpy())
+        patched += patchTable(net.bus, busEntries(buses))
+        # Transformer ratings follow the bus voltage levels
+        if kvChanged and len(net.trafo) and trafos is None:
+            trafos = parsed[trafoCsv]
+    if lines is not None:
+        dropStdTypes(net, 'line', 'custom_type_')
+        patched += patchTable(net.line, lineEntries(net, lines))
+    if trafos is not None:
+        dropStdTypes(net, 'trafo', 'custom_std_type_')
+        patched += patchTable(net.trafo, trafoEntries(net, trafos))
+
+    # Injections, adding or removing one only rebuilds its own table
+    for csvPath, element, entries, add in (
+            (genCsv, 'gen', genEntries, addGens),
+            (loadCsv, 'load', loadEntries, addLoads),
+            (slacksCsv, 'ext_grid', slackEntries, addSlacks)):
+        if os.path.basename(csvPath) not in changed:
+            continue
+        data = parsed[csvPath]
+        if np.array_equal(data['id'], net[element].index.to_numpy()):
+            patched += patchTable(net[element], entries(data))
+        else:
+            replaceElements(net, element, add, data)
+            patched += len(data['id'])
+    print(f'-> Patched {patched} cells of the cached network.')
+    return True
+
+# Row by row network construction, kept as the reference for buildNetwork
+def buildNetworkRowwise(busCsv: str, lineCsv: str, trafoCsv: str, genCsv: str, loadCsv: str,
+                        slacksCsv: str, freq: float, sBase) -> pp.pandapowerNet:
+    # Create empty network from scratch
+    net = pp.create_empty_network(sn_mva = sBase, f_hz = freq)
+
+    # Load and add buses
+    with open(busCsv) as csvfile:
+        reader = DictReader(csvfile)
+        for row in reader:
+            pp.create_bus(
+                net, vn_kv = float(row['vMag']), zone = int(row['zone']),
+                name = row['name'], index = int(row['id']), in_service = True,
+                type = 'b', max_vm_pu = float(row['maxVm']), min_vm_pu = float(row['minVm']),
+            )
+    
+    # Load and add lines
+    # First create the standard type with the actual parameters you want
+    with open(lineCsv) as csvfile:
+        reader = DictReader(csvfile)
+        for row in reader:
+            if row['bus1id'] != row['bus2id']:
+                # Create a unique std_type for each line
+                stdTypeName = f'custom_type_{row['name']}'
+                if row['R'] == 'None':
+                    stdTypeName = 'NAYY 4x50 SE'
+                else:
+                    pp.create_std_type(
+                        net,
+                        {
+                            'r_ohm_per_km': float(row['R']),
+                            'x_ohm_per_km': float(row['X']),
+                            'c_nf_per_km': float(row['c_nf_per_km']),
+                            'max_i_ka': float(row['max_i_ka']),
+                            'type': 'ol',
+                            'g_us_per_km': float(0)
+                        },
+                        name=stdTypeName,
+                        element='line'
                     )
+                # if not given the std_type params set it to default
 
-        # Load and add generators
-        with open(genCsv) as csvfile:
-            reader = DictReader(csvfile)
-            for row in reader:
-                pp.create_gen(
-                    net,
-                    bus=int(row['bus']),
-                    name=row['name'],
-                    p_mw=float(row['pMW']),
-                    vm_pu=float(row.get('vmPU', 1.0)),  # Default vm_pu to 1.0 if not present
-                    min_q_mvar=float(row.get('minQMvar', -1e6)),  # Default to a large negative value if not present
-                    max_q_mvar=float(row.get('maxQMvar', 1e6)),   # Default to a large positive value if not present
-                    min_p_mw=float(row.get('minPMW', 0.0)),       # Default to 0.0 if not present
-                    max_p_mw=float(row.get('maxPMW', 1e6)),       # Default to a large positive value if not present
-                    controllable=True,  # Hardcoded to True
-                    slack=False,        # Hardcoded to False
-                    slack_weight=0,     # Hardcoded to 0
-                    index = int(row['id'])
+                fromBus, toBus = int(row['bus1id']), int(row['bus2id'])
+                pp.create_line(
+                    net, 
+                    from_bus=int(fromBus),
+                    to_bus=int(toBus), 
+                    length_km=float(row['len']),
+                    name=str(row['name']), 
+                    std_type=stdTypeName,  # Use the custom type we just created
+                    in_service=bool(True),
+                    max_loading_percent=float(100), 
+                    df=int(1), 
+                    parallel=int(1),
                 )
 
-        # Load and add transformers
-        with open(trafoCsv) as csvfile:
-            reader = DictReader(csvfile)
-            for row in reader:
-                # Extract parameters
-                hv_bus = int(row["hvBus"])
-                lv_bus = int(row["lvBus"])
-                sn_mva = float(row["sn_mva"])
-                vk_percent = float(row["vk_percent"])
-                vkr_percent = float(row["vkr_percent"])
-                tap_step_percent = float(row["tap_step_percent"])
-
-                # Create a custom transformer standard type
-                std_type = createTransformerStdType(
-                    net,
-                    hv_kv=net.bus.vn_kv[hv_bus],
-                    lv_kv=net.bus.vn_kv[lv_bus],
-                    sn_mva=sn_mva,
-                    vk_percent=vk_percent,
-                    vkr_percent=vkr_percent,
-                    tap_step_percent=tap_step_percent,
-                )
+    # Load and add generators
+    with open(genCsv) as csvfile:
+        reader = DictReader(csvfile)
+        for row in reader:
+            pp.create_gen(
+                net,
+                bus=int(row['bus']),
+                name=row['name'],
+                p_mw=float(row['pMW']),
+                vm_pu=float(row.get('vmPU', 1.0)),  # Default vm_pu to 1.0 if not present
+                min_q_mvar=float(row.get('minQMvar', -1e6)),  # Default to a large negative value if not present
+                max_q_mvar=float(row.get('maxQMvar', 1e6)),   # Default to a large positive value if not present
+                min_p_mw=float(row.get('minPMW', 0.0)),       # Default to 0.0 if not present
+                max_p_mw=float(row.get('maxPMW', 1e6)),       # Default to a large positive value if not present
+                controllable=True,  # Hardcoded to True
+                slack=False,        # Hardcoded to False
+                slack_weight=0,     # Hardcoded to 0
+                index = int(row['id'])
+            )
 
-                # Add transformer to the network
-                pp.create_transformer(
-                    net,
-                    hv_bus=hv_bus,
-                    lv_bus=lv_bus,
-                    name=row["name"],
-                    std_type=std_type,
-                    index = int(row['id'])
-                )
-                print(f"Transformer {row['name']} added to the network.")
-        
-        # Load and add loads
-        with open(loadCsv) as csvfile:
-            reader = DictReader(csvfile)
-            counter = 0
-            for row in reader:
-                counter += 1
-                pp.create_load(net,
-                               name = counter,
-                               bus = int(row['bus']),
-                               p_mw = float(row['pMW']),
-                               q_mvar = float(row['qMW']),
-                               scaling = 1,
-                               type = None,
-                               in_service = True,
-                               index = int(row['id']),
-                               controllable = False)
-
-        # Load and add slacks
-        with open(slacksCsv) as csvfile:
-            reader = DictReader(csvfile)
-            for row in reader:
-                pp.create_ext_grid(net, bus = int(row['bus']), vm_pu = float(row['vmPU']),
-                                   va_degree = float(row['vaD']), slack_weight = 1,
-                                   in_service = True, max_p_mw = float(row['maxP']), min_p_mw = float(row['minP']),
-                                   max_q_mvar = float(row['maxQ']), min_q_mvar = float(row['minQ']),
-                                   index = int(row['id']))
-
-        # Run power flow
-        print('bus', 30 * '-')
-        print(net.bus)
-        print('line', 30 * '-')
-        print(net.line)
-        print('trafo', 30 * '-')
-        print(net.trafo)
-        print('load', 30 * '-')
-        print(net.load)
-        print('gen', 30 * '-')
-        print(net.gen)
-        print('slack', 30 * '-')
-        print(net.ext_grid)
+    # Load and add transformers
+    with open(trafoCsv) as csvfile:
+        reader = DictReader(csvfile)
+        for row in reader:
+            # Extract parameters
+            hv_bus = int(row["hvBus"])
+            lv_bus = int(row["lvBus"])
+            sn_mva = float(row["sn_mva"])
+            vk_percent = float(row["vk_percent"])
+            vkr_percent = float(row["vkr_percent"])
+            tap_step_percent = float(row["tap_step_percent"])
 
-        try:
-            pp.runpp(
-                net, algorithm = method, init = 'flat', enforce_q_lims = True, numba = True,
-                max_iteration = maxIter
+            # Create a custom transformer standard type
+            std_type = createTransformerStdType(
+                net,
+                hv_kv=net.bus.vn_kv[hv_bus],
+                lv_kv=net.bus.vn_kv[lv_bus],
+                sn_mva=sn_mva,
+                vk_percent=vk_percent,
+                vkr_percent=vkr_percent,
+                tap_step_percent=tap_step_percent,
             )
 
-        # Check for convergence
-        except pp.LoadflowNotConverged:
-            return False, 'Load flow did not converge'
-
-        # Save network's data
-        dataPath = f'{projectPth}/data'
-        net.bus.to_csv(f'{dataPath}_buses.csv', index=True)
-        net.line.to_csv(f'{dataPath}_lines.csv', index=True)
-        net.trafo.to_csv(f'{dataPath}_trafos.csv', index=True)
-        net.load.to_csv(f'{dataPath}_loads.csv', index=True)
-        net.gen.to_csv(f'{dataPath}_gens.csv', index=True)
-        net.ext_grid.to_csv(f'{dataPath}_slacks.csv', index=True)
-
-        # Save results
-        resultPath = f'{projectPth}/results'
-        net.res_bus.to_csv(f'{resultPath}_buses.csv', index=True)
-        net.res_line.to_csv(f'{resultPath}_lines.csv', index=True)
-        net.res_trafo.to_csv(f'{resultPath}_trafos.csv', index=True)
-        net.res_load.to_csv(f'{resultPath}_loads.csv', index=True)
-        net.res_gen.to_csv(f'{resultPath}_gens.csv', index=True)
-        net.res_ext_grid.to_csv(f'{resultPath}_slacks.csv', index=True)
-        return True, ''
+            # Add transformer to the network
+            pp.create_transformer(
+                net,
+                hv_bus=hv_bus,
+                lv_bus=lv_bus,
+                name=row["name"],
+                std_type=std_type,
+                index = int(row['id'])
+            )
+            print(f"Transformer {row['name']} added to the network.")
+    
+    # Load and add loads
+    with open(loadCsv) as csvfile:
+        reader = DictReader(csvfile)
+        counter = 0
+        for row in reader:
+            counter += 1
+            pp.create_load(net,
+                           name = counter,
+                           bus = int(row['bus']),
+                           p_mw = float(row['pMW']),
+                           q_mvar = float(row['qMW']),
+                           scaling = 1,
+                           type = None,
+                           in_service = True,
+                           index = int(row['id']),
+                           controllable = False)
 
-    except Exception as e:
-        return False, str(e)
+    # Load and add slacks
+    with open(slacksCsv) as csvfile:
+        reader = DictReader(csvfile)
+        for row in reader:
+            pp.create_ext_grid(net, bus = int(row['bus']), vm_pu = float(row['vmPU']),
+                               va_degree = float(row['vaD']), slack_weight = 1,
+                               in_service = True, max_p_mw = float(row['maxP']), min_p_mw = float(row['minP']),
+                               max_q_mvar = float(row['maxQ']), min_q_mvar = float(row['minQ']),
+                               index = int(row['id']))
+
+    return net
+
+def trafoStdTypeParams(hv_kv, lv_kv, sn_mva, vk_percent, vkr_percent, tap_step_percent) -> dict:
+    return {
+        "sn_mva": sn_mva,
+        "vn_hv_kv": hv_kv,
+        "vn_lv_kv": lv_kv,
+        "vk_percent": vk_percent,
+        "vkr_percent": vkr_percent,
+        "pfe_kw": 0,  # Default value for iron losses
+        "i0_percent": 0,  # Default value for no-load current
+        "shift_degree": 0,  # Default phase shift
+        "tap_side": "hv",  # Default tap side
+        "tap_neutral": 0,
+        "tap_max": 0,
+        "tap_min": 0,
+        "tap_step_percent": tap_step_percent,
+    }
 
 def createTransformerStdType(net, hv_kv, lv_kv, sn_mva, vk_percent, vkr_percent, tap_step_percent):
     # Create a transformer standard type in the pandapower network.
     std_type_name = f"custom_std_type_{hv_kv}_{lv_kv}"
     pp.create_std_type(
         net,
-        {
-            "sn_mva": sn_mva,
-            "vn_hv_kv": hv_kv,
-            "vn_lv_kv": lv_kv,
-            "vk_percent": vk_percent,
-            "vkr_percent": vkr_percent,
-            "pfe_kw": 0,  # Default value for iron losses
-            "i0_percent": 0,  # Default value for no-load current
-            "shift_degree": 0,  # Default phase shift
-            "tap_side": "hv",  # Default tap side
-            "tap_neutral": 0,
-            "tap_max": 0,
-            "tap_min": 0,
-            "tap_step_percent": tap_step_percent,
-        },
+        trafoStdTypeParams(hv_kv, lv_kv, sn_mva, vk_percent, vkr_percent, tap_step_percent),
         name=std_type_name,
         element="trafo",
     )
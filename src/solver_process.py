@@ -0,0 +1,115 @@
+#   Runs load flows in a separate process so the GUI stays responsive and a run can be killed
+#
+#   The process is started once and serves runs until it is canceled, so the network cache
+#   and the numba compiled solver stay warm between runs. Canceling terminates it, the next
+#   run starts a fresh one. The GUI starts it with a JIT warm-up before any run is asked for,
+#   a fresh process after a cancel warms up again (from the on disk cache by then). The time
+#   of a run is counted from its first phase, not while it waits for the warm-up.
+#   Only the process imports the simulator, the GUI gets this module without pandapower.
+
+# Imports
+import queue
+import multiprocessing as mp
+from time import perf_counter
+
+# Loop of the solver process: takes (runId, runLoadFlow arguments, keywords) and sends back
+# (runId, 'phase', phase) while running and (runId, 'done', (success, error, info)) at the end.
+# With jitWarmUp it first sends (0, 'warmup', (success, error, info)) of jit_warmup.warmUp,
+# runs asked for in the meantime wait for it.
+def serveRuns(requests, events, jitWarmUp: bool = False) -> None:
+    from simulator import runLoadFlow
+    from jit_warmup import warmUp
+    if jitWarmUp:
+        events.put((0, 'warmup', warmUp()))
+    while True:
+        run = requests.get()
+        if run is None:
+            return
+        runId, args, kwargs = run
+        def progress(phase: str) -> None:
+            events.put((runId, 'phase', phase))
+        try:
+            result = runLoadFlow(*args, progress = progress, **kwargs)
+        except BaseException as e:
+            result = (False, str(e), {})
+        events.put((runId, 'done', result))
+
+class SolverProcess():
+    def __init__(self) -> None:
+        # Spawned, not forked, because the parent runs a Qt application
+        self.context = mp.get_context('spawn')
+        self.process = None
+        self.requests = None
+        self.events = None
+        self.runId = 0
+        self.running = False
+        self.startTime = None # perf_counter() of the first phase of the current run
+        self.warmUp = None # (success, error, info) of the JIT warm-up once it arrived
+        self.jitWarmUp = False # kept for the processes started again after a cancel
+
+    def start(self, jitWarmUp: bool = False) -> None:
+        self.jitWarmUp = self.jitWarmUp or jitWarmUp
+        if self.process is not None and self.process.is_alive():
+            return
+        self.requests = self.context.Queue()
+        self.events = self.context.Queue()
+        self.process = self.context.Process(target = serveRuns,
+                                            args = (self.requests, self.events, self.jitWarmUp),
+                                            daemon = True)
+        self.process.start()
+
+    # Queues a run with the arguments of runLoadFlow (without progress)
+    def submit(self, *args, **kwargs) -> None:
+        self.start()
+        self.runId += 1
+        self.running = True
+        self.startTime = None
+        self.requests.put((self.runId, args, kwargs))
+
+    # Seconds since the current run started its first phase, 0 while it waits in the queue
+    def elapsed(self) -> float:
+        if not self.running or self.startTime is None:
+            return 0.0
+        return perf_counter() - self.startTime
+
+    # Returns the events of the current run that arrived so far, without waiting, and keeps
+    # the result of the JIT warm-up in warmUp
+    def poll(self) -> list:
+        events = []
+        while self.events is not None:
+            try:
+                runId, kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'warmup':
+                self.warmUp = payload
+                continue
+            if not self.running or runId != self.runId:
+                continue
+            if self.startTime is None:
+                self.startTime = perf_counter()
+            events.append((kind, payload))
+            if kind == 'done':
+                self.running = False
+        if self.running and not self.process.is_alive():
+            self.running = False
+            self.process = None
+            events.append(('done', (False, 'The solver process exited unexpectedly', {})))
+        return events
+
+    # Kills the current run, the process is started again by the next submit
+    def cancel(self) -> None:
+        self.running = False
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(timeout = 5)
+            self.process = None
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            self.requests.put(None)
+            self.process.join(timeout = 5)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.process = None
+        self.running = False
@@ -0,0 +1,101 @@
+#   Sparse Newton-Raphson load flow on a bus admittance matrix
+#
+#   Everything is in per unit and in the internal (ppci) bus order of pandapower, so a
+#   pandapower solve can hand over its Ybus, Sbus and voltages and many variants of the
+#   same network can be solved without building a pandapower net for each of them.
+
+# Imports
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+
+# Complex power injection of every bus minus the specified one, as P of pv/pq and Q of pq
+def mismatch(Ybus, V: np.ndarray, Sbus: np.ndarray, pvpq: np.ndarray, pq: np.ndarray) -> np.ndarray:
+    S = V * np.conj(Ybus @ V) - Sbus
+    return np.r_[S[pvpq].real, S[pq].imag]
+
+# Where every Ybus entry and every diagonal lands in the Jacobian, built once per bus typing.
+# Entry (i, k) feeds J11 and J12 when i is pv/pq, J21 and J22 when i is pq, and the angle
+# (pv/pq) or magnitude (pq) column of k.
+def jacobianPattern(Ybus, pv: np.ndarray, pq: np.ndarray) -> dict:
+    Ybus = Ybus.tocoo()
+    nBus = Ybus.shape[0]
+    nPvpq = len(pv) + len(pq)
+    angle = np.full(nBus, -1)
+    angle[np.r_[pv, pq]] = np.arange(nPvpq)
+    magnitude = np.full(nBus, -1)
+    magnitude[pq] = nPvpq + np.arange(len(pq))
+    i = np.r_[Ybus.row, np.arange(nBus)]
+    k = np.r_[Ybus.col, np.arange(nBus)]
+    blocks = []
+    for rowPos, colPos, part in ((angle, angle, 'Pa'), (angle, magnitude, 'Pm'),
+                                 (magnitude, angle, 'Qa'), (magnitude, magnitude, 'Qm')):
+        mask = (rowPos[i] >= 0) & (colPos[k] >= 0)
+        blocks.append((part, np.flatnonzero(mask), rowPos[i[mask]], colPos[k[mask]]))
+    return {'Ybus': Ybus, 'size': nPvpq + len(pq), 'blocks': blocks,
+            'rows': np.concatenate([b[2] for b in blocks]),
+            'cols': np.concatenate([b[3] for b in blocks])}
+
+# Polar Jacobian of the power mismatch by angle (pv, pq) and magnitude (pq)
+def jacobian(pattern: dict, V: np.ndarray):
+    Ybus = pattern['Ybus']
+    i, k = Ybus.row, Ybus.col
+    YV = Ybus.data * V[k]
+    Ibus = Ybus @ V
+    Vnorm = V / np.abs(V)
+
+    # Off diagonal terms of dS/dVa and dS/dVm followed by the diagonal ones
+    dSdVa = np.r_[-1j * V[i] * np.conj(YV), 1j * V * np.conj(Ibus)]
+    dSdVm = np.r_[V[i] * np.conj(Ybus.data * Vnorm[k]), np.conj(Ibus) * Vnorm]
+    values = []
+    for part, entries, _, _ in pattern['blocks']:
+        dS = dSdVa if part[1] == 'a' else dSdVm
+        values.append(dS[entries].real if part[0] == 'P' else dS[entries].imag)
+    return sp.csc_matrix((np.concatenate(values), (pattern['rows'], pattern['cols'])),
+                         shape = (pattern['size'], pattern['size']))
+
+# Returns (V, converged, iterations)
+def newtonRaphson(Ybus, Sbus: np.ndarray, V0: np.ndarray, ref: np.ndarray, pv: np.ndarray,
+                  pq: np.ndarray, tol: float = 1e-8, maxIter: int = 10) -> tuple:
+    pvpq = np.r_[pv, pq]
+    pattern = jacobianPattern(Ybus, pv, pq)
+    Va, Vm = np.angle(V0), np.abs(V0)
+    V = V0.copy()
+    F = mismatch(Ybus, V, Sbus, pvpq, pq)
+    if np.linalg.norm(F, np.inf) < tol:
+        return V, True, 0
+    for iteration in range(1, int(maxIter) + 1):
+        dx = spsolve(jacobian(pattern, V), -F)
+        if not np.all(np.isfinite(dx)):
+            return V, False, iteration
+        Va[pvpq] += dx[:len(pvpq)]
+        Vm[pq] += dx[len(pvpq):]
+        V = Vm * np.exp(1j * Va)
+        F = mismatch(Ybus, V, Sbus, pvpq, pq)
+        if np.linalg.norm(F, np.inf) < tol:
+            return V, True, iteration
+    return V, False, int(maxIter)
+
+# Newton-Raphson that turns pv buses into pq buses held at their reactive limit whenever the
+# solution breaks it, the way pandapower's enforce_q_lims does. qMin and qMax are limits of
+# the net reactive injection of every bus, returns (V, converged, iterations, Sbus, pv, pq) with
+# the iterations of all rounds
+def newtonRaphsonQLimits(Ybus, Sbus: np.ndarray, V0: np.ndarray, ref: np.ndarray, pv: np.ndarray,
+                         pq: np.ndarray, qMin: np.ndarray, qMax: np.ndarray, tol: float = 1e-8,
+                         maxIter: int = 10) -> tuple:
+    Sbus, pv, pq = Sbus.copy(), pv.copy(), pq.copy()
+    V, iterations = V0, 0
+    while True:
+        V, converged, roundIterations = newtonRaphson(Ybus, Sbus, V, ref, pv, pq, tol, maxIter)
+        iterations += roundIterations
+        if not converged:
+            return V, False, iterations, Sbus, pv, pq
+        Q = (V * np.conj(Ybus @ V)).imag
+        high = pv[Q[pv] > qMax[pv]]
+        low = pv[Q[pv] < qMin[pv]]
+        if not len(high) and not len(low):
+            return V, True, iterations, Sbus, pv, pq
+        Sbus[high] = Sbus[high].real + 1j * qMax[high]
+        Sbus[low] = Sbus[low].real + 1j * qMin[low]
+        pv = np.setdiff1d(pv, np.r_[high, low])
+        pq = np.sort(np.r_[pq, high, low])
@@ -0,0 +1,192 @@
+#   Quasi-static time series load flow driven by load and generator profiles
+#
+#   A profile csv has a 'time' column followed by one column per element and quantity,
+#   named after the ids in Loads.csv / Gens.csv: p_<id> and q_<id> for loads, p_<id> for
+#   generators. Values are multipliers of the project values (mode 'scale') or MW/MVAr
+#   (mode 'absolute'). Elements without a column keep their project values.
+#   progress(done, total) is told after every timestep, and the run stops after the step in
+#   which canceled() turns true, keeping the timesteps written so far.
+
+# Imports
+import os
+from time import perf_counter
+import numpy as np
+import pandas as pd
+import pandapower as pp
+from network_cache import networkCache
+from simulator import loadNetwork, solveWithFallback
+
+LOAD_PROFILES = 'LoadProfiles.csv'
+GEN_PROFILES = 'GenProfiles.csv'
+
+# (result table, column, output file suffix) written for every timestep
+OUTPUTS = [
+    ('res_bus', 'vm_pu', 'buses_vm_pu'),
+    ('res_bus', 'va_degree', 'buses_va_degree'),
+    ('res_line', 'loading_percent', 'lines_loading_percent'),
+    ('res_trafo', 'loading_percent', 'trafos_loading_percent'),
+    ('res_gen', 'q_mvar', 'gens_q_mvar'),
+    ('res_ext_grid', 'p_mw', 'slacks_p_mw'),
+    ('res_ext_grid', 'q_mvar', 'slacks_q_mvar'),
+]
+
+def runTimeSeries(projectPth: str, busCsv: str, lineCsv: str, trafoCsv: str,
+                  genCsv: str, loadCsv: str, slacksCsv: str, method: str, maxIter,
+                  freq: float, sBase, loadProfileCsv: str = None, genProfileCsv: str = None,
+                  mode: str = 'scale', chunkSize: int = 500, warmStart: bool = True,
+                  progress = None, canceled = None) -> tuple[bool, str, dict]:
+
+    info = {'steps': 0, 'converged': 0, 'failedSteps': [], 'iterations': 0, 'time': 0.0,
+            'canceled': False}
+    progress = progress or (lambda done, total: None)
+    canceled = canceled or (lambda: False)
+    if loadProfileCsv is None and genProfileCsv is None:
+        return False, 'No load or generator profile given', info
+    if mode not in ('scale', 'absolute'):
+        return False, f'Unknown profile mode {mode!r}', info
+
+    startTime = perf_counter()
+    try:
+        csvPaths = [busCsv, lineCsv, trafoCsv, genCsv, loadCsv, slacksCsv]
+        net = loadNetwork(projectPth, csvPaths, freq, sBase)
+    except Exception as e:
+        return False, str(e), info
+
+    # Project values, restored afterwards because the network stays cached
+    baseLoadP = net.load.p_mw.to_numpy().copy()
+    baseLoadQ = net.load.q_mvar.to_numpy().copy()
+    baseGenP = net.gen.p_mw.to_numpy().copy()
+    writer = ResultWriter(projectPth, net, chunkSize)
+    try:
+        init = 'flat'
+        seed = networkCache.loadWarmStart(projectPth, net) if warmStart else None
+        if seed is not None:
+            net.res_bus, init = seed, 'results'
+        lastGood = None
+        total = countSteps(loadProfileCsv or genProfileCsv)
+
+        for times, loadChunk, genChunk in readProfiles(loadProfileCsv, genProfileCsv, chunkSize):
+            loadP = applyProfile(baseLoadP, net.load.index, loadChunk, 'p_', mode, len(times))
+            loadQ = applyProfile(baseLoadQ, net.load.index, loadChunk, 'q_', mode, len(times))
+            genP = applyProfile(baseGenP, net.gen.index, genChunk, 'p_', mode, len(times))
+
+            for step, time in enumerate(times):
+                if canceled():
+                    info['canceled'] = True
+                    break
+                progress(info['steps'] + step, total)
+                net.load['p_mw'] = loadP[step]
+                net.load['q_mvar'] = loadQ[step]
+                net.gen['p_mw'] = genP[step]
+                stepInfo = {}
+                try:
+                    solveWithFallback(net, method, maxIter, init, stepInfo)
+                except (pp.LoadflowNotConverged, UserWarning):
+                    info['failedSteps'].append(time)
+                    writer.add(time, None)
+                    if lastGood is not None:
+                        net.res_bus = lastGood.copy()
+                    init = 'results' if lastGood is not None else 'flat'
+                    continue
+                info['converged'] += 1
+                info['iterations'] += stepInfo['iterations']
+                writer.add(time, net)
+                lastGood = net.res_bus.copy()
+                init = 'results'
+            if info['canceled']:
+                info['steps'] += step
+                break
+            info['steps'] += len(times)
+        writer.flush()
+
+    except Exception as e:
+        return False, str(e), info
+
+    finally:
+        net.load['p_mw'] = baseLoadP
+        net.load['q_mvar'] = baseLoadQ
+        net.gen['p_mw'] = baseGenP
+
+    info['time'] = perf_counter() - startTime
+    info['outputs'] = writer.paths
+    if info['canceled']:
+        return False, '', info
+    return True, '', info
+
+# Timesteps of a profile csv, one per line after the header
+def countSteps(profileCsv: str) -> int:
+    with open(profileCsv, 'rb') as file:
+        return max(sum(1 for _ in file) - 1, 0)
+
+# Reads the profile csvs chunk by chunk in lockstep, yields (times, loadChunk, genChunk)
+def readProfiles(loadProfileCsv: str, genProfileCsv: str, chunkSize: int):
+    readers = {name: pd.read_csv(path, chunksize = chunkSize)
+               for name, path in (('load', loadProfileCsv), ('gen', genProfileCsv)) if path}
+    while True:
+        chunks = {name: next(reader, None) for name, reader in readers.items()}
+        if all(chunk is None for chunk in chunks.values()):
+            return
+        timeColumns = [chunk['time'].to_numpy() if chunk is not None else None
+                       for chunk in chunks.values()]
+        times = timeColumns[0]
+        if any(t is None or not np.array_equal(t, times) for t in timeColumns):
+            raise ValueError('Load and generator profiles have different timesteps')
+        yield times, chunks.get('load'), chunks.get('gen')
+
+# Returns a (steps x elements) array of values with the profile columns applied
+def applyProfile(base: np.ndarray, index: pd.Index, chunk: pd.DataFrame, prefix: str,
+                 mode: str, steps: int) -> np.ndarray:
+    values = np.tile(base, (steps, 1))
+    if chunk is None:
+        return values
+    for col in chunk.columns:
+        if not col.startswith(prefix):
+            continue
+        elementId = int(col[len(prefix):])
+        if elementId not in index:
+            raise KeyError(f'Profile column {col} does not match any element id')
+        pos = index.get_loc(elementId)
+        profile = chunk[col].to_numpy(dtype = float)
+        values[:, pos] = base[pos] * profile if mode == 'scale' else profile
+    return values
+
+# Buffers a fixed number of timesteps per output and appends them to csvs on disk
+class ResultWriter():
+    def __init__(self, projectPth: str, net, chunkSize: int) -> None:
+        self.chunkSize = chunkSize
+        self.outputs = []
+        self.paths = []
+        for table, column, suffix in OUTPUTS:
+            path = os.path.join(projectPth, f'timeseries_{suffix}.csv')
+            if os.path.isfile(path):
+                os.remove(path)
+            elementIndex = net[table[len('res_'):]].index
+            self.outputs.append({
+                'table': table, 'column': column, 'path': path, 'columns': elementIndex,
+                'buffer': np.full((chunkSize, len(elementIndex)), np.nan),
+                'header': True,
+            })
+            self.paths.append(path)
+        self.times = []
+
+    def add(self, time, net) -> None:
+        row = len(self.times)
+        for output in self.outputs:
+            if net is None:
+                output['buffer'][row] = np.nan
+            else:
+                output['buffer'][row] = net[output['table']][output['column']].to_numpy()
+        self.times.append(time)
+        if len(self.times) == self.chunkSize:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.times:
+            return
+        rows = len(self.times)
+        for output in self.outputs:
+            frame = pd.DataFrame(output['buffer'][:rows], columns = output['columns'],
+                                 index = pd.Index(self.times, name = 'time'))
+            frame.to_csv(output['path'], mode = 'a', header = output['header'])
+            output['header'] = False
+        self.times = []
@@ -0,0 +1,106 @@
+#   Topology check of a project before its network is built
+#
+#   Every bus a line, transformer, generator, load or slack refers to is looked up in
+#   Buses.csv, buses without a voltage level are found, and the buses are joined into islands
+#   over lines and transformers with a union-find (path halving, union by size), nearly
+#   linear in the number of buses and branches. Islands that hold loads or generators but no
+#   slack are reported by their bus names, islands of bare buses are left out of the solve as
+#   before. A broken project fails here in milliseconds with the elements named, instead of
+#   as a build error or a load flow that does not converge.
+
+# Imports
+import numpy as np
+from run_profile import timed
+
+# Problems listed in the error, the rest are counted
+MAX_PROBLEMS = 10
+
+# Bus names listed per island
+MAX_ISLAND_NAMES = 5
+
+class UnionFind():
+    def __init__(self, size: int) -> None:
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+# Problems of the element tables as read by project_csv, one sentence each
+def checkTopology(buses: dict, lines: dict, trafos: dict, gens: dict, loads: dict, slacks: dict) -> list:
+    problems = []
+    ids, names = buses['id'], buses['name']
+    position = {}
+    for pos, id in enumerate(ids.tolist()):
+        if id in position:
+            problems.append(f'Bus id {id} is used by both {names[position[id]]} and {names[pos]}')
+        else:
+            position[id] = pos
+    noLevel = ~(buses['vMag'] > 0)
+    for pos in np.flatnonzero(noLevel):
+        problems.append(f'{names[pos]} (bus id {ids[pos]}) has no voltage level')
+
+    # Islands over the branches whose buses exist
+    sets = UnionFind(len(ids))
+    branches = [('Line', lines['name'], lines['bus1id'], lines['bus2id']),
+                ('Transformer', trafos['name'], trafos['hvBus'], trafos['lvBus'])]
+    for element, branchNames, fromBuses, toBuses in branches:
+        for name, a, b in zip(branchNames, fromBuses.tolist(), toBuses.tolist()):
+            missing = [bus for bus in (a, b) if bus not in position]
+            if missing:
+                problems.append(f'{element} {name} connects bus {missing[0]}, which is not in Buses.csv')
+                continue
+            if element == 'Transformer':
+                for bus in (a, b):
+                    if noLevel[position[bus]]:
+                        problems.append(f'Transformer {name} connects {names[position[bus]]}, which has no voltage level')
+            sets.union(position[a], position[b])
+
+    # Elements at buses that do not exist, the buses that hold loads or generators
+    supplied = np.zeros(len(ids), dtype = bool)
+    elements = [('Generator', gens['name'], gens['bus']), ('Load', loads['id'], loads['bus']),
+                ('Slack', slacks['id'], slacks['bus'])]
+    for element, elementNames, elementBuses in elements:
+        for name, bus in zip(elementNames, elementBuses.tolist()):
+            if bus not in position:
+                problems.append(f'{element} {name} is at bus {bus}, which is not in Buses.csv')
+            elif element != 'Slack':
+                supplied[position[bus]] = True
+
+    fed = {sets.find(position[bus]) for bus in slacks['bus'].tolist() if bus in position}
+    if not len(slacks['bus']):
+        problems.append('The project has no slack')
+    elif fed:
+        islands = {}
+        for pos in range(len(ids)):
+            root = sets.find(pos)
+            if root not in fed:
+                islands.setdefault(root, []).append(pos)
+        for members in islands.values():
+            if supplied[members].any():
+                listed = ', '.join(str(names[pos]) for pos in members[:MAX_ISLAND_NAMES])
+                more = f' and {len(members) - MAX_ISLAND_NAMES} more' if len(members) > MAX_ISLAND_NAMES else ''
+                problems.append(f'The island of {listed}{more} has loads or generators but no path to a slack')
+    return problems
+
+# Raises ValueError naming the problems of the element tables, if any
+def validateTopology(buses: dict, lines: dict, trafos: dict, gens: dict, loads: dict, slacks: dict) -> None:
+    with timed('validation'):
+        problems = checkTopology(buses, lines, trafos, gens, loads, slacks)
+    if problems:
+        listed = '\n'.join(f'- {problem}' for problem in problems[:MAX_PROBLEMS])
+        more = f'\n- and {len(problems) - MAX_PROBLEMS} more' if len(problems) > MAX_PROBLEMS else ''
+        raise ValueError(f'The project has {len(problems)} topology problem(s):\n{listed}{more}')